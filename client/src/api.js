@@ -7,6 +7,16 @@ export async function apiGet(path) {
   return res.json();
 }
 
+// Like apiGet, but also returns the cursor for the next page, if any.
+export async function apiGetPage(path) {
+  const res = await fetch(path);
+  if (!res.ok) {
+    const text = await res.text().catch(() => "");
+    throw new Error(text || `GET ${path} failed (${res.status})`);
+  }
+  return { data: await res.json(), next: res.headers.get("X-Next-Cursor") };
+}
+
 export async function apiPost(path, body) {
   const res = await fetch(path, {
     method: "POST",
@@ -1,22 +1,59 @@
 import { useState } from "react";
-import { apiPost } from "../api.js";
+import { apiGet, apiPost } from "../api.js";
+
+const PHASE_LABELS = {
+  queued: "Waiting for another import",
+  exporting_wishlist: "Exporting wishlist",
+  opening: "Opening workbook",
+  importing: "Importing rows",
+  profiling: "Checking rows",
+  applying: "Applying changes",
+  indexing: "Building search index",
+  swapping: "Switching to new catalog",
+  refreshing: "Refreshing search",
+};
+
+// Imports run as background jobs on the server; poll until the job finishes.
+async function waitForJob(job, onProgress) {
+  while (job.status === "queued" || job.status === "running") {
+    onProgress(job);
+    await new Promise((resolve) => setTimeout(resolve, 1000));
+    job = await apiGet(`/api/import/jobs/${job.id}`);
+  }
+  if (job.status === "failed") throw new Error(job.error || "Import failed.");
+  return job;
+}
 
 export default function ImportPage({ pushToast }) {
   const [partsFile, setPartsFile] = useState(null);
+  const [partsDiff, setPartsDiff] = useState(false);
+  const [partsForce, setPartsForce] = useState(false);
   const [ordersFile, setOrdersFile] = useState(null);
+  const [ordersForce, setOrdersForce] = useState(false);
+  const [workbookFile, setWorkbookFile] = useState(null);
 
   const [busyParts, setBusyParts] = useState(false);
   const [busyOrders, setBusyOrders] = useState(false);
+  const [busyWorkbook, setBusyWorkbook] = useState(false);
 
   const [lastParts, setLastParts] = useState(null);
   const [lastOrders, setLastOrders] = useState(null);
+  const [lastWorkbook, setLastWorkbook] = useState(null);
+
+  const [partsJob, setPartsJob] = useState(null);
+  const [ordersJob, setOrdersJob] = useState(null);
+  const [workbookJob, setWorkbookJob] = useState(null);
 
   const [confirmPartsOpen, setConfirmPartsOpen] = useState(false);
   const [confirmOrdersOpen, setConfirmOrdersOpen] = useState(false);
+  const [confirmWorkbookOpen, setConfirmWorkbookOpen] = useState(false);
+
+  // Dry-run reports by kind (parts, orders, workbook).
+  const [checks, setChecks] = useState({});
 
   async function importParts() {
     if (!partsFile) {
-      pushToast("error", "Select a Parts .xlsx file first.");
+      pushToast("error", "Select a Parts file first.");
       return;
     }
     setBusyParts(true);
@@ -24,22 +61,39 @@ export default function ImportPage({ pushToast }) {
     try {
       const fd = new FormData();
       fd.append("file", partsFile);
-      const res = await apiPost("/api/import/parts", fd);
+      const mode = partsDiff ? "diff" : "replace";
+      const job = await waitForJob(
+        await apiPost(`/api/import/parts?mode=${mode}&force=${partsForce}`, fd),
+        setPartsJob
+      );
+      if (job.status === "cancelled") {
+        pushToast("error", "Parts import cancelled. Previous parts kept.");
+        return;
+      }
+      if (job.status === "skipped") {
+        setLastParts(job.result);
+        pushToast("success", `Same file as the Parts import of ${job.duplicate_of.imported_at}. Nothing to do.`);
+        return;
+      }
+      const res = job.result;
       setLastParts(res);
       pushToast(
         "success",
-        `Parts imported: ${res.parts_imported}. Wishlist exported to: ${res.exported_wishlist_file}`
+        res.mode === "diff"
+          ? `Parts updated: ${res.added} added, ${res.changed} changed, ${res.removed} removed.`
+          : `Parts imported: ${res.parts_imported}. Wishlist exported to: ${res.exported_wishlist_file}`
       );
     } catch (e) {
       pushToast("error", e?.message || "Parts import failed.");
     } finally {
+      setPartsJob(null);
       setBusyParts(false);
     }
   }
 
   async function importOrders() {
     if (!ordersFile) {
-      pushToast("error", "Select an Orders .xlsx file first.");
+      pushToast("error", "Select an Orders file first.");
       return;
     }
     setBusyOrders(true);
@@ -47,27 +101,108 @@ export default function ImportPage({ pushToast }) {
     try {
       const fd = new FormData();
       fd.append("file", ordersFile);
-      const res = await apiPost("/api/import/orders", fd);
+      const job = await waitForJob(await apiPost(`/api/import/orders?force=${ordersForce}`, fd), setOrdersJob);
+      if (job.status === "cancelled") {
+        pushToast("error", "Orders import cancelled. Previous orders kept.");
+        return;
+      }
+      if (job.status === "skipped") {
+        setLastOrders(job.result);
+        pushToast("success", `Same file as the Orders import of ${job.duplicate_of.imported_at}. Nothing to do.`);
+        return;
+      }
+      const res = job.result;
       setLastOrders(res);
       pushToast("success", `Orders imported: ${res.orders_imported}.`);
     } catch (e) {
       pushToast("error", e?.message || "Orders import failed.");
     } finally {
+      setOrdersJob(null);
       setBusyOrders(false);
     }
   }
 
+  async function importWorkbook() {
+    setBusyWorkbook(true);
+    setLastWorkbook(null);
+    try {
+      const fd = new FormData();
+      fd.append("file", workbookFile);
+      const mode = partsDiff ? "diff" : "replace";
+      const job = await waitForJob(
+        await apiPost(`/api/import/workbook?mode=${mode}&force=${partsForce}`, fd),
+        setWorkbookJob
+      );
+      if (job.status === "cancelled") {
+        pushToast("error", "Workbook import cancelled. Previous parts and orders kept.");
+        return;
+      }
+      if (job.status === "skipped") {
+        setLastWorkbook(job.result);
+        pushToast("success", `Same workbook as the import of ${job.duplicate_of.imported_at}. Nothing to do.`);
+        return;
+      }
+      const res = job.result;
+      setLastWorkbook(res);
+      pushToast("success", `Workbook imported: ${Object.keys(res.sheets).join(", ")}.`);
+    } catch (e) {
+      pushToast("error", e?.message || "Workbook import failed.");
+    } finally {
+      setWorkbookJob(null);
+      setBusyWorkbook(false);
+    }
+  }
+
+  async function cancelJob(job) {
+    try {
+      await apiPost(`/api/import/jobs/${job.id}/cancel`);
+    } catch (e) {
+      pushToast("error", e?.message || "Could not cancel the import.");
+    }
+  }
+
+  // Dry run: the server reads the file and reports problems without importing.
+  async function checkFile(kind, file, setBusy, setJob) {
+    if (!file) {
+      pushToast("error", "Select a file first.");
+      return;
+    }
+    setBusy(true);
+    setChecks((c) => ({ ...c, [kind]: null }));
+    try {
+      const fd = new FormData();
+      fd.append("file", file);
+      const job = await waitForJob(await apiPost(`/api/import/${kind}?dry_run=true`, fd), setJob);
+      if (job.status === "cancelled") return;
+      setChecks((c) => ({ ...c, [kind]: job.result }));
+      pushToast(job.result.ok ? "success" : "error", job.result.ok ? "File checked." : "The file has errors, see the report.");
+    } catch (e) {
+      pushToast("error", e?.message || "Check failed.");
+    } finally {
+      setJob(null);
+      setBusy(false);
+    }
+  }
+
   function requestImportParts() {
     if (!partsFile) {
-      pushToast("error", "Select a Parts .xlsx file first.");
+      pushToast("error", "Select a Parts file first.");
       return;
     }
     setConfirmPartsOpen(true);
   }
 
+  function requestImportWorkbook() {
+    if (!workbookFile) {
+      pushToast("error", "Select a workbook first.");
+      return;
+    }
+    setConfirmWorkbookOpen(true);
+  }
+
   function requestImportOrders() {
     if (!ordersFile) {
-      pushToast("error", "Select an Orders .xlsx file first.");
+      pushToast("error", "Select an Orders file first.");
       return;
     }
     setConfirmOrdersOpen(true);
@@ -98,20 +233,51 @@ export default function ImportPage({ pushToast }) {
 
       <Section
         title="Import Parts"
-        subtitle="Exports wishlist to USB first. Then replaces all parts."
+        subtitle={
+          partsDiff
+            ? "Exports wishlist to USB first. Then applies only added, changed and removed parts."
+            : "Exports wishlist to USB first. Then replaces all parts."
+        }
         file={partsFile}
         setFile={setPartsFile}
         busy={busyParts}
+        onCheck={() => checkFile("parts", partsFile, setBusyParts, setPartsJob)}
         onRequest={requestImportParts}
-        buttonLabel={busyParts ? "Importing…" : "Import Parts (Replace All)"}
-      />
+        buttonLabel={busyParts ? "Importing…" : partsDiff ? "Import Parts (Changes Only)" : "Import Parts (Replace All)"}
+      >
+        <label className="flex items-start gap-2 text-sm text-[var(--rb-muted)]">
+          <input
+            type="checkbox"
+            checked={partsDiff}
+            onChange={(e) => setPartsDiff(e.target.checked)}
+            disabled={busyParts}
+            className="mt-1"
+          />
+          <span>
+            Only apply changes. Keeps wishlist, ROB and location overrides for parts that are still in the file.
+          </span>
+        </label>
+        <ReimportOption checked={partsForce} onChange={setPartsForce} disabled={busyParts} />
+      </Section>
+
+      {partsJob ? <JobProgress job={partsJob} onCancel={() => cancelJob(partsJob)} /> : null}
+
+      {checks.parts ? <CheckReport title="Parts file check" report={checks.parts} /> : null}
 
       {lastParts ? (
         <ResultCard title="Last Parts import result">
           <ResultRow label="Parts imported" value={String(lastParts.parts_imported)} />
+          {lastParts.mode === "diff" ? (
+            <>
+              <ResultRow label="Added" value={String(lastParts.added)} />
+              <ResultRow label="Changed" value={String(lastParts.changed)} />
+              <ResultRow label="Removed" value={String(lastParts.removed)} />
+              <ResultRow label="Unchanged" value={String(lastParts.unchanged)} />
+            </>
+          ) : null}
           <ResultRow label="USB detected" value={lastParts.usb_detected ? "Yes" : "No"} />
           <ResultRow label="Wishlist exported to" value={lastParts.exported_wishlist_file} mono />
-          <ResultRow label="Sheet used" value={lastParts.sheet_used} mono />
+          <ResultRow label="Sheet used" value={lastParts.sheet_used || lastParts.format} mono />
         </ResultCard>
       ) : null}
 
@@ -121,14 +287,58 @@ export default function ImportPage({ pushToast }) {
         file={ordersFile}
         setFile={setOrdersFile}
         busy={busyOrders}
+        onCheck={() => checkFile("orders", ordersFile, setBusyOrders, setOrdersJob)}
         onRequest={requestImportOrders}
         buttonLabel={busyOrders ? "Importing…" : "Import Orders (Replace All)"}
-      />
+      >
+        <ReimportOption checked={ordersForce} onChange={setOrdersForce} disabled={busyOrders} />
+      </Section>
+
+      {ordersJob ? <JobProgress job={ordersJob} onCancel={() => cancelJob(ordersJob)} /> : null}
+
+      {checks.orders ? <CheckReport title="Orders file check" report={checks.orders} /> : null}
 
       {lastOrders ? (
         <ResultCard title="Last Orders import result">
           <ResultRow label="Orders imported" value={String(lastOrders.orders_imported)} />
-          <ResultRow label="Sheet used" value={lastOrders.sheet_used} mono />
+          <ResultRow label="Sheet used" value={lastOrders.sheet_used || lastOrders.format} mono />
+        </ResultCard>
+      ) : null}
+
+      <Section
+        title="Import Parts and Orders (one workbook)"
+        subtitle="Reads the sheets named Parts and Orders from one export in a single pass. The Parts options above apply."
+        file={workbookFile}
+        setFile={setWorkbookFile}
+        accept=".xlsx"
+        busy={busyWorkbook}
+        onCheck={() => checkFile("workbook", workbookFile, setBusyWorkbook, setWorkbookJob)}
+        onRequest={requestImportWorkbook}
+        buttonLabel={busyWorkbook ? "Importing…" : "Import Workbook"}
+      />
+
+      {workbookJob ? <JobProgress job={workbookJob} onCancel={() => cancelJob(workbookJob)} /> : null}
+
+      {checks.workbook
+        ? Object.entries(checks.workbook.sheets).map(([kind, report]) => (
+            <CheckReport key={kind} title={`Workbook check: sheet ${report.sheet_used}`} report={report} />
+          ))
+        : null}
+
+      {lastWorkbook ? (
+        <ResultCard title="Last workbook import result">
+          {lastWorkbook.sheets.parts ? (
+            <ResultRow label="Parts imported" value={String(lastWorkbook.sheets.parts.parts_imported)} />
+          ) : null}
+          {lastWorkbook.sheets.orders ? (
+            <ResultRow label="Orders imported" value={String(lastWorkbook.sheets.orders.orders_imported)} />
+          ) : null}
+          {lastWorkbook.sheets_skipped.length ? (
+            <ResultRow label="Sheets skipped" value={lastWorkbook.sheets_skipped.join(", ")} mono />
+          ) : null}
+          {lastWorkbook.exported_wishlist_file ? (
+            <ResultRow label="Wishlist exported to" value={lastWorkbook.exported_wishlist_file} mono />
+          ) : null}
         </ResultCard>
       ) : null}
 
@@ -146,13 +356,17 @@ export default function ImportPage({ pushToast }) {
           <li>
             Column <span className="font-mono text-[var(--rb-text)]">Number</span> must exist.
           </li>
+          <li>
+            CSV/TSV exports with the same column headers import several times faster than .xlsx. CSV may be
+            separated by commas or semicolons.
+          </li>
         </ul>
       </div>
 
       {/* Confirm: Parts */}
       {confirmPartsOpen ? (
         <ConfirmModal
-          title="Import Parts (Replace All)?"
+          title={partsDiff ? "Import Parts (Changes Only)?" : "Import Parts (Replace All)?"}
           subtitle={
             <>
               File: <span className="font-mono text-[var(--rb-text)]">{partsFile?.name}</span>
@@ -163,9 +377,16 @@ export default function ImportPage({ pushToast }) {
               This will:
               <ul className="mt-2 list-disc pl-5 space-y-1">
                 <li>Export the wishlist first (USB if detected)</li>
-                <li>
-                  <span className="font-semibold text-[var(--rb-text)]">Replace all parts</span> in the local database
-                </li>
+                {partsDiff ? (
+                  <li>
+                    <span className="font-semibold text-[var(--rb-text)]">Add, update and remove parts</span> to match
+                    the file; parts missing from the file lose their wishlist, ROB and location entries
+                  </li>
+                ) : (
+                  <li>
+                    <span className="font-semibold text-[var(--rb-text)]">Replace all parts</span> in the local database
+                  </li>
+                )}
               </ul>
               <div className="mt-3 text-xs text-[var(--rb-dim)]">
                 Proceed only if the file is correct.
@@ -182,6 +403,44 @@ export default function ImportPage({ pushToast }) {
         />
       ) : null}
 
+      {/* Confirm: Workbook */}
+      {confirmWorkbookOpen ? (
+        <ConfirmModal
+          title="Import Parts and Orders?"
+          subtitle={
+            <>
+              File: <span className="font-mono text-[var(--rb-text)]">{workbookFile?.name}</span>
+            </>
+          }
+          body={
+            <>
+              For each sheet found, this will:
+              <ul className="mt-2 list-disc pl-5 space-y-1">
+                <li>
+                  Parts: export the wishlist first, then{" "}
+                  <span className="font-semibold text-[var(--rb-text)]">
+                    {partsDiff ? "apply only added, changed and removed parts" : "replace all parts"}
+                  </span>
+                </li>
+                <li>
+                  Orders: <span className="font-semibold text-[var(--rb-text)]">replace all orders</span>
+                </li>
+              </ul>
+              <div className="mt-3 text-xs text-[var(--rb-dim)]">
+                Proceed only if the file is correct.
+              </div>
+            </>
+          }
+          confirmLabel={busyWorkbook ? "Importing…" : "Import Workbook"}
+          busy={busyWorkbook}
+          onCancel={() => setConfirmWorkbookOpen(false)}
+          onConfirm={async () => {
+            setConfirmWorkbookOpen(false);
+            await importWorkbook();
+          }}
+        />
+      ) : null}
+
       {/* Confirm: Orders */}
       {confirmOrdersOpen ? (
         <ConfirmModal
@@ -213,7 +472,22 @@ export default function ImportPage({ pushToast }) {
   );
 }
 
-function Section({ title, subtitle, file, setFile, busy, onRequest, buttonLabel }) {
+function ReimportOption({ checked, onChange, disabled }) {
+  return (
+    <label className="flex items-start gap-2 text-sm text-[var(--rb-muted)]">
+      <input
+        type="checkbox"
+        checked={checked}
+        onChange={(e) => onChange(e.target.checked)}
+        disabled={disabled}
+        className="mt-1"
+      />
+      <span>Import again even if the file is the same as the last import.</span>
+    </label>
+  );
+}
+
+function Section({ title, subtitle, file, setFile, accept = ".xlsx,.csv,.tsv", busy, onCheck, onRequest, buttonLabel, children }) {
   return (
     <div className="border border-[var(--rb-border)] rounded-2xl bg-[var(--rb-surface)]/20 p-4 space-y-4">
       <div>
@@ -222,10 +496,10 @@ function Section({ title, subtitle, file, setFile, busy, onRequest, buttonLabel
       </div>
 
       <div className="space-y-2">
-        <label className="text-sm font-medium text-[var(--rb-text)]">Excel file (.xlsx)</label>
+        <label className="text-sm font-medium text-[var(--rb-text)]">Export file (.xlsx, .csv or .tsv)</label>
         <input
           type="file"
-          accept=".xlsx"
+          accept={accept}
           onChange={(e) => setFile(e.target.files?.[0] || null)}
           className="block w-full text-sm text-[var(--rb-muted)]
             file:mr-4 file:py-2 file:px-4
@@ -241,18 +515,31 @@ function Section({ title, subtitle, file, setFile, busy, onRequest, buttonLabel
         ) : null}
       </div>
 
-      <button
-        onClick={onRequest}
-        disabled={busy}
-        className={[
-          "w-full sm:w-auto px-5 py-3 rounded-2xl text-sm font-extrabold border transition",
-          busy
-            ? "bg-[var(--rb-surface)]/10 border-[var(--rb-border)] text-white/35 cursor-not-allowed"
-            : "bg-[var(--rb-base)] border-[var(--rb-accent)]/45 text-[var(--rb-text)] hover:bg-[var(--rb-base)]/85 ring-1 ring-[var(--rb-accent)]/35",
-        ].join(" ")}
-      >
-        {buttonLabel}
-      </button>
+      {children}
+
+      <div className="flex flex-col sm:flex-row gap-3">
+        <button
+          onClick={onRequest}
+          disabled={busy}
+          className={[
+            "w-full sm:w-auto px-5 py-3 rounded-2xl text-sm font-extrabold border transition",
+            busy
+              ? "bg-[var(--rb-surface)]/10 border-[var(--rb-border)] text-white/35 cursor-not-allowed"
+              : "bg-[var(--rb-base)] border-[var(--rb-accent)]/45 text-[var(--rb-text)] hover:bg-[var(--rb-base)]/85 ring-1 ring-[var(--rb-accent)]/35",
+          ].join(" ")}
+        >
+          {buttonLabel}
+        </button>
+        {onCheck ? (
+          <button
+            onClick={onCheck}
+            disabled={busy}
+            className="w-full sm:w-auto px-5 py-3 rounded-2xl bg-[var(--rb-surface)]/20 hover:bg-[var(--rb-surface)]/35 border border-[var(--rb-border)] text-sm font-semibold text-[var(--rb-muted)] transition disabled:opacity-50"
+          >
+            Check file (no import)
+          </button>
+        ) : null}
+      </div>
     </div>
   );
 }
@@ -302,6 +589,91 @@ function ConfirmModal({ title, subtitle, body, confirmLabel, busy, onCancel, onC
   );
 }
 
+function JobProgress({ job, onCancel }) {
+  const pct = job.total ? Math.min(100, Math.round((job.rows / job.total) * 100)) : null;
+  return (
+    <div className="border border-[var(--rb-border)] rounded-2xl bg-[var(--rb-surface)]/20 p-4 space-y-3">
+      <div className="flex items-center justify-between gap-3">
+        <div className="text-sm font-semibold text-[var(--rb-text)]">
+          {PHASE_LABELS[job.phase] || job.phase}
+          {job.cancel_requested ? " (cancelling…)" : ""}
+        </div>
+        <button
+          onClick={onCancel}
+          disabled={job.cancel_requested || !job.cancellable}
+          className="px-4 py-2 rounded-xl bg-[var(--rb-surface)]/20 hover:bg-[var(--rb-surface)]/35 border border-[var(--rb-border)] text-sm font-semibold text-[var(--rb-muted)] transition disabled:opacity-50"
+        >
+          Cancel
+        </button>
+      </div>
+      {pct !== null ? (
+        <div className="h-2 rounded-full bg-[var(--rb-surface)]/40 overflow-hidden">
+          <div className="h-full bg-[var(--rb-accent)]" style={{ width: `${pct}%` }} />
+        </div>
+      ) : null}
+      <div className="text-xs text-[var(--rb-muted)]">
+        {job.rows ? `${job.rows.toLocaleString()}${job.total ? ` / ${job.total.toLocaleString()}` : ""} rows` : null}
+        {job.eta_s != null ? ` · about ${Math.ceil(job.eta_s)} s left` : null}
+      </div>
+    </div>
+  );
+}
+
+function CheckReport({ title, report }) {
+  const problems = report.columns.filter((c) => c.present && (c.invalid || c.empty));
+  return (
+    <div className="border border-[var(--rb-border)] rounded-2xl bg-[var(--rb-surface)]/20 p-4 space-y-3">
+      <h3 className="text-sm font-semibold text-[var(--rb-text)]">
+        {title}: {report.ok ? "no errors" : "errors found"}
+      </h3>
+      <div className="grid grid-cols-1 sm:grid-cols-2 gap-2 text-sm text-[var(--rb-muted)]">
+        <ResultRow label="Rows" value={String(report.rows)} />
+        <ResultRow label="Rows to import" value={String(report.rows_to_import)} />
+        {report.duplicate_numbers.sample.length ? (
+          <ResultRow label="Repeated numbers" value={report.duplicate_numbers.sample.join(", ")} mono />
+        ) : null}
+        {report.ignored_columns.length ? (
+          <ResultRow label="Ignored columns" value={report.ignored_columns.join(", ")} />
+        ) : null}
+      </div>
+      {[...report.errors, ...report.warnings].length ? (
+        <ul className="list-disc pl-5 space-y-1 text-sm">
+          {report.errors.map((msg) => (
+            <li key={msg} className="text-[var(--rb-accent)] font-semibold">{msg}</li>
+          ))}
+          {report.warnings.map((msg) => (
+            <li key={msg} className="text-[var(--rb-text)]">{msg}</li>
+          ))}
+        </ul>
+      ) : null}
+      {problems.length ? (
+        <table className="w-full text-xs text-[var(--rb-muted)]">
+          <thead>
+            <tr className="text-left text-[var(--rb-dim)]">
+              <th className="py-1">Column</th>
+              <th className="py-1">Empty</th>
+              <th className="py-1">Distinct</th>
+              <th className="py-1">Not a number</th>
+            </tr>
+          </thead>
+          <tbody>
+            {problems.map((c) => (
+              <tr key={c.header} className="border-t border-[var(--rb-border)]">
+                <td className="py-1 text-[var(--rb-text)]">{c.header}</td>
+                <td className="py-1">{c.empty}</td>
+                <td className="py-1">{c.distinct_exact ? c.distinct : `~${c.distinct}`}</td>
+                <td className="py-1 font-mono">
+                  {c.invalid ? `${c.invalid} (${c.invalid_sample.join(", ")})` : ""}
+                </td>
+              </tr>
+            ))}
+          </tbody>
+        </table>
+      ) : null}
+    </div>
+  );
+}
+
 function ResultCard({ title, children }) {
   return (
     <div className="border border-[var(--rb-border)] rounded-2xl bg-[var(--rb-surface)]/20 p-4">
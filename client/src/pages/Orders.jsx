@@ -1,33 +1,62 @@
-import { useEffect, useMemo, useState } from "react";
-import { apiGet } from "../api.js";
+import { useEffect, useState } from "react";
+import { apiGetPage } from "../api.js";
+
+const SORT_LABELS = {
+  created: "Created",
+  ordered: "Ordered",
+  received: "Received",
+};
 
 export default function Orders() {
   const [rows, setRows] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
   const [q, setQ] = useState("");
+  const [sort, setSort] = useState("created");
+  const [status, setStatus] = useState(null);
+  const [vendor, setVendor] = useState(null);
+  const [from, setFrom] = useState("");
+  const [to, setTo] = useState("");
+
+  const debouncedQ = useDebounced(q, 250);
+
+  // Filtering, search and paging run on the server (`/api/orders`); the date
+  // range applies to the date the list is sorted by.
+  function ordersUrl(after) {
+    const params = new URLSearchParams({ q: debouncedQ, sort, limit: "100" });
+    if (status) params.set("status", status);
+    if (vendor) params.set("vendor", vendor);
+    if (from) params.set(`${sort}_from`, from);
+    if (to) params.set(`${sort}_to`, to);
+    if (after) params.set("after", after);
+    return `/api/orders?${params}`;
+  }
 
   async function load() {
     setLoading(true);
     try {
-      const data = await apiGet("/api/orders?limit=200");
+      const { data, next } = await apiGetPage(ordersUrl());
       setRows(data);
+      setNextCursor(next);
     } finally {
       setLoading(false);
     }
   }
 
-  useEffect(() => { load(); }, []);
+  async function loadMore() {
+    if (!nextCursor) return;
+    try {
+      const { data, next } = await apiGetPage(ordersUrl(nextCursor));
+      setRows((prev) => [...prev, ...data]);
+      setNextCursor(next);
+    } catch (e) {
+      console.error(e);
+    }
+  }
 
-  const filtered = useMemo(() => {
-    const s = q.trim().toLowerCase();
-    if (!s) return rows;
-    return rows.filter((o) =>
-      (o.number || "").toLowerCase().includes(s) ||
-      (o.title || "").toLowerCase().includes(s) ||
-      (o.vendor || "").toLowerCase().includes(s) ||
-      (o.form_status || "").toLowerCase().includes(s)
-    );
-  }, [rows, q]);
+  useEffect(() => {
+    load();
+  }, [debouncedQ, sort, status, vendor, from, to]); // eslint-disable-line react-hooks/exhaustive-deps
 
   return (
     <div className="space-y-5">
@@ -47,21 +76,58 @@ export default function Orders() {
       <input
         value={q}
         onChange={(e) => setQ(e.target.value)}
-        placeholder="Filter by number, title, vendor, status…"
+        placeholder="Search order number, title, details…"
         className="w-full bg-slate-950 border border-slate-800 rounded-2xl px-4 py-3 text-sm outline-none focus:border-slate-600"
       />
 
+      <div className="flex flex-wrap items-center gap-3 text-sm text-slate-300">
+        <label className="flex items-center gap-2">
+          Sort by
+          <select
+            value={sort}
+            onChange={(e) => setSort(e.target.value)}
+            className="bg-slate-950 border border-slate-800 rounded-xl px-3 py-2"
+          >
+            {Object.entries(SORT_LABELS).map(([value, label]) => (
+              <option key={value} value={value}>{label}</option>
+            ))}
+          </select>
+        </label>
+        <label className="flex items-center gap-2">
+          From
+          <input
+            type="date"
+            value={from}
+            onChange={(e) => setFrom(e.target.value)}
+            className="bg-slate-950 border border-slate-800 rounded-xl px-3 py-2"
+          />
+        </label>
+        <label className="flex items-center gap-2">
+          To
+          <input
+            type="date"
+            value={to}
+            onChange={(e) => setTo(e.target.value)}
+            className="bg-slate-950 border border-slate-800 rounded-xl px-3 py-2"
+          />
+        </label>
+        {status ? <FilterChip label={`Status: ${status}`} onClear={() => setStatus(null)} /> : null}
+        {vendor ? <FilterChip label={`Vendor: ${vendor}`} onClear={() => setVendor(null)} /> : null}
+      </div>
+
       <div className="border border-slate-800 rounded-2xl overflow-hidden">
         <div className="bg-slate-900/40 border-b border-slate-800 px-4 py-3 text-sm text-slate-200 flex justify-between">
-          <span>{loading ? "Loading…" : `${filtered.length} orders`}</span>
-          <span className="text-slate-400 hidden sm:inline">Newest first</span>
+          <span>{loading ? "Loading…" : `${rows.length}${nextCursor ? "+" : ""} orders`}</span>
+          <span className="text-slate-400 hidden sm:inline">
+            Newest {SORT_LABELS[sort].toLowerCase()} first · click a status or vendor to filter
+          </span>
         </div>
 
         <div className="divide-y divide-slate-800">
-          {filtered.length === 0 ? (
+          {rows.length === 0 ? (
             <div className="p-4 text-sm text-slate-400">No orders.</div>
           ) : (
-            filtered.map((o) => (
+            rows.map((o) => (
               <div key={o.number} className="p-4 bg-slate-950/20 hover:bg-slate-900/20 transition">
                 <div className="flex flex-col gap-2 sm:flex-row sm:items-start sm:justify-between">
                   <div className="min-w-0">
@@ -69,13 +135,26 @@ export default function Orders() {
                       <span className="text-xs font-mono text-slate-300 bg-slate-950 border border-slate-800 px-2 py-1 rounded-lg">
                         {o.number}
                       </span>
-                      {o.form_status ? <span className="text-xs text-slate-400">{o.form_status}</span> : null}
+                      {o.form_status ? (
+                        <button
+                          onClick={() => setStatus(o.form_status)}
+                          className="text-xs text-slate-400 hover:text-slate-200"
+                        >
+                          {o.form_status}
+                        </button>
+                      ) : null}
                     </div>
                     <div className="mt-2 text-base font-semibold leading-snug">
                       {o.title || <span className="text-slate-500 italic">No title</span>}
                     </div>
                     <div className="mt-1 text-sm text-slate-300">
-                      {o.vendor || <span className="text-slate-500 italic">No vendor</span>}
+                      {o.vendor ? (
+                        <button onClick={() => setVendor(o.vendor)} className="hover:text-slate-100 text-left">
+                          {o.vendor}
+                        </button>
+                      ) : (
+                        <span className="text-slate-500 italic">No vendor</span>
+                      )}
                     </div>
                   </div>
 
@@ -88,8 +167,36 @@ export default function Orders() {
               </div>
             ))
           )}
+          {nextCursor && (
+            <button
+              onClick={loadMore}
+              className="w-full px-4 py-3 text-sm font-medium text-slate-300 hover:bg-slate-900/40 transition"
+            >
+              Load more
+            </button>
+          )}
         </div>
       </div>
     </div>
   );
 }
+
+function FilterChip({ label, onClear }) {
+  return (
+    <span className="flex items-center gap-2 px-3 py-1 rounded-xl bg-slate-800 border border-slate-700 text-xs">
+      {label}
+      <button onClick={onClear} className="text-slate-400 hover:text-slate-100" aria-label="Clear filter">
+        ×
+      </button>
+    </span>
+  );
+}
+
+function useDebounced(value, delayMs) {
+  const [v, setV] = useState(value);
+  useEffect(() => {
+    const t = setTimeout(() => setV(value), delayMs);
+    return () => clearTimeout(t);
+  }, [value, delayMs]);
+  return v;
+}
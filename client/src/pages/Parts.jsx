@@ -1,11 +1,13 @@
 import { useEffect, useRef, useState } from "react";
-import { apiGet, apiPost } from "../api.js";
+import { apiGet, apiGetPage, apiPost } from "../api.js";
 import PartCard from "../components/PartCard.jsx";
 
 export default function Parts({ pushToast }) {
   const [q, setQ] = useState("");
   const [limit, setLimit] = useState(50);
   const [rows, setRows] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [suggestions, setSuggestions] = useState([]);
   const [loading, setLoading] = useState(false);
   const [searchField, setSearchField] = useState("all");
 
@@ -54,22 +56,62 @@ export default function Parts({ pushToast }) {
     );
   }
 
+  function partsUrl(after) {
+    const url = `/api/parts?q=${encodeURIComponent(debouncedQ)}&field=${searchField}&limit=${limit}`;
+    return after ? `${url}&after=${encodeURIComponent(after)}` : url;
+  }
+
   async function load() {
     setLoading(true);
     try {
-        const data = await apiGet(
-          `/api/parts?q=${encodeURIComponent(debouncedQ)}&field=${searchField}&limit=${limit}`
-        );
+      const { data, next } = await apiGetPage(partsUrl());
       setRows(data);
+      setNextCursor(next);
     } finally {
       setLoading(false);
     }
   }
 
+  async function loadMore() {
+    if (!nextCursor) return;
+    try {
+      const { data, next } = await apiGetPage(partsUrl(nextCursor));
+      setRows((prev) => [...prev, ...data]);
+      setNextCursor(next);
+    } catch (e) {
+      console.error(e);
+    }
+  }
+
   useEffect(() => {
     load();
   }, [debouncedQ, limit, searchField]); // eslint-disable-line react-hooks/exhaustive-deps
 
+  // Suggestions come from an in-memory prefix index, so they are fetched on
+  // every keystroke instead of waiting for the debounced search.
+  useEffect(() => {
+    const prefix = q.trim();
+    if (!prefix) {
+      setSuggestions([]);
+      return;
+    }
+    let stale = false;
+    apiGet(`/api/parts/suggest?prefix=${encodeURIComponent(prefix)}`)
+      .then((res) => {
+        if (stale) return;
+        const kinds = {
+          all: [res.numbers, res.names, res.locations],
+          name: [res.names],
+          location: [res.locations],
+        }[searchField] ?? [];
+        setSuggestions([...new Set(kinds.flat())]);
+      })
+      .catch(() => {});
+    return () => {
+      stale = true;
+    };
+  }, [q, searchField]);
+
   async function toggleWishlist(partNumber) {
     try {
       const res = await apiPost(`/api/wishlist/toggle/${encodeURIComponent(partNumber)}`);
@@ -104,12 +146,25 @@ export default function Parts({ pushToast }) {
     return () => window.removeEventListener("keydown", handleKeyDown);
   }, []);
 
-  function onScanKeyDown(e) {
-    if (e.key === "Enter") {
-      const val = e.currentTarget.value.trim();
-      if (val) setQ(val);
-      e.currentTarget.value = "";
+  // Scanned codes are resolved by exact lookup; fall back to a normal search
+  // if the code is not an EAN, part number or maker's reference.
+  async function onScanKeyDown(e) {
+    if (e.key !== "Enter") return;
+    const val = e.currentTarget.value.trim();
+    e.currentTarget.value = "";
+    if (!val) return;
+
+    try {
+      const res = await apiGet(`/api/parts/lookup/${encodeURIComponent(val)}`);
+      if (res.parts.length) {
+        setRows(res.parts);
+        setNextCursor(null);
+        return;
+      }
+    } catch (err) {
+      console.error(err);
     }
+    setQ(val);
   }
 
   // Filter by Stock Class field: Engine = "E", Electric = "EL"
@@ -201,9 +256,15 @@ export default function Parts({ pushToast }) {
               ref={searchRef}
               value={q}
               onChange={(e) => setQ(e.target.value)}
+              list="parts-suggest"
               placeholder={placeholderMap[searchField]}
               className="w-full bg-[var(--rb-surface)]/30 border border-[var(--rb-border)] rounded-2xl px-4 py-3 text-sm text-black placeholder:text-black/40 outline-none focus:ring-2 focus:ring-[var(--rb-accent)]/35"
             />
+            <datalist id="parts-suggest">
+              {suggestions.map((s) => (
+                <option key={s} value={s} />
+              ))}
+            </datalist>
             <button
               onClick={load}
               className="px-5 py-3 rounded-2xl bg-[var(--rb-base)] border border-[var(--rb-border)] text-sm font-semibold text-[var(--rb-text)] hover:bg-[var(--rb-surface)]/70 transition"
@@ -233,6 +294,14 @@ export default function Parts({ pushToast }) {
                   />
                 ))
               )}
+              {nextCursor && (
+                <button
+                  onClick={loadMore}
+                  className="w-full px-4 py-2 rounded-xl text-base font-semibold border bg-[var(--rb-surface)]/40 border-[var(--rb-border)] text-[var(--rb-muted)] hover:bg-[var(--rb-base)]/70 hover:text-[var(--rb-text)] transition"
+                >
+                  Load more
+                </button>
+              )}
             </div>
           )}
         </div>
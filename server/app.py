@@ -10,25 +10,50 @@ Provides endpoints for:
 Designed to run on a Raspberry Pi kiosk environment with optional USB export.
 """
 
+import base64
+import json
+import sqlite3
+import threading
 from pathlib import Path
-from datetime import datetime, timezone
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from datetime import date, datetime, timedelta, timezone
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 # from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
 
-from db import init_db, get_conn
-from import_excel import import_parts_replace_all, import_orders_replace_all
+from db import init_db, get_conn, enable_wal
+import dal
+from dal import Busy, run_db, run_io, run_write, write
+from search_index import FIELD_COLUMNS, build_match_rowids, build_relevance
+from orders_search import ORDERS_DATE_FILTERS, ORDERS_SORT_KEYS, build_orders_match
+from fuzzy import fuzzy_alternatives
+from search_engine import engine
+from part_lookup import resolve_code
+from suggest import suggestions
+from cache import PART_STATE_TABLES, bump, cached, result_cache
+from import_excel import (
+    DELIMITED_SUFFIXES,
+    import_orders_replace_all,
+    import_parts_diff,
+    import_parts_replace_all,
+    import_workbook,
+    parts_replace_running,
+)
+from import_jobs import ImportJob, jobs
+from import_history import find_duplicate, list_history, record_import
+from import_profile import profile_file, profile_workbook
+from uploads import UploadTooLarge, save_upload
 from export_rob import export_rob_xlsx
 from export_locations import export_locations_xlsx
 
 from usb import find_usb_mount
 from export_wishlist import export_wishlist_xlsx
-from config import SPARES_ENV, get_export_dir
+from config import SPARES_ENV, SEARCH_ENGINE, get_export_dir
 
 # Logging and metrics
 from logging_setup import setup_logging
-from middleware import RequestContextLoggingMiddleware
+from middleware import RequestContextLoggingMiddleware, UploadSizeLimitMiddleware
 from metrics import init_metrics_table, record_request, flush
 import structlog
 
@@ -39,9 +64,32 @@ app = FastAPI(
 
 # Logging middleware is added before any routes to ensure all requests are logged, including unmatched routes.
 logger = setup_logging()
+# Added first so it runs inside the logging middleware and its 413s are logged.
+app.add_middleware(UploadSizeLimitMiddleware)
 app.add_middleware(RequestContextLoggingMiddleware)
 
+
+@app.exception_handler(Busy)
+async def busy_handler(request: Request, exc: Busy):
+    """A dal.py lane is full: ask the client to retry instead of queueing."""
+    logger.warning("request_rejected_busy", lane=exc.lane, path=request.url.path)
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+
 BASE = Path(__file__).resolve().parent
+
+IMPORT_SUFFIXES = (".xlsx", *DELIMITED_SUFFIXES)
+
+# Parts columns returned by the API; parts.row_hash is internal to diff imports.
+PART_COLUMNS = ", ".join(f"p.{c}" for c in (
+    "number", "name", "qa_grading", "maker_code", "makers_reference", "unit",
+    "pref_vendor_code", "order_status", "default_location", "stock_class",
+    "stock_class_description", "reserved", "price_class", "asset", "hm",
+    "attachments", "weight_unit", "weight", "alternative_available",
+    "imported_at", "ean", "effective_location",
+))
+
+
 class RobIn(BaseModel):
     """
     Payload model for setting or adjusting ROB (Remaining On Board).
@@ -63,89 +111,429 @@ def startup():
     """
     Initialize the application on startup.
 
-    If the database file does not exist in the application directory,
-    the database schema will be created by calling `init_db()`.
+    `init_db()` creates the database if it does not exist and applies any
+    pending migrations (db_migrate.py), so an updated install needs no
+    manual `python db_migrate.py`.
     """
-    if not (BASE / "app.db").exists():
-        init_db()
+    applied = init_db()
+    if applied:
+        logger.info("migrations_applied", migrations=applied)
+    # Lets searches read the current catalog while an import job writes.
+    enable_wal()
     
     # Logging and metrics setup
     init_metrics_table()
-    logger.info("startup_complete", env=SPARES_ENV, db=str(BASE / "app.db"))
+
+    # Loading the catalog takes a while on a Pi; search falls back to SQL meanwhile.
+    threading.Thread(target=_load_memory_indexes, name="memory-indexes", daemon=True).start()
+
+    logger.info("startup_complete", env=SPARES_ENV, db=str(BASE / "app.db"), search_engine=SEARCH_ENGINE)
+
+def _rebuild_search_engine():
+    try:
+        engine.rebuild()
+    except Exception:
+        logger.error("search_engine_rebuild_failed", exc_info=True)
+
+
+def _rebuild_suggestions():
+    try:
+        suggestions.rebuild()
+    except Exception:
+        logger.error("suggest_index_rebuild_failed", exc_info=True)
+
+
+def _load_memory_indexes():
+    _rebuild_suggestions()
+    if SEARCH_ENGINE == "memory":
+        _rebuild_search_engine()
+
+
+def _after_parts_import():
+    """Refresh everything derived from the parts table."""
+    _load_memory_indexes()
+    # Removing parts cascades into wishlist, ROB and location overrides.
+    bump(*PART_STATE_TABLES)
+
 
 @app.on_event("shutdown")
 def shutdown():
+    jobs.shutdown()
+    dal.shutdown()
     flush()
     logger.info("shutdown_complete")
 
-@app.post("/api/import/parts")
-async def import_parts(file: UploadFile = File(...)):
+
+async def _save_import_upload(request: Request, file: UploadFile, kind: str) -> tuple[Path, dict]:
+    """
+    Stream an uploaded .xlsx/.csv/.tsv file to its own file (see uploads.py),
+    keeping the extension the import reads the format from.
+    """
+    suffix = Path(file.filename or "").suffix.lower()
+    if suffix not in IMPORT_SUFFIXES:
+        raise HTTPException(400, "Upload an .xlsx, .csv or .tsv file")
+    started = getattr(request.state, "started_at", None)
+    try:
+        return await run_io(save_upload, file.file, f"_{kind}_", suffix, started)
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
+
+
+async def _skip_duplicate(
+    kind: str, mode: str | None, tmp: Path, upload: dict, response: Response
+) -> dict | None:
+    """
+    If the upload is the same file as the last `kind` import, in `mode` or
+    as a replace, and no import has written its tables since (see
+    import_history.py), drop it and answer with that import's result.
+    """
+    previous = await run_db(find_duplicate, kind, upload["sha256"], mode)
+    if previous is None:
+        return None
+    tmp.unlink(missing_ok=True)
+    response.status_code = 200
+    logger.info("import_skipped_duplicate", kind=kind, sha256=upload["sha256"], previous_id=previous["id"])
+    return {
+        "status": "skipped",
+        "kind": kind,
+        "result": previous.pop("result"),
+        "duplicate_of": previous,
+        "upload": upload,
+    }
+
+
+def _submit_dry_run(kind: str, tmp: Path, upload: dict, work) -> dict:
     """
-    Replace all parts in the database with data from an uploaded Excel file.
+    Queue a dry run of a `kind` import (see import_profile.py). It writes
+    nothing and is not recorded in the import history, so it is never
+    skipped as a duplicate either.
+    """
+    job = jobs.submit(f"{kind}_dry_run", work, cleanup=lambda: tmp.unlink(missing_ok=True))
+    return {**job.to_dict(), "upload": upload}
+
+
+@app.post("/api/import/parts", status_code=202)
+async def import_parts(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    mode: str = "replace",
+    force: bool = False,
+    dry_run: bool = False,
+):
+    """
+    Replace or update the parts in the database from an uploaded Excel file.
 
-    The uploaded file must be an .xlsx file. The file is temporarily written
-    to disk, processed by `import_parts_replace_all`, and then removed.
+    The uploaded file must be an .xlsx file, or a .csv/.tsv export with the
+    same column headers (faster to parse). It is streamed to a temporary file
+    of its own and queued as a background job, which runs the import, refreshes
+    the search indexes and then removes the file. Searches keep being answered
+    from the current parts until the import commits.
+
+    If the file is byte-identical to the last parts import, and that import
+    used the same mode or replaced, nothing is queued (not even the wishlist
+    export) and the earlier result is returned.
 
     Args:
         file (UploadFile):
-            Excel file containing parts data.
+            Excel (or CSV/TSV) file containing parts data.
+        mode (str):
+            "replace" (default): `import_parts_replace_all`; deleting the old
+            parts also clears the wishlist, ROB and location overrides.
+            "diff": `import_parts_diff`; only added, changed and removed parts
+            are written and operator data of the remaining parts is kept.
+        force (bool):
+            Import even if the file is the same as the last one.
+        dry_run (bool):
+            Only check the file: `import_profile.profile_file` reads it once
+            and reports duplicate part numbers, rows without a number, and
+            per column empty cells, distinct values and numbers that do not
+            parse. Nothing is written.
 
     Returns:
         dict:
-            Result returned from `import_parts_replace_all`.
+            The queued job (see `/api/import/jobs/{job_id}`); once done, its
+            "result" is the import result, which for mode=diff includes the
+            added/changed/removed/unchanged counts, or the dry run report.
+            "upload" holds the upload size, timings, throughput and sha256.
+
+            For a skipped duplicate (status 200): status "skipped", the
+            earlier "result" and "duplicate_of", its import history entry.
 
     Raises:
         HTTPException(400):
-            If the uploaded file is not an .xlsx file.
+            If the uploaded file is not .xlsx/.csv/.tsv, or `mode` is unknown.
+        HTTPException(413):
+            If the file is larger than ROBOARD_MAX_UPLOAD_MB.
     """
-    if not file.filename.lower().endswith(".xlsx"):
-        raise HTTPException(400, "Upload an .xlsx file")
-    tmp = BASE / "_parts.xlsx"
-    tmp.write_bytes(await file.read())
-    try:
-        return import_parts_replace_all(tmp)
-    finally:
-        tmp.unlink(missing_ok=True)
+    mode = (mode or "replace").lower()
+    if mode not in ("replace", "diff"):
+        raise HTTPException(400, "mode must be 'replace' or 'diff'")
+    run_import = import_parts_diff if mode == "diff" else import_parts_replace_all
+    tmp, upload = await _save_import_upload(request, file, "parts")
+    if dry_run:
+        return _submit_dry_run("parts", tmp, upload, lambda job: profile_file(tmp, "parts", job))
+    if not force and (skipped := await _skip_duplicate("parts", mode, tmp, upload, response)):
+        return skipped
+
+    def work(job: ImportJob) -> dict:
+        result = run_import(tmp, job)
+        job.phase("refreshing")
+        _after_parts_import()
+        record_import("parts", upload, file.filename, mode, result["parts_imported"], result)
+        return result
+
+    job = jobs.submit("parts", work, cleanup=lambda: tmp.unlink(missing_ok=True))
+    return {**job.to_dict(), "upload": upload}
+
+
+@app.post("/api/import/orders", status_code=202)
+async def import_orders(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    force: bool = False,
+    dry_run: bool = False,
+):
+    """
+    Replace all orders in the database with data from an uploaded Excel file.
+
+    The uploaded file must be an .xlsx, .csv or .tsv file. It is streamed to a temporary file
+    of its own and queued as a background job, which runs
+    `import_orders_replace_all` and then removes the file. A file identical to
+    the last orders import is skipped, as for `/api/import/parts`.
 
+    Args:
+        file (UploadFile):
+            Excel (or CSV/TSV) file containing orders data.
+        force (bool):
+            Import even if the file is the same as the last one.
+        dry_run (bool):
+            Only check the file, as for `/api/import/parts`. Repeated order
+            numbers are reported as errors: they make the import fail.
+
+    Returns:
+        dict:
+            The queued job (see `/api/import/jobs/{job_id}`); once done, its
+            "result" is the result of `import_orders_replace_all` (or the dry
+            run report). "upload"
+            holds the upload size, timings, throughput and sha256. A skipped
+            duplicate returns status "skipped" with the earlier result (200).
 
-@app.post("/api/import/orders")
-async def import_orders(file: UploadFile = File(...)):
+    Raises:
+        HTTPException(400):
+            If the uploaded file is not .xlsx/.csv/.tsv.
+        HTTPException(413):
+            If the file is larger than ROBOARD_MAX_UPLOAD_MB.
     """
-    Replace all orders in the database with data from an uploaded Excel file.
+    tmp, upload = await _save_import_upload(request, file, "orders")
+    if dry_run:
+        return _submit_dry_run("orders", tmp, upload, lambda job: profile_file(tmp, "orders", job))
+    if not force and (skipped := await _skip_duplicate("orders", None, tmp, upload, response)):
+        return skipped
+
+    def work(job: ImportJob) -> dict:
+        result = import_orders_replace_all(tmp, job)
+        bump("orders")
+        record_import("orders", upload, file.filename, None, result["orders_imported"], result)
+        return result
+
+    job = jobs.submit("orders", work, cleanup=lambda: tmp.unlink(missing_ok=True))
+    return {**job.to_dict(), "upload": upload}
+
+
+@app.post("/api/import/workbook", status_code=202)
+async def import_workbook_sheets(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    mode: str = "replace",
+    force: bool = False,
+    dry_run: bool = False,
+):
+    """
+    Import every recognized sheet (Parts, Orders) of one uploaded workbook.
 
-    The uploaded file must be an .xlsx file. The file is temporarily written
-    to disk, processed by `import_orders_replace_all`, and then removed.
+    Unlike `/api/import/parts` and `/api/import/orders`, which read the first
+    sheet of their own upload, this picks the sheets by name, so one AMOS
+    export with both sheets is uploaded, unzipped and parsed once. All sheets
+    are staged and then made live together in one transaction
+    (`import_excel.import_workbook`); unrecognized sheets are skipped.
 
     Args:
         file (UploadFile):
-            Excel file containing orders data.
+            .xlsx workbook with sheets named Parts and/or Orders.
+        mode (str):
+            How the Parts sheet is applied: "replace" (default) or "diff",
+            as for `/api/import/parts`. Orders are always replaced.
+        force (bool):
+            Import even if the file is the same as the last workbook import.
+        dry_run (bool):
+            Only check the recognized sheets (`import_profile.profile_workbook`),
+            with a report per sheet kind under "sheets". Nothing is written.
 
     Returns:
         dict:
-            Result returned from `import_orders_replace_all`.
+            The queued job (see `/api/import/jobs/{job_id}`); once done, its
+            "result" holds the counts per sheet kind under "sheets" and the
+            names of skipped sheets under "sheets_skipped". A skipped
+            duplicate returns status "skipped" with the earlier result (200).
 
     Raises:
         HTTPException(400):
-            If the uploaded file is not an .xlsx file.
+            If the upload is not an .xlsx file, or `mode` is unknown.
+        HTTPException(413):
+            If the file is larger than ROBOARD_MAX_UPLOAD_MB.
     """
-    if not file.filename.lower().endswith(".xlsx"):
-        raise HTTPException(400, "Upload an .xlsx file")
-    tmp = BASE / "_orders.xlsx"
-    tmp.write_bytes(await file.read())
-    try:
-        return import_orders_replace_all(tmp)
-    finally:
-        tmp.unlink(missing_ok=True)
+    mode = (mode or "replace").lower()
+    if mode not in ("replace", "diff"):
+        raise HTTPException(400, "mode must be 'replace' or 'diff'")
+    if not (file.filename or "").lower().endswith(".xlsx"):
+        raise HTTPException(400, "Upload an .xlsx workbook")
+    tmp, upload = await _save_import_upload(request, file, "workbook")
+    if dry_run:
+        return _submit_dry_run("workbook", tmp, upload, lambda job: profile_workbook(tmp, job))
+    if not force and (skipped := await _skip_duplicate("workbook", mode, tmp, upload, response)):
+        return skipped
+
+    def work(job: ImportJob) -> dict:
+        result = import_workbook(tmp, mode, job)
+        sheets = result["sheets"]
+        if "parts" in sheets:
+            job.phase("refreshing")
+            _after_parts_import()
+        if "orders" in sheets:
+            bump("orders")
+        rows = sum(counts["rows_attempted"] for counts in sheets.values())
+        record_import("workbook", upload, file.filename, mode, rows, result)
+        return result
+
+    job = jobs.submit("workbook", work, cleanup=lambda: tmp.unlink(missing_ok=True))
+    return {**job.to_dict(), "upload": upload}
+
+
+@app.get("/api/import/history")
+async def import_history(kind: str | None = None, limit: int = 20):
+    """
+    Completed imports, newest first.
+
+    Args:
+        kind (str | None):
+            "parts" or "orders"; both if omitted.
+        limit (int):
+            Maximum number of entries (1-200).
+
+    Returns:
+        list[dict]:
+            id, kind, sha256, filename, mode, bytes, rows, duration_s and
+            imported_at of each import.
+    """
+    return await run_db(list_history, kind, max(1, min(limit, 200)))
+
+
+@app.get("/api/import/jobs")
+async def list_import_jobs():
+    """
+    List queued, running and recently finished import jobs, newest first.
+
+    Returns:
+        list[dict]:
+            Jobs as returned by `/api/import/jobs/{job_id}`.
+    """
+    return [job.to_dict() for job in jobs.list()]
+
+
+@app.get("/api/import/jobs/{job_id}")
+async def get_import_job(job_id: str):
+    """
+    Progress of an import job.
+
+    Args:
+        job_id (str):
+            Id returned when the import was submitted.
+
+    Returns:
+        dict:
+            - status: "queued", "running", "done", "failed" or "cancelled"
+            - phase: current step, e.g. "importing" or "indexing"
+            - rows / total: rows written in this phase and the expected
+              count (from the sheet's stored size, if present)
+            - eta_s: estimated seconds left in this phase, if known
+            - result: the import result once done; error if failed
+
+    Raises:
+        HTTPException(404):
+            If the job is unknown (or has dropped out of the history).
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Import job not found")
+    return job.to_dict()
+
+
+@app.post("/api/import/jobs/{job_id}/cancel")
+async def cancel_import_job(job_id: str):
+    """
+    Cancel a queued or running import job.
+
+    The job stops at its next batch and rolls back, leaving the previous data
+    in place. Once it has started applying the staged data (e.g. the parts
+    swap) it can no longer be cancelled.
+
+    Args:
+        job_id (str):
+            Id returned when the import was submitted.
+
+    Returns:
+        dict:
+            The job, with "cancel_requested" set.
+
+    Raises:
+        HTTPException(404):
+            If the job is unknown.
+        HTTPException(409):
+            If the job is already committing or has finished.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(404, "Import job not found")
+    if not job.cancel():
+        if job.status == "running":
+            raise HTTPException(409, "Import job is already committing and can no longer be cancelled")
+        raise HTTPException(409, f"Import job already {job.status}")
+    return job.to_dict()
 
 
 @app.get("/api/parts")
-def search_parts(q: str = "", field: str = "all", limit: int = 50):
+async def search_parts(
+    response: Response,
+    q: str = "",
+    field: str = "all",
+    limit: int = 50,
+    after: str | None = None,
+    mode: str = "prefix",
+    sort: str = "location",
+):
     """
     Search parts in the database.
 
     If no query is provided, returns a limited list of all parts.
-    If a query is provided, performs a tokenized LIKE-based search (order independent)
-    on the selected field.
+    With ROBOARD_SEARCH_ENGINE=memory (the default) matching runs against the
+    in-process catalog in search_engine.py and only the returned page is read
+    from SQLite. Otherwise, or while that catalog is still loading, the query
+    runs against the FTS indexes.
+
+    If a query is provided, performs a tokenized full-text search (order independent)
+    on the selected field using the `parts_fts` index. Each token matches the start
+    of a word, e.g. "pump" or "123.45". For part numbers, maker's references and
+    EANs a token of three or more characters also matches anywhere inside the
+    value through the `parts_trigram` index.
+
+    Results are ordered by effective location (override, else default) and part
+    number. When a page is full, the `X-Next-Cursor` response header holds an
+    opaque cursor; pass it back as `after` to get the next page. Pages are read
+    from the `idx_parts_effective_location` index, so deep pages cost the same
+    as the first one.
 
     Args:
         q (str):
@@ -158,11 +546,30 @@ def search_parts(q: str = "", field: str = "all", limit: int = 50):
                 - "ean"
                 - "all" (default)
         limit (int):
-            Maximum number of results to return.
+            Maximum number of results to return (page size, at most 200).
+        after (str | None):
+            Cursor from the previous page's `X-Next-Cursor` header.
+        mode (str):
+            "prefix" (default) or "fuzzy". Fuzzy also lets a word token match
+            name words a typo or two away (see fuzzy.py), within a fixed time
+            and candidate budget. It always runs against the SQLite indexes.
+        sort (str):
+            "location" (default) or "relevance". Relevance ranks a query's
+            matches best first: a token that is a whole part number or EAN
+            wins, then BM25 over the index with identifying columns weighted
+            above the name and locations, plus a boost for tokens found next
+            to each other. Each row then carries its "relevance" score (lower
+            is better). Without a query, or in memory mode with sort=location,
+            ordering is by location. Relevance always runs against SQLite.
 
     Returns:
         list[dict]:
             List of parts including wishlist status, ROB, and location override info.
+
+    Raises:
+        HTTPException(400):
+            If `after` is not a cursor returned by this endpoint, or `mode`
+            is unknown.
     """
     q = (q or "").strip()
     field = (field or "all").lower()
@@ -173,112 +580,114 @@ def search_parts(q: str = "", field: str = "all", limit: int = 50):
         limit = 50
     limit = max(1, min(limit, 200))
 
-    tokens = [t for t in q.split() if t]
-    print("TOKENS:", tokens, "FIELD:", field)
+    if field not in FIELD_COLUMNS:
+        field = "all"
+    mode = (mode or "prefix").lower()
+    if mode not in ("prefix", "fuzzy"):
+        raise HTTPException(400, "mode must be 'prefix' or 'fuzzy'")
+    sort = (sort or "location").lower()
+    if sort not in ("location", "relevance"):
+        raise HTTPException(400, "sort must be 'location' or 'relevance'")
 
-    conn = get_conn()
+    # Matching is case-insensitive and order independent, so differently
+    # typed versions of the same query share one cache entry.
+    tokens = tuple(sorted({t.lower() for t in q.split()}))
+    ranked = sort == "relevance" and bool(tokens)
+
+    cursor = _decode_cursor(after, ranked) if after else None
+    rows = await run_db(_search_parts, tokens, field, limit, cursor, mode, ranked)
+
+    if len(rows) == limit:
+        last = rows[-1]
+        key = [last["effective_location"], last["number"]]
+        if ranked:
+            key.insert(0, last["relevance"])
+        response.headers["X-Next-Cursor"] = _encode_cursor(key)
+    return rows
+
+
+def _encode_cursor(key: list) -> str:
+    raw = json.dumps(key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token: str, ranked: bool) -> tuple:
+    """
+    Decode a cursor into (effective_location, number), or
+    (relevance, effective_location, number) for a ranked search. Orders
+    cursors are (sort date, number).
+    """
     try:
-        if not tokens:
-            rows = conn.execute(
-                """
-                SELECT p.*,
-                    EXISTS(SELECT 1 FROM wishlist w WHERE w.part_number = p.number) AS wishlisted,
-                    r.rob AS rob,
-                    r.updated_at AS rob_updated_at,
-                    lo.new_location AS overridden_location,
-                    lo.updated_at AS location_updated_at
-                FROM parts p
-                LEFT JOIN rob r ON r.part_number = p.number
-                LEFT JOIN location_overrides lo ON lo.part_number = p.number
-                ORDER BY COALESCE(lo.new_location, p.default_location), p.number
-                LIMIT ?
-                """,
-                (limit,),
-            ).fetchall()
-            return [dict(r) for r in rows]
-
-        params = []
-
-        def like_for(token: str) -> str:
-            return f"%{token}%"
-
-        if field == "name":
-            where_parts = []
-            for t in tokens:
-                where_parts.append("p.name LIKE ?")
-                params.append(like_for(t))
-            where = " AND ".join(where_parts)
-
-        elif field == "makers_ref":
-            where_parts = []
-            for t in tokens:
-                where_parts.append("p.makers_reference LIKE ?")
-                params.append(like_for(t))
-            where = " AND ".join(where_parts)
-
-        elif field == "location":
-            # Search both original location and overridden location
-            where_parts = []
-            for t in tokens:
-                where_parts.append("(p.default_location LIKE ? OR lo.new_location LIKE ?)")
-                like = like_for(t)
-                params.extend([like, like])
-            where = " AND ".join(where_parts)
-
-        elif field == "ean":
-            where_parts = []
-            for t in tokens:
-                where_parts.append("p.ean LIKE ?")
-                params.append(like_for(t))
-            where = " AND ".join(where_parts)
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise HTTPException(400, "Invalid cursor")
+
+    if not isinstance(key, list) or len(key) != (3 if ranked else 2):
+        raise HTTPException(400, "Invalid cursor")
+    if ranked:
+        score = key[0]
+        if isinstance(score, bool) or not isinstance(score, (int, float)):
+            raise HTTPException(400, "Invalid cursor")
+    if not all(isinstance(v, str) for v in key[-2:]):
+        raise HTTPException(400, "Invalid cursor")
+    return tuple(key)
+
+
+@cached(*PART_STATE_TABLES)
+def _search_parts(
+    tokens: tuple[str, ...],
+    field: str,
+    limit: int,
+    after: tuple | None,
+    mode: str,
+    ranked: bool,
+) -> list[dict]:
+    # The in-process engine only does prefix/substring matching in listing order.
+    if SEARCH_ENGINE == "memory" and mode == "prefix" and not ranked:
+        numbers = engine.search(list(tokens), field, limit, after)
+        if numbers is not None:
+            return _parts_by_number(numbers)
 
-        else:
-            # field == "all"
-            token_groups = []
-            for t in tokens:
-                like = like_for(t)
-
-                if t.isdigit() and len(t) >= 5:
-                    token_groups.append(
-                        "("
-                        "p.number LIKE ? OR "
-                        "REPLACE(p.number, '.', '') LIKE ? OR "
-                        "p.name LIKE ? OR "
-                        "p.makers_reference LIKE ? OR "
-                        "p.default_location LIKE ? OR "
-                        "lo.new_location LIKE ? OR "
-                        "p.ean LIKE ?"
-                        ")"
-                    )
-                    params.extend([like, like, like, like, like, like, like])
-                else:
-                    token_groups.append(
-                        "("
-                        "p.number LIKE ? OR "
-                        "p.name LIKE ? OR "
-                        "p.makers_reference LIKE ? OR "
-                        "p.default_location LIKE ? OR "
-                        "lo.new_location LIKE ? OR "
-                        "p.ean LIKE ?"
-                        ")"
-                    )
-                    params.extend([like, like, like, like, like, like])
-
-            where = " AND ".join(token_groups)
+    conn = get_conn()
+    try:
+        where: list[str] = []
+        params: list = []
+        alternatives = None
+
+        if tokens:
+            if mode == "fuzzy":
+                alternatives = fuzzy_alternatives(conn, list(tokens), field)
+            match = build_match_rowids(list(tokens), field, alternatives)
+            if match is None:
+                # Only punctuation was typed; nothing in the index can match it.
+                return []
+            match_sql, match_params = match
+            where.append(f"p.rowid IN ({match_sql})")
+            params.extend(match_params)
+
+        if ranked:
+            relevance = build_relevance(list(tokens), field, alternatives)
+            return _ranked_parts(conn, relevance, where, params, after, limit)
+
+        if after is not None:
+            where.append("(p.effective_location, p.number) > (?, ?)")
+            params.extend(after)
+
+        where_sql = ("WHERE " + " AND ".join(where)) if where else ""
 
         rows = conn.execute(
             f"""
-            SELECT p.*,
-                EXISTS(SELECT 1 FROM wishlist w WHERE w.part_number = p.number) AS wishlisted,
-                r.rob AS rob,
-                r.updated_at AS rob_updated_at,
-                lo.new_location AS overridden_location,
-                lo.updated_at AS location_updated_at
+            SELECT {PART_COLUMNS},
+                COALESCE(s.wishlisted, 0) AS wishlisted,
+                s.rob AS rob,
+                s.rob_updated_at AS rob_updated_at,
+                s.overridden_location AS overridden_location,
+                s.location_updated_at AS location_updated_at
             FROM parts p
-            LEFT JOIN rob r ON r.part_number = p.number
-            LEFT JOIN location_overrides lo ON lo.part_number = p.number
-            WHERE {where}
-            ORDER BY COALESCE(lo.new_location, p.default_location), p.number
+            LEFT JOIN parts_state s ON s.part_number = p.number
+            {where_sql}
+            ORDER BY p.effective_location, p.number
             LIMIT ?
             """,
             (*params, limit),
@@ -288,8 +697,163 @@ def search_parts(q: str = "", field: str = "all", limit: int = 50):
     finally:
         conn.close()
 
+
+def _ranked_parts(
+    conn: sqlite3.Connection,
+    relevance: tuple[str, str, str, list],
+    where: list[str],
+    params: list,
+    after: tuple | None,
+    limit: int,
+) -> list[dict]:
+    """
+    Run the search ordered by relevance score, then location and number.
+
+    Every match has to be scored before the best ones are known, so pages
+    after the first cost about the same as the first.
+    """
+    with_sql, join_sql, score_sql, score_params = relevance
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+
+    keyset = ""
+    keyset_params: tuple = ()
+    if after is not None:
+        keyset = "WHERE (relevance, effective_location, number) > (?, ?, ?)"
+        keyset_params = after
+
+    # Rank narrow rows first and join the display columns for one page only.
+    rows = conn.execute(
+        f"""
+        {with_sql},
+        ranked AS (
+            SELECT p.rowid AS part_rowid, p.effective_location, p.number,
+                {score_sql} AS relevance
+            FROM parts p
+            {join_sql}
+            {where_sql}
+        ),
+        page AS (
+            SELECT * FROM ranked
+            {keyset}
+            ORDER BY relevance, effective_location, number
+            LIMIT ?
+        )
+        SELECT {PART_COLUMNS},
+            COALESCE(s.wishlisted, 0) AS wishlisted,
+            s.rob AS rob,
+            s.rob_updated_at AS rob_updated_at,
+            s.overridden_location AS overridden_location,
+            s.location_updated_at AS location_updated_at,
+            k.relevance AS relevance
+        FROM page k
+        JOIN parts p ON p.rowid = k.part_rowid
+        LEFT JOIN parts_state s ON s.part_number = p.number
+        ORDER BY k.relevance, k.effective_location, k.number
+        """,
+        (*score_params, *params, *keyset_params, limit),
+    ).fetchall()
+    return [dict(r) for r in rows]
+
+
+@app.get("/api/parts/suggest")
+async def suggest_parts(prefix: str = "", limit: int = 8):
+    """
+    Complete what has been typed so far into names, part numbers and locations.
+
+    Served from the in-memory prefix arrays in suggest.py (no SQL per request),
+    so it is cheap enough to call on every keystroke. Matching is
+    case-insensitive; names also complete from the start of any word, part
+    numbers with or without dots.
+
+    Args:
+        prefix (str):
+            Text typed so far.
+        limit (int):
+            Maximum suggestions per kind (at most 20).
+
+    Returns:
+        dict:
+            - prefix: the prefix as given
+            - names, numbers, locations: lists of completions in
+              alphabetical order of the matched text
+    """
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = 8
+    limit = max(1, min(limit, 20))
+
+    return {"prefix": prefix, **suggestions.suggest(prefix, limit)}
+
+
+@app.get("/api/parts/lookup/{code}")
+async def lookup_part(code: str):
+    """
+    Resolve a scanned barcode or typed code to parts by exact match.
+
+    The code is tried as EAN, part number, part number without dots and
+    maker's reference, in that order; the first kind that matches wins.
+
+    Args:
+        code (str):
+            The scanned or typed code.
+
+    Returns:
+        dict:
+            - code: the code as looked up
+            - matched_on: "ean", "number", "number_compact",
+              "makers_reference", or None if nothing matched
+            - parts: matching parts in the same shape as /api/parts
+    """
+    code = (code or "").strip()
+    if not code:
+        raise HTTPException(400, "code is required")
+
+    return await run_db(_lookup_part, code)
+
+
+def _lookup_part(code: str) -> dict:
+    matched_on, numbers = resolve_code(code)
+    return {
+        "code": code,
+        "matched_on": matched_on,
+        "parts": _parts_by_number(numbers),
+    }
+
+
+def _parts_by_number(numbers: list[str]) -> list[dict]:
+    """
+    Load full part rows (with wishlist, ROB and override state) for the given
+    part numbers, keeping the order of `numbers`.
+    """
+    if not numbers:
+        return []
+
+    conn = get_conn()
+    try:
+        placeholders = ", ".join("?" for _ in numbers)
+        rows = conn.execute(
+            f"""
+            SELECT {PART_COLUMNS},
+                COALESCE(s.wishlisted, 0) AS wishlisted,
+                s.rob AS rob,
+                s.rob_updated_at AS rob_updated_at,
+                s.overridden_location AS overridden_location,
+                s.location_updated_at AS location_updated_at
+            FROM parts p
+            LEFT JOIN parts_state s ON s.part_number = p.number
+            WHERE p.number IN ({placeholders})
+            """,
+            numbers,
+        ).fetchall()
+    finally:
+        conn.close()
+
+    by_number = {r["number"]: dict(r) for r in rows}
+    return [by_number[n] for n in numbers if n in by_number]
+
 @app.get("/api/simple_parts")
-def simple_search_parts(q: str = "", field: str = "all", limit: int = 50):
+async def simple_search_parts(q: str = "", field: str = "all", limit: int = 50):
     """
     Search parts in the database.
 
@@ -321,24 +885,30 @@ def simple_search_parts(q: str = "", field: str = "all", limit: int = 50):
         limit = 50
 
     limit = max(1, min(limit, 200))
+    return await run_db(_simple_search_parts, q, field, limit)
+
 
+def _simple_search_parts(q: str, field: str, limit: int) -> list[dict]:
     conn = get_conn()
     try:
         if not q:
             rows = conn.execute(
-                """
-                SELECT p.*,
-                    EXISTS(SELECT 1 FROM wishlist w WHERE w.part_number = p.number) AS wishlisted,
-                    r.rob AS rob,
-                    r.updated_at AS rob_updated_at
+                f"""
+                SELECT {PART_COLUMNS},
+                    COALESCE(s.wishlisted, 0) AS wishlisted,
+                    s.rob AS rob,
+                    s.rob_updated_at AS rob_updated_at
                 FROM parts p
-                LEFT JOIN rob r ON r.part_number = p.number
+                LEFT JOIN parts_state s ON s.part_number = p.number
                 ORDER BY p.default_location, p.number
                 LIMIT ?
                 """,
                 (limit,),
             ).fetchall()
         else:
+            # NOT INDEXED: walking idx_parts_default_location in order would
+            # stop early on a common match, but read every part through the
+            # index when little matches (~10x slower than scan and sort).
             like = f"%{q}%"
 
             if field == "name":
@@ -365,12 +935,12 @@ def simple_search_parts(q: str = "", field: str = "all", limit: int = 50):
 
             rows = conn.execute(
                 f"""
-                SELECT p.*,
-                    EXISTS(SELECT 1 FROM wishlist w WHERE w.part_number = p.number) AS wishlisted,
-                    r.rob AS rob,
-                    r.updated_at AS rob_updated_at
-                FROM parts p
-                LEFT JOIN rob r ON r.part_number = p.number
+                SELECT {PART_COLUMNS},
+                    COALESCE(s.wishlisted, 0) AS wishlisted,
+                    s.rob AS rob,
+                    s.rob_updated_at AS rob_updated_at
+                FROM parts p NOT INDEXED
+                LEFT JOIN parts_state s ON s.part_number = p.number
                 WHERE {where}
                 ORDER BY p.default_location, p.number
                 LIMIT ?
@@ -382,8 +952,172 @@ def simple_search_parts(q: str = "", field: str = "all", limit: int = 50):
     finally:
         conn.close()
 
+
+@app.get("/api/orders")
+async def list_orders(
+    response: Response,
+    q: str = "",
+    status: str | None = None,
+    vendor: str | None = None,
+    created_from: str | None = None,
+    created_to: str | None = None,
+    ordered_from: str | None = None,
+    ordered_to: str | None = None,
+    received_from: str | None = None,
+    received_to: str | None = None,
+    sort: str = "created",
+    limit: int = 50,
+    after: str | None = None,
+):
+    """
+    List orders, newest first, with optional filters and text search.
+
+    Orders are ordered by the `sort` date (missing dates last), then number,
+    both descending. When a page is full, the `X-Next-Cursor` response header
+    holds an opaque cursor; pass it back as `after` for the next page. Every
+    listing order and filter has an index (see orders_search.py), so deep
+    pages cost the same as the first one.
+
+    Args:
+        q (str):
+            Words that must all start a word of the order number, title or
+            details (order independent), through the `orders_fts` index.
+        status (str | None):
+            Exact form status, e.g. "Ordered".
+        vendor (str | None):
+            Vendor name, ignoring case.
+        created_from, created_to, ordered_from, ordered_to, received_from, received_to (str | None):
+            Inclusive day ranges (YYYY-MM-DD) on the created, ordered and
+            received dates. Orders without that date are left out.
+        sort (str):
+            "created" (default), "ordered" or "received".
+        limit (int):
+            Maximum number of results to return (page size, at most 200).
+        after (str | None):
+            Cursor from the previous page's `X-Next-Cursor` header.
+
+    Returns:
+        list[dict]:
+            Order header rows.
+
+    Raises:
+        HTTPException(400):
+            If `sort` is unknown, a date is not YYYY-MM-DD, or `after` is not
+            a cursor returned by this endpoint.
+    """
+    sort = (sort or "created").lower()
+    if sort not in ORDERS_SORT_KEYS:
+        raise HTTPException(400, f"sort must be one of: {', '.join(ORDERS_SORT_KEYS)}")
+
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        limit = 50
+    limit = max(1, min(limit, 200))
+
+    bounds = {
+        "created": (created_from, created_to),
+        "ordered": (ordered_from, ordered_to),
+        "received": (received_from, received_to),
+    }
+    ranges = []
+    for col in ORDERS_DATE_FILTERS:
+        lo, hi = bounds[col]
+        if lo or hi:
+            ranges.append((col, _day(lo, f"{col}_from"), _next_day(hi, f"{col}_to")))
+
+    tokens = tuple(sorted({t.lower() for t in (q or "").split()}))
+    cursor = _decode_cursor(after, ranked=False) if after else None
+    rows = await run_db(
+        _list_orders,
+        tokens, (status or "").strip() or None, (vendor or "").strip() or None,
+        tuple(ranges), sort, limit, cursor,
+    )
+
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor([last[sort] or "", last["number"]])
+    return rows
+
+
+def _day(value: str | None, name: str) -> str | None:
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value.strip()).isoformat()
+    except ValueError:
+        raise HTTPException(400, f"{name} must be a date (YYYY-MM-DD)")
+
+
+def _next_day(value: str | None, name: str) -> str | None:
+    # Dates are stored as ISO text, often with a time: the day ends before the next one starts.
+    day = _day(value, name)
+    return (date.fromisoformat(day) + timedelta(days=1)).isoformat() if day else None
+
+
+@cached("orders")
+def _list_orders(
+    tokens: tuple[str, ...],
+    status: str | None,
+    vendor: str | None,
+    ranges: tuple,
+    sort: str,
+    limit: int,
+    after: tuple | None,
+) -> list[dict]:
+    where: list[str] = []
+    params: list = []
+
+    if tokens:
+        match = build_orders_match(list(tokens))
+        if match is None:
+            return []
+        where.append("rowid IN (SELECT rowid FROM orders_fts WHERE orders_fts MATCH ?)")
+        params.append(match)
+    if status:
+        where.append("form_status = ?")
+        params.append(status)
+    if vendor:
+        where.append("vendor = ? COLLATE NOCASE")
+        params.append(vendor)
+    # Ranges compare the indexed sort expressions; a missing date is ''.
+    for col, lo, hi in ranges:
+        key = ORDERS_SORT_KEYS[col]
+        if lo:
+            where.append(f"{key} >= ?")
+            params.append(lo)
+        else:
+            where.append(f"{key} > ''")
+        if hi:
+            where.append(f"{key} < ?")
+            params.append(hi)
+
+    key = ORDERS_SORT_KEYS[sort]
+    if after is not None:
+        # Spelled out: SQLite only seeks an expression index for a plain
+        # comparison on the expression, not for a row value.
+        where.append(f"{key} <= ? AND ({key} < ? OR number < ?)")
+        params.extend((after[0], *after))
+
+    where_sql = ("WHERE " + " AND ".join(where)) if where else ""
+    conn = get_conn()
+    try:
+        rows = conn.execute(
+            f"""
+            SELECT * FROM orders
+            {where_sql}
+            ORDER BY {key} DESC, number DESC
+            LIMIT ?
+            """,
+            (*params, limit),
+        ).fetchall()
+        return [dict(r) for r in rows]
+    finally:
+        conn.close()
+
+
 @app.get("/api/wishlist")
-def get_wishlist():
+async def get_wishlist():
     """
     Retrieve all parts currently in the wishlist.
 
@@ -391,21 +1125,25 @@ def get_wishlist():
         list[dict]:
             List of wishlisted parts including full part metadata.
     """
+    return await run_db(_wishlist_rows)
+
+
+@cached(*PART_STATE_TABLES)
+def _wishlist_rows() -> list[dict]:
     conn = get_conn()
     try:
         rows = conn.execute(
-            """
-            SELECT p.*,
+            f"""
+            SELECT {PART_COLUMNS},
                 1 AS wishlisted,
-                r.rob AS rob,
-                r.updated_at AS rob_updated_at,
-                lo.new_location AS overridden_location,
-                lo.updated_at AS location_updated_at
-            FROM wishlist w
-            JOIN parts p ON p.number = w.part_number
-            LEFT JOIN rob r ON r.part_number = p.number
-            LEFT JOIN location_overrides lo ON lo.part_number = p.number
-            ORDER BY COALESCE(lo.new_location, p.default_location), p.number
+                s.rob AS rob,
+                s.rob_updated_at AS rob_updated_at,
+                s.overridden_location AS overridden_location,
+                s.location_updated_at AS location_updated_at
+            FROM parts_state s
+            JOIN parts p ON p.number = s.part_number
+            WHERE s.wishlisted = 1
+            ORDER BY s.effective_location, s.part_number
             """
         ).fetchall()
         return [dict(r) for r in rows]
@@ -414,7 +1152,7 @@ def get_wishlist():
 
 
 @app.post("/api/wishlist/export")
-def export_and_clear_wishlist():
+async def export_and_clear_wishlist():
     """
     Export wishlist items to Excel and clear the wishlist.
 
@@ -432,6 +1170,10 @@ def export_and_clear_wishlist():
                 - number of rows exported
                 - confirmation that wishlist was cleared
     """
+    return await run_io(_export_and_clear_wishlist)
+
+
+def _export_and_clear_wishlist() -> dict:
     if SPARES_ENV == "dev":
         export_dir = get_export_dir(None)
         usb = None
@@ -447,12 +1189,7 @@ def export_and_clear_wishlist():
 
     out_path = export_wishlist_xlsx(export_dir)
 
-    conn = get_conn()
-    try:
-        conn.execute("DELETE FROM wishlist;")
-        conn.commit()
-    finally:
-        conn.close()
+    write(_clear_table, "wishlist", tables=("wishlist",))
 
     return {
         "exported_file": str(out_path),
@@ -464,7 +1201,7 @@ def export_and_clear_wishlist():
 
 
 @app.post("/api/wishlist/toggle/{part_number}")
-def toggle_wishlist(part_number: str):
+async def toggle_wishlist(part_number: str):
     """
     Toggle wishlist status for a given part.
 
@@ -482,31 +1219,50 @@ def toggle_wishlist(part_number: str):
     Raises:
         HTTPException(404):
             If the part does not exist.
+        HTTPException(503):
+            While a replace-all parts import runs.
     """
-    conn = get_conn()
-    try:
-        p = conn.execute("SELECT number FROM parts WHERE number = ?", (part_number,)).fetchone()
-        if not p:
-            raise HTTPException(404, "Part not found")
-
-        w = conn.execute("SELECT part_number FROM wishlist WHERE part_number = ?", (part_number,)).fetchone()
-        if w:
-            conn.execute("DELETE FROM wishlist WHERE part_number = ?", (part_number,))
-            conn.commit()
-            return {"part_number": part_number, "wishlisted": False}
-        else:
-            conn.execute(
-                "INSERT INTO wishlist(part_number, toggled_at) VALUES(?, datetime('now'))",
-                (part_number,),
-            )
-            conn.commit()
-            return {"part_number": part_number, "wishlisted": True}
-    finally:
-        conn.close()
+    return await run_write(_toggle_wishlist, part_number, tables=("wishlist",))
+
+
+def _toggle_wishlist(conn: sqlite3.Connection, part_number: str) -> dict:
+    _refuse_during_parts_replace()
+    p = conn.execute("SELECT number FROM parts WHERE number = ?", (part_number,)).fetchone()
+    if not p:
+        raise HTTPException(404, "Part not found")
+
+    w = conn.execute("SELECT part_number FROM wishlist WHERE part_number = ?", (part_number,)).fetchone()
+    if w:
+        conn.execute("DELETE FROM wishlist WHERE part_number = ?", (part_number,))
+        return {"part_number": part_number, "wishlisted": False}
+    else:
+        conn.execute(
+            "INSERT INTO wishlist(part_number, toggled_at) VALUES(?, datetime('now'))",
+            (part_number,),
+        )
+        return {"part_number": part_number, "wishlisted": True}
+
+
+def _refuse_during_parts_replace() -> None:
+    """
+    Writer commands on wishlist, ROB and location overrides call this first:
+    the swap of a running replace-all parts import clears those tables.
+    """
+    if parts_replace_running():
+        raise HTTPException(
+            status_code=503,
+            detail="A parts import is replacing the catalog, try again when it has finished",
+            headers={"Retry-After": "10"},
+        )
+
+
+def _clear_table(conn: sqlite3.Connection, table: str) -> None:
+    """Writer command emptying an operator table after its export."""
+    conn.execute(f"DELETE FROM {table};")
 
 
 @app.get("/api/rob")
-def get_rob_list():
+async def get_rob_list():
     """
     Retrieve all current ROB entries.
 
@@ -514,6 +1270,11 @@ def get_rob_list():
         list[dict]:
             List of parts with associated ROB values and last update timestamps.
     """
+    return await run_db(_rob_rows)
+
+
+@cached("parts", "rob")
+def _rob_rows() -> list[dict]:
     conn = get_conn()
     try:
         rows = conn.execute(
@@ -521,7 +1282,9 @@ def get_rob_list():
             SELECT p.number, p.name, p.makers_reference, p.default_location,
                 r.rob, r.updated_at
             FROM rob r
-            JOIN parts p ON p.number = r.part_number
+            -- CROSS JOIN keeps rob as the outer loop; otherwise SQLite may
+            -- walk all of parts through idx_parts_default_location to skip the sort.
+            CROSS JOIN parts p ON p.number = r.part_number
             ORDER BY p.default_location, p.number
             """
         ).fetchall()
@@ -531,7 +1294,7 @@ def get_rob_list():
 
 
 @app.post("/api/rob/export")
-def export_and_clear_rob():
+async def export_and_clear_rob():
     """
     Export ROB entries to Excel and clear all ROB records.
 
@@ -549,6 +1312,10 @@ def export_and_clear_rob():
                 - number of rows exported
                 - confirmation that ROB was cleared
     """
+    return await run_io(_export_and_clear_rob)
+
+
+def _export_and_clear_rob() -> dict:
     if SPARES_ENV == "dev":
         export_dir = get_export_dir(None)
         usb = None
@@ -564,12 +1331,7 @@ def export_and_clear_rob():
 
     out_path = export_rob_xlsx(export_dir)
 
-    conn = get_conn()
-    try:
-        conn.execute("DELETE FROM rob;")
-        conn.commit()
-    finally:
-        conn.close()
+    write(_clear_table, "rob", tables=("rob",))
 
     return {
         "exported_file": str(out_path),
@@ -581,7 +1343,7 @@ def export_and_clear_rob():
 
 
 @app.post("/api/rob/{part_number}")
-def set_rob(part_number: str, payload: RobIn):
+async def set_rob(part_number: str, payload: RobIn):
     """
     Set or adjust ROB for a specific part.
 
@@ -606,53 +1368,57 @@ def set_rob(part_number: str, payload: RobIn):
     Raises:
         HTTPException(404):
             If the part does not exist.
+        HTTPException(503):
+            While a replace-all parts import runs.
     """
-    conn = get_conn()
-    try:
-        p = conn.execute("SELECT number FROM parts WHERE number = ?", (part_number,)).fetchone()
-        if not p:
-            raise HTTPException(404, "Part not found")
-
-        val = float(payload.rob)
-
-        if val < 0:
-            old_row = conn.execute(
-                "SELECT rob FROM rob WHERE part_number = ?",
-                (part_number,),
-            ).fetchone()
-            old = float(old_row["rob"]) if old_row else 0.0
-            new_val = old + val
-        else:
-            new_val = val
+    return await run_write(_set_rob, part_number, float(payload.rob), tables=("rob",))
 
-        new_val = max(0.0, new_val)
 
-        conn.execute(
-            """
-            INSERT INTO rob(part_number, rob, updated_at)
-            VALUES(?, ?, datetime('now'))
-            ON CONFLICT(part_number) DO UPDATE SET
-            rob = excluded.rob,
-            updated_at = datetime('now')
-            """,
-            (part_number, new_val),
-        )
-        conn.commit()
+def _set_rob(conn: sqlite3.Connection, part_number: str, val: float) -> dict:
+    _refuse_during_parts_replace()
+    p = conn.execute("SELECT number FROM parts WHERE number = ?", (part_number,)).fetchone()
+    if not p:
+        raise HTTPException(404, "Part not found")
 
-        row = conn.execute(
-            "SELECT part_number, rob, updated_at FROM rob WHERE part_number = ?",
+    if val < 0:
+        old_row = conn.execute(
+            "SELECT rob FROM rob WHERE part_number = ?",
             (part_number,),
         ).fetchone()
+        old = float(old_row["rob"]) if old_row else 0.0
+        new_val = old + val
+    else:
+        new_val = val
 
-        return dict(row)
-    finally:
-        conn.close()
+    new_val = max(0.0, new_val)
+
+    conn.execute(
+        """
+        INSERT INTO rob(part_number, rob, updated_at)
+        VALUES(?, ?, datetime('now'))
+        ON CONFLICT(part_number) DO UPDATE SET
+        rob = excluded.rob,
+        updated_at = datetime('now')
+        """,
+        (part_number, new_val),
+    )
+
+    row = conn.execute(
+        "SELECT part_number, rob, updated_at FROM rob WHERE part_number = ?",
+        (part_number,),
+    ).fetchone()
+
+    return dict(row)
 
 @app.get("/api/locations")
-def list_location_overrides(q: str = "", limit: int = 200):
+async def list_location_overrides(q: str = "", limit: int = 200):
     q = (q or "").strip()
     limit = max(1, min(int(limit or 200), 500))
+    return await run_db(_location_override_rows, q, limit)
 
+
+@cached("parts", "location_overrides")
+def _location_override_rows(q: str, limit: int) -> list[dict]:
     conn = get_conn()
     try:
         if q:
@@ -686,7 +1452,7 @@ def list_location_overrides(q: str = "", limit: int = 200):
         conn.close()
 
 @app.post("/api/locations/set")
-def set_location_override(payload: LocationOverrideIn):
+async def set_location_override(payload: LocationOverrideIn):
     part_number = (payload.part_number or "").strip()
     new_location = (payload.new_location or "").strip()
     note = (payload.note or "").strip() or None
@@ -697,35 +1463,48 @@ def set_location_override(payload: LocationOverrideIn):
         raise HTTPException(status_code=400, detail="new_location is required")
 
     now = datetime.now(timezone.utc).isoformat()
+    return await run_write(
+        _set_location_override, part_number, new_location, note, now,
+        tables=("location_overrides",), on_commit=_location_override_set,
+    )
+
+
+def _set_location_override(
+    conn: sqlite3.Connection, part_number: str, new_location: str, note: str | None, now: str
+) -> dict:
+    _refuse_during_parts_replace()
+    # Ensure part exists (optional but sensible)
+    exists = conn.execute(
+        "SELECT 1 FROM parts WHERE number = ? LIMIT 1",
+        (part_number,),
+    ).fetchone()
+    if not exists:
+        raise HTTPException(status_code=404, detail="Part not found")
+
+    conn.execute(
+        """
+        INSERT INTO location_overrides (part_number, new_location, note, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(part_number) DO UPDATE SET
+            new_location=excluded.new_location,
+            note=excluded.note,
+            updated_at=excluded.updated_at
+        """,
+        (part_number, new_location, note, now),
+    )
+    return {"ok": True, "part_number": part_number, "new_location": new_location, "updated_at": now}
+
+
+def _location_override_set(result: dict) -> None:
+    engine.set_override(result["part_number"], result["new_location"])
+    suggestions.add_location(result["new_location"])
 
-    conn = get_conn()
-    try:
-        # Ensure part exists (optional but sensible)
-        exists = conn.execute(
-            "SELECT 1 FROM parts WHERE number = ? LIMIT 1",
-            (part_number,),
-        ).fetchone()
-        if not exists:
-            raise HTTPException(status_code=404, detail="Part not found")
+@app.post("/api/locations/export")
+async def export_location_overrides():
+    return await run_io(_export_location_overrides)
 
-        conn.execute(
-            """
-            INSERT INTO location_overrides (part_number, new_location, note, updated_at)
-            VALUES (?, ?, ?, ?)
-            ON CONFLICT(part_number) DO UPDATE SET
-                new_location=excluded.new_location,
-                note=excluded.note,
-                updated_at=excluded.updated_at
-            """,
-            (part_number, new_location, note, now),
-        )
-        conn.commit()
-        return {"ok": True, "part_number": part_number, "new_location": new_location, "updated_at": now}
-    finally:
-        conn.close()
 
-@app.post("/api/locations/export")
-def export_location_overrides():
+def _export_location_overrides() -> dict:
     if SPARES_ENV == "dev":
         export_dir = get_export_dir(None)
         usb = None
@@ -753,12 +1532,10 @@ def export_location_overrides():
     out_path = export_locations_xlsx(data, export_dir)
 
     # Clear location overrides after successful export
-    conn = get_conn()
-    try:
-        conn.execute("DELETE FROM location_overrides;")
-        conn.commit()
-    finally:
-        conn.close()
+    write(
+        _clear_table, "location_overrides",
+        tables=("location_overrides",), on_commit=lambda _: engine.clear_overrides(),
+    )
 
     return {
         "exported_file": str(out_path),
@@ -766,3 +1543,38 @@ def export_location_overrides():
         "usb_detected": bool(usb),
         "rows_exported": count,
     }
+
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """
+    Report result cache usage, for sizing ROBOARD_RESULT_CACHE_SIZE.
+
+    Returns:
+        dict:
+            Entry count and limit, hit/miss/eviction counters, entries
+            dropped because a table changed ("stale"), and the current
+            table versions.
+    """
+    return result_cache.stats()
+
+
+@app.get("/api/lanes/stats")
+async def get_lane_stats():
+    """
+    Report the thread pools the routes' blocking work runs on and the writer
+    thread that batches operator writes (see dal.py), for sizing
+    ROBOARD_DB_WORKERS / ROBOARD_IO_WORKERS and their queue limits, and
+    ROBOARD_WRITE_BATCH_MS / ROBOARD_WRITE_BATCH_MAX / ROBOARD_WRITE_QUEUE_LIMIT.
+
+    Returns:
+        dict:
+            Per lane ("db", "io"): workers, queue limit, calls pending now
+            and at the peak, completed and rejected (503) calls, and the
+            average and longest wait for a thread.
+            "writer": batch window and size limit, queue limit, commands
+            queued now, commands applied and failed, batches with their
+            average and largest size and average duration, and rejected
+            (503) commands.
+    """
+    return dal.stats()
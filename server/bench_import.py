@@ -0,0 +1,133 @@
+"""
+Import benchmark: .xlsx against .csv/.tsv on the same data.
+
+Writes synthetic Parts and Orders exports (see synth_amos.py) in each format,
+then for each one measures parsing alone (reading and normalizing every row,
+no database) and a full replace-all import into a fresh database. It also
+checks that every format yields exactly the same rows.
+
+Run manually:
+    python bench_import.py
+    python bench_import.py --parts 100000 --orders 20000 --json import.json
+"""
+
+import argparse
+import hashlib
+import json
+import time
+from pathlib import Path
+
+import db
+import synth_amos
+from import_excel import (
+    _open_source,
+    _orders_records,
+    _parts_records,
+    import_orders_replace_all,
+    import_parts_replace_all,
+)
+
+# suffix -> delimiter (None: workbook)
+FORMATS = {".xlsx": None, ".csv": ",", ".tsv": "\t"}
+
+# kind -> (sheet, headers, synthetic rows, record builder, import function)
+KINDS = {
+    "parts": ("Parts", synth_amos.PARTS_HEADERS, synth_amos.parts_rows,
+              _parts_records, import_parts_replace_all),
+    "orders": ("Orders", synth_amos.ORDERS_HEADERS, synth_amos.orders_rows,
+               _orders_records, import_orders_replace_all),
+}
+
+
+def write_exports(work_dir: Path, kind: str, n: int, rebuild: bool) -> dict[str, Path]:
+    """The same `n` synthetic rows of `kind` in every format, reused if present."""
+    sheet, headers, rows, _, _ = KINDS[kind]
+    paths = {}
+    for suffix, delimiter in FORMATS.items():
+        path = work_dir / f"{kind}_{n}{suffix}"
+        if rebuild or not path.exists():
+            if delimiter is None:
+                synth_amos.write_xlsx(path, sheet, headers, rows(n))
+            else:
+                synth_amos.write_delimited(path, headers, rows(n), delimiter)
+        paths[suffix] = path
+    return paths
+
+
+def parse_only(path: Path, records) -> tuple[float, int, str]:
+    """Seconds to read and normalize every row, row count and a digest of the rows."""
+    started = time.perf_counter()
+    source, _, headers, rows, _ = _open_source(path)
+    digest = hashlib.blake2b(digest_size=8)
+    count = 0
+    try:
+        idx = {h: i for i, h in enumerate(headers)}
+        for record in records(rows, idx, "now"):
+            digest.update(repr(record).encode("utf-8"))
+            count += 1
+    finally:
+        source.close()
+    return time.perf_counter() - started, count, digest.hexdigest()
+
+
+def full_import(path: Path, run_import, db_path: Path) -> float:
+    """Seconds for a complete import into a fresh, empty database."""
+    synth_amos.build_db(db_path, 0)
+    saved, db.DB_PATH = db.DB_PATH, db_path
+    try:
+        started = time.perf_counter()
+        run_import(path)
+        return time.perf_counter() - started
+    finally:
+        db.DB_PATH = saved
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--parts", type=int, default=100_000)
+    ap.add_argument("--orders", type=int, default=20_000)
+    ap.add_argument("--work-dir", type=Path, default=Path("bench"),
+                    help="where generated exports are kept and reused")
+    ap.add_argument("--rebuild", action="store_true", help="regenerate existing exports")
+    ap.add_argument("--json", type=Path, help="also write the results to this file")
+    args = ap.parse_args()
+
+    report = []
+    for kind, n in (("parts", args.parts), ("orders", args.orders)):
+        if not n:
+            continue
+        _, _, _, records, run_import = KINDS[kind]
+        paths = write_exports(args.work_dir, kind, n, args.rebuild)
+        for suffix, path in paths.items():
+            parse_s, rows, digest = parse_only(path, records)
+            import_s = full_import(path, run_import, args.work_dir / f"import_{kind}.db")
+            report.append({
+                "kind": kind,
+                "format": suffix.lstrip("."),
+                "rows": rows,
+                "file_mb": round(path.stat().st_size / (1024 * 1024), 1),
+                "parse_s": round(parse_s, 2),
+                "import_s": round(import_s, 2),
+                "rows_per_sec": int(rows / import_s) if import_s > 0 else None,
+                "digest": digest,
+            })
+
+    header = f"{'kind':<7} {'format':<6} {'rows':>8} {'MB':>6} {'parse s':>8} " \
+             f"{'import s':>9} {'rows/s':>8}  same rows"
+    print(header)
+    print("-" * len(header))
+    for row in report:
+        xlsx = next(r for r in report if r["kind"] == row["kind"] and r["format"] == "xlsx")
+        print(
+            f"{row['kind']:<7} {row['format']:<6} {row['rows']:>8} {row['file_mb']:>6} "
+            f"{row['parse_s']:>8.2f} {row['import_s']:>9.2f} {row['rows_per_sec']:>8}  "
+            f"{'yes' if row['digest'] == xlsx['digest'] else 'NO'}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Search benchmark for `/api/parts` and `/api/simple_parts`.
+
+Builds synthetic AMOS catalogs (see synth_amos.py) at each requested size,
+then calls the search route functions in-process, without HTTP, with a query
+mix drawn from the catalog for every `field` mode. For each (size, endpoint,
+field) it reports p50/p95/p99 latency and the average number of rows scanned.
+
+"Rows scanned" is approximated by SQLite VM steps per request (counted in a
+separate pass, so counting does not skew the timings). It is comparable
+between runs and query plans, not a literal row count. In memory mode the
+matching itself happens in Python and only the page lookup is counted.
+
+Fuzzy searches on the fields fuzzy.py handles install their own progress
+handler for the time budget, so no step count is reported for them.
+
+The result cache is disabled for the run, so every call does the full work.
+
+Run manually:
+    python bench_search.py
+    python bench_search.py --sizes 10000 100000 --backends sql --json bench.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sqlite3
+import time
+from pathlib import Path
+
+from fastapi import Response
+
+import app
+import db
+import synth_amos
+from cache import result_cache
+from fuzzy import FUZZY_FIELDS
+from search_engine import engine
+
+FIELDS = ("all", "name", "makers_ref", "location", "ean")
+
+# The routes are coroutines; one loop runs them all, so each call includes
+# the hop to the db lane (dal.py) as it does when served.
+_run = asyncio.new_event_loop().run_until_complete
+
+# (label, route call); /api/parts with each mode and sort it offers.
+ENDPOINTS = {
+    "parts": lambda q, f: _run(app.search_parts(Response(), q=q, field=f, limit=50)),
+    "parts:fuzzy": lambda q, f: _run(app.search_parts(Response(), q=q, field=f, limit=50, mode="fuzzy")),
+    "parts:relevance": lambda q, f: _run(app.search_parts(Response(), q=q, field=f, limit=50, sort="relevance")),
+    "simple_parts": lambda q, f: _run(app.simple_search_parts(q=q, field=f, limit=50)),
+}
+
+# Endpoints whose results depend on the in-process engine.
+_MEMORY_ENDPOINTS = ("parts",)
+
+QUERIES_PER_FIELD = 20
+
+# VM instructions per progress-handler callback when counting.
+_STEP_GRANULARITY = 100
+
+
+def _typo(word: str, r: random.Random) -> str:
+    if len(word) < 4:
+        return word
+    i = r.randrange(len(word) - 1)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def query_mix(db_path: Path, seed: int = 7) -> dict[str, list[str]]:
+    """Sample realistic queries per field from the catalog at `db_path`."""
+    r = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    try:
+        sample = conn.execute(
+            """
+            SELECT number, name, makers_reference, effective_location, ean
+            FROM parts ORDER BY random() LIMIT ?
+            """,
+            (QUERIES_PER_FIELD * 4,),
+        ).fetchall()
+    finally:
+        conn.close()
+
+    names = [row[1].replace(",", "").split() for row in sample if row[1]]
+    refs = [row[2] for row in sample if row[2]]
+    locations = [row[3] for row in sample if row[3]]
+    eans = [row[4] for row in sample if row[4]]
+    numbers = [row[0] for row in sample]
+
+    name_q = []
+    for words in names:
+        kind = len(name_q) % 4
+        if kind == 0:
+            name_q.append(words[0])
+        elif kind == 1:
+            name_q.append(" ".join(words[:2]))
+        elif kind == 2:
+            name_q.append(words[0][:3])
+        else:
+            name_q.append(_typo(words[0], r))
+
+    ref_q = [ref if i % 2 else ref.split()[-1][1:5] for i, ref in enumerate(refs)]
+    loc_q = [loc if i % 2 else loc[:loc.index("-")] for i, loc in enumerate(locations)]
+    ean_q = [e if i % 2 else e[-6:] for i, e in enumerate(eans)]
+
+    all_q = []
+    for i, n in enumerate(numbers):
+        kind = i % 5
+        if kind == 0:
+            all_q.append(n)
+        elif kind == 1:
+            all_q.append(n[:5])
+        elif kind == 2:
+            all_q.append(n.replace(".", ""))
+        elif kind == 3 and names:
+            all_q.append(f"{names[i % len(names)][0]} {n[:3]}")
+        else:
+            all_q.append("")  # plain listing
+
+    mix = {
+        "all": all_q,
+        "name": name_q,
+        "makers_ref": ref_q,
+        "location": loc_q,
+        "ean": ean_q,
+    }
+    return {f: qs[:QUERIES_PER_FIELD] for f, qs in mix.items()}
+
+
+def _percentiles(samples: list[float]) -> tuple[float, float, float]:
+    if len(samples) < 2:
+        v = samples[0] if samples else 0.0
+        return v, v, v
+    q = statistics.quantiles(samples, n=100, method="inclusive")
+    return q[49], q[94], q[98]
+
+
+def _count_steps(call, queries: list[str], field: str) -> float:
+    """Average SQLite VM steps per call, over every connection it opens."""
+    steps = 0
+
+    def tick():
+        nonlocal steps
+        steps += 1
+        return 0
+
+    def hook(conn: sqlite3.Connection) -> None:
+        conn.set_progress_handler(tick, _STEP_GRANULARITY)
+
+    db.CONNECT_HOOKS.append(hook)
+    try:
+        for q in queries:
+            call(q, field)
+    finally:
+        db.CONNECT_HOOKS.remove(hook)
+    return steps * _STEP_GRANULARITY / len(queries)
+
+
+def run_size(db_path: Path, backend: str, repeat: int) -> list[dict]:
+    db.DB_PATH = db_path
+    app.SEARCH_ENGINE = backend
+    if backend == "memory":
+        engine.rebuild()
+
+    results = []
+    mix = query_mix(db_path)
+    for name, call in ENDPOINTS.items():
+        if backend == "memory" and name not in _MEMORY_ENDPOINTS:
+            continue  # identical to the sql run
+        for field in FIELDS:
+            queries = mix[field]
+            if not queries:
+                continue
+            call(queries[0], field)  # warm the page cache
+            samples = []
+            for _ in range(repeat):
+                for q in queries:
+                    start = time.perf_counter()
+                    call(q, field)
+                    samples.append((time.perf_counter() - start) * 1000)
+            p50, p95, p99 = _percentiles(samples)
+            steps = None
+            if not (name == "parts:fuzzy" and field in FUZZY_FIELDS):
+                steps = round(_count_steps(call, queries, field))
+            results.append({
+                "backend": backend,
+                "endpoint": name,
+                "field": field,
+                "calls": len(samples),
+                "p50_ms": round(p50, 3),
+                "p95_ms": round(p95, 3),
+                "p99_ms": round(p99, 3),
+                "vm_steps": steps,
+            })
+    return results
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--orders", type=int, default=2000, help="orders per generated database")
+    ap.add_argument("--work-dir", type=Path, default=Path("bench"),
+                    help="where generated databases are kept and reused")
+    ap.add_argument("--rebuild", action="store_true", help="regenerate existing databases")
+    ap.add_argument("--repeat", type=int, default=5, help="passes over each query mix")
+    ap.add_argument("--backends", nargs="+", choices=["sql", "memory"], default=["sql", "memory"])
+    ap.add_argument("--json", type=Path, help="also write the results to this file")
+    args = ap.parse_args()
+
+    result_cache.maxsize = 0
+    saved_db, saved_engine = db.DB_PATH, app.SEARCH_ENGINE
+
+    report = []
+    try:
+        for n in args.sizes:
+            path = args.work_dir / f"amos_{n}.db"
+            if args.rebuild or not path.exists():
+                start = time.perf_counter()
+                synth_amos.build_db(path, n, args.orders)
+                print(f"Built {path} in {time.perf_counter() - start:.1f}s")
+            for backend in args.backends:
+                for row in run_size(path, backend, args.repeat):
+                    report.append({"parts": n, **row})
+    finally:
+        db.DB_PATH, app.SEARCH_ENGINE = saved_db, saved_engine
+
+    header = f"{'parts':>8} {'backend':<7} {'endpoint':<16} {'field':<10} " \
+             f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'vm steps':>10}"
+    print(header)
+    print("-" * len(header))
+    for row in report:
+        print(
+            f"{row['parts']:>8} {row['backend']:<7} {row['endpoint']:<16} {row['field']:<10} "
+            f"{row['p50_ms']:>9.2f} {row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} "
+            f"{'-' if row['vm_steps'] is None else row['vm_steps']:>10}"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
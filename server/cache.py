@@ -0,0 +1,112 @@
+"""
+Versioned result cache for read endpoints.
+
+Every table the API writes to has a version counter in memory. A cached result
+remembers the versions of the tables it was read from and is only served while
+all of them are unchanged; any write bumps the versions of the tables it
+touched, so stale entries are never returned and never need to be hunted down.
+
+Rules for callers:
+- Read endpoints wrap their query in a function decorated with `@cached(...)`,
+  listing every table the query reads.
+- Writers call `bump(...)` with every table they changed, *after* the commit
+  and after any derived state (e.g. the search engine) has been updated.
+
+Results are shared between requests and must not be mutated.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from functools import wraps
+
+from config import RESULT_CACHE_SIZE
+
+# Tables behind every endpoint that returns parts with their wishlist, ROB and
+# location override state.
+PART_STATE_TABLES = ("parts", "wishlist", "rob", "location_overrides")
+
+
+class ResultCache:
+    """A size-bounded LRU of query results, validated against table versions."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict = OrderedDict()
+        self._versions: defaultdict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def bump(self, *tables: str) -> None:
+        with self._lock:
+            for t in tables:
+                self._versions[t] += 1
+
+    def get_or_compute(self, key, tables, compute):
+        """Return the cached value for key, or compute and store it."""
+        if self.maxsize <= 0:
+            return compute()
+
+        with self._lock:
+            versions = tuple(self._versions[t] for t in tables)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == versions:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.stale += 1
+            self.misses += 1
+
+        # Versions were captured before the query ran: a write that commits
+        # meanwhile bumps them and the result is dropped instead of stored.
+        value = compute()
+
+        with self._lock:
+            if versions == tuple(self._versions[t] for t in tables):
+                self._entries[key] = (versions, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "versions": dict(self._versions),
+            }
+
+
+result_cache = ResultCache(RESULT_CACHE_SIZE)
+
+
+def bump(*tables: str) -> None:
+    """Invalidate every cached result that read any of `tables`."""
+    result_cache.bump(*tables)
+
+
+def cached(*tables: str):
+    """
+    Cache a function's result per positional arguments until one of `tables`
+    changes. Arguments must be hashable and already normalized.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args):
+            return result_cache.get_or_compute(
+                (fn.__name__, args), tables, lambda: fn(*args)
+            )
+        return wrapper
+    return decorator
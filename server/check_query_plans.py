@@ -0,0 +1,276 @@
+"""
+Query plan regression check for the API routes.
+
+Builds a small synthetic database (synth_amos.py), calls every route that
+reads or writes SQLite in-process, as bench_search.py does, and records the
+SQL each call runs through a trace callback on its connections (including
+the writer thread's). Every statement is then run through
+`EXPLAIN QUERY PLAN`. A full scan of a table fails the check unless
+EXPECTED_SCANS lists it for that route with the reason it is fine there.
+That is `SCAN <table>` without an index, or through an index in a
+statement without LIMIT; an index walked in order under a LIMIT (e.g. a
+page of orders) stops early and passes.
+
+Imports are not covered: they read and rewrite whole tables by design. The
+statements inside triggers are not planned either; they only look rows up
+by primary key.
+
+tests/test_query_plans.py runs it with the test suite. To see the plans,
+run it by hand (exits with status 1 on an unexpected scan):
+    python check_query_plans.py
+    python check_query_plans.py --verbose    # print every plan
+"""
+
+import argparse
+import asyncio
+import re
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+from fastapi import Response
+
+import app
+import dal
+import db
+import synth_amos
+from cache import result_cache
+from search_engine import engine
+from suggest import suggestions
+
+# (route, table): why a full scan of that table is expected there.
+EXPECTED_SCANS: dict[tuple[str, str], str] = {
+    ("startup: search engine", "parts"): "loads the whole catalog, in listing order",
+    ("startup: search engine", "location_overrides"): "loads every override",
+    ("startup: suggestions", "parts"): "loads every name, number and location",
+    ("GET /api/simple_parts", "parts"): "LIKE '%q%' substring match, NOT INDEXED on purpose",
+    ("GET /api/wishlist", "parts_state"): "partial index, holds only wishlisted parts",
+    ("GET /api/rob", "rob"): "lists every ROB entry; a few hundred rows at most",
+    ("GET /api/import/history", "import_history"): "newest first by rowid, stops at LIMIT",
+    ("POST /api/wishlist/export", "wishlist"): "exports and clears the whole wishlist",
+    ("POST /api/rob/export", "rob"): "exports and clears every ROB entry",
+    ("POST /api/locations/export", "location_overrides"): "exports and clears every override",
+}
+
+# Statements worth planning; PRAGMA, BEGIN, SAVEPOINT etc. are not.
+_PLANNED = re.compile(r"\s*(SELECT|WITH|INSERT|UPDATE|DELETE|REPLACE)\b", re.IGNORECASE)
+# Statements FTS5 runs on its own shadow tables, e.g. SELECT k, v FROM 'main'.'parts_fts_config'.
+_INTERNAL = re.compile(r"'main'\.")
+_CTE = re.compile(r"(?:\bWITH|,)\s*(\w+)\s*(?:\([^)]*\))?\s+AS\s+(?:NOT\s+)?(?:MATERIALIZED\s+)?\(", re.IGNORECASE)
+_TABLE_ALIAS = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_LIMIT = re.compile(r"\bLIMIT\b", re.IGNORECASE)
+_NOT_ALIAS = {
+    "where", "join", "left", "inner", "cross", "on", "using", "order", "group",
+    "limit", "union", "set", "values", "natural", "outer", "having", "window", "not",
+}
+
+# The routes are coroutines; one loop runs them all, so each call includes
+# the hop to the db lane (dal.py) as it does when served.
+_run = asyncio.new_event_loop().run_until_complete
+
+_route = ""
+_statements: list[tuple[str, str]] = []
+
+
+def _trace(conn: sqlite3.Connection) -> None:
+    conn.set_trace_callback(lambda sql: _statements.append((_route, sql)))
+
+
+def _sample(conn: sqlite3.Connection) -> dict:
+    """Values from the generated data for the calls to use."""
+    one = lambda sql: conn.execute(sql).fetchone()[0]  # noqa: E731
+    number = one("SELECT number FROM parts WHERE number LIKE '%.%' ORDER BY number LIMIT 1")
+    return {
+        "number": number,
+        "ean": one("SELECT ean FROM parts WHERE ean IS NOT NULL ORDER BY number LIMIT 1"),
+        "makers_ref": one("SELECT makers_reference FROM parts WHERE makers_reference != '' ORDER BY number LIMIT 1"),
+        "word": one("SELECT name FROM parts ORDER BY number LIMIT 1").split()[0].lower(),
+        "location": one("SELECT default_location FROM parts ORDER BY number LIMIT 1"),
+        "vendor": one("SELECT vendor FROM orders ORDER BY number LIMIT 1"),
+        "status": one("SELECT form_status FROM orders ORDER BY number LIMIT 1"),
+        "order_word": one("SELECT title FROM orders ORDER BY number LIMIT 1").split()[0].lower(),
+    }
+
+
+def _next_page(call) -> str | None:
+    response = Response()
+    call(response)
+    return response.headers.get("X-Next-Cursor")
+
+
+def route_calls(s: dict) -> list[tuple[str, Callable[[], object]]]:
+    """(route, call) for every route that touches SQLite, in calling order."""
+    number, loc = s["number"], s["location"]
+    calls = [
+        ("GET /api/parts", lambda: _run(app.search_parts(Response()))),
+        ("GET /api/parts", lambda: _run(app.search_parts(Response(), q=s["word"]))),
+        ("GET /api/parts", lambda: _run(app.search_parts(
+            Response(), q=s["word"], after=_next_page(
+                lambda r: _run(app.search_parts(r, q=s["word"], limit=5))), limit=5))),
+        ("GET /api/parts", lambda: _run(app.search_parts(Response(), q=number[:4], field="number"))),
+        ("GET /api/parts", lambda: _run(app.search_parts(Response(), q=s["makers_ref"], field="makers_ref"))),
+        ("GET /api/parts", lambda: _run(app.search_parts(Response(), q=loc, field="location"))),
+        ("GET /api/parts", lambda: _run(app.search_parts(Response(), q=s["ean"][:6], field="ean"))),
+        ("GET /api/parts", lambda: _run(app.search_parts(Response(), q=s["word"][:-1] + "x", mode="fuzzy"))),
+        ("GET /api/parts", lambda: _run(app.search_parts(Response(), q=s["word"], sort="relevance"))),
+        ("GET /api/parts/suggest", lambda: _run(app.suggest_parts(prefix=s["word"][:2]))),
+        ("GET /api/parts/lookup", lambda: _run(app.lookup_part(s["ean"]))),
+        ("GET /api/parts/lookup", lambda: _run(app.lookup_part(number.replace(".", "")))),
+        ("GET /api/parts/lookup", lambda: _run(app.lookup_part(s["makers_ref"]))),
+    ]
+    for field in ("all", "name", "number", "makers_ref", "location", "ean"):
+        calls.append(("GET /api/simple_parts", lambda f=field: _run(app.simple_search_parts(q=s["word"], field=f))))
+    calls.append(("GET /api/simple_parts", lambda: _run(app.simple_search_parts())))
+    for sort in ("created", "ordered", "received"):
+        calls.append(("GET /api/orders", lambda o=sort: _run(app.list_orders(Response(), sort=o))))
+    calls += [
+        ("GET /api/orders", lambda: _run(app.list_orders(Response(), after=_next_page(
+            lambda r: _run(app.list_orders(r, limit=5))), limit=5))),
+        ("GET /api/orders", lambda: _run(app.list_orders(Response(), status=s["status"], vendor=s["vendor"]))),
+        ("GET /api/orders", lambda: _run(app.list_orders(
+            Response(), created_from="2020-01-01", created_to="2030-12-31", received_from="2020-01-01"))),
+        ("GET /api/orders", lambda: _run(app.list_orders(Response(), q=s["order_word"]))),
+        ("POST /api/wishlist/toggle", lambda: _run(app.toggle_wishlist(number))),
+        ("GET /api/wishlist", lambda: _run(app.get_wishlist())),
+        ("POST /api/wishlist/toggle", lambda: _run(app.toggle_wishlist(number))),
+        ("POST /api/rob", lambda: _run(app.set_rob(number, app.RobIn(rob=5)))),
+        ("POST /api/rob", lambda: _run(app.set_rob(number, app.RobIn(rob=-1)))),
+        ("GET /api/rob", lambda: _run(app.get_rob_list())),
+        ("POST /api/locations/set", lambda: _run(app.set_location_override(
+            app.LocationOverrideIn(part_number=number, new_location="X-01")))),
+        ("GET /api/locations", lambda: _run(app.list_location_overrides())),
+        ("GET /api/locations", lambda: _run(app.list_location_overrides(q="X-0"))),
+        ("GET /api/import/history", lambda: _run(app.import_history())),
+        ("GET /api/import/history", lambda: _run(app.import_history(kind="parts"))),
+        ("POST /api/wishlist/export", lambda: _run(app.export_and_clear_wishlist())),
+        ("POST /api/rob/export", lambda: _run(app.export_and_clear_rob())),
+        ("POST /api/locations/export", lambda: _run(app.export_location_overrides())),
+    ]
+    return calls
+
+
+def _record(route: str, call: Callable[[], object]) -> None:
+    global _route
+    _route = route
+    try:
+        call()
+    finally:
+        _route = ""
+
+
+def _scans(plan: list[tuple], sql: str) -> list[str]:
+    """
+    Tables `plan` reads in full: scanned without an index, or through one
+    from end to end (no LIMIT to stop an ordered walk early).
+    """
+    aliases = {
+        alias.lower(): table.lower()
+        for table, alias in _TABLE_ALIAS.findall(sql)
+        if alias and alias.lower() not in _NOT_ALIAS
+    }
+    # Subqueries and CTEs are scanned as they were built, e.g. "MATERIALIZE k" / "SCAN k".
+    built = {d.split()[-1].lower() for _, _, _, d in plan if d.startswith(("MATERIALIZE", "CO-ROUTINE"))}
+    built.update(name.lower() for name in _CTE.findall(sql))
+    limited = _LIMIT.search(sql) is not None
+    tables = []
+    for _, _, _, detail in plan:
+        if not detail.startswith("SCAN ") or "VIRTUAL TABLE" in detail:
+            continue
+        if " USING " in detail and limited:
+            continue
+        name = detail.split()[1].lower()
+        table = aliases.get(name, name)
+        if {name, table} & built or name == "constant" or table.startswith("sqlite_"):
+            continue
+        tables.append(table)
+    return tables
+
+
+def check(db_path: Path, verbose: bool) -> int:
+    conn = sqlite3.connect(db_path)
+    seen: set[tuple[str, str]] = set()
+    found: set[tuple[str, str]] = set()
+    unexpected = 0
+    try:
+        for route, sql in _statements:
+            if not _PLANNED.match(sql) or _INTERNAL.search(sql) or (route, sql) in seen:
+                continue
+            seen.add((route, sql))
+            try:
+                plan = conn.execute("EXPLAIN QUERY PLAN " + sql).fetchall()
+            except sqlite3.Error as e:
+                print(f"? {route}: could not plan ({e}): {' '.join(sql.split())[:120]}")
+                continue
+            if verbose:
+                print(f"{route}: {' '.join(sql.split())[:160]}")
+                for _, _, _, detail in plan:
+                    print(f"    {detail}")
+            for table in _scans(plan, sql):
+                found.add((route, table))
+                if (route, table) not in EXPECTED_SCANS:
+                    unexpected += 1
+                    print(f"✗ {route}: full scan of {table}")
+                    print(f"    {' '.join(sql.split())[:200]}")
+    finally:
+        conn.close()
+
+    for route, table in sorted(EXPECTED_SCANS.keys() - found):
+        print(f"note: expected scan of {table} in {route} no longer happens")
+    routes = len({route for route, _ in seen})
+    print(f"{len(seen)} statements from {routes} routes planned, {unexpected} unexpected full scans")
+    return unexpected
+
+
+def plan_routes(workdir: Path, parts: int = 2000, orders: int = 500, verbose: bool = False) -> int:
+    """
+    Build the synthetic database in `workdir`, call every route against it
+    and return the number of unexpected full scans (see check).
+    """
+    _statements.clear()
+    saved = (
+        db.DB_PATH, app.SEARCH_ENGINE, app.SPARES_ENV, app.get_export_dir, result_cache.maxsize,
+    )
+    path = workdir / "plans.db"
+    synth_amos.build_db(path, parts, orders)
+    result_cache.maxsize = 0
+    db.DB_PATH = path
+    # Exports go to `workdir`, not to USB or the export root.
+    app.SPARES_ENV, app.get_export_dir = "dev", lambda usb: workdir / "exports"
+    with sqlite3.connect(path) as conn:
+        sample = _sample(conn)
+
+    db.CONNECT_HOOKS.append(_trace)
+    try:
+        _record("startup: search engine", engine.rebuild)
+        _record("startup: suggestions", suggestions.rebuild)
+        for backend in ("sql", "memory"):
+            app.SEARCH_ENGINE = backend
+            for route, call in route_calls(sample):
+                _record(route, call)
+    finally:
+        db.CONNECT_HOOKS.remove(_trace)
+        # The writer thread keeps its connection to this database otherwise.
+        dal.writer.shutdown()
+        (db.DB_PATH, app.SEARCH_ENGINE, app.SPARES_ENV, app.get_export_dir,
+         result_cache.maxsize) = saved
+        db.reset_pool()
+
+    return check(path, verbose)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--parts", type=int, default=2000)
+    ap.add_argument("--orders", type=int, default=500)
+    ap.add_argument("--verbose", action="store_true", help="print the plan of every statement")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        failed = plan_routes(Path(tmp), args.parts, args.orders, args.verbose)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -40,3 +40,67 @@ def get_export_dir(usb_mount: Path | None) -> Path:
     if usb_mount is not None:
         return usb_mount / EXPORT_SUBDIR
     return PROD_LOCAL_EXPORTS / EXPORT_SUBDIR
+
+# Parts search backend for /api/parts:
+#   "memory": answer from the in-process catalog in search_engine.py
+#             (falls back to SQL until the catalog has been loaded)
+#   "sql":    query the FTS indexes in SQLite on every request
+SEARCH_ENGINE = os.getenv("ROBOARD_SEARCH_ENGINE", "memory").lower()
+
+# Number of query results kept by the read cache in cache.py (0 disables it).
+RESULT_CACHE_SIZE = int(os.getenv("ROBOARD_RESULT_CACHE_SIZE", "256"))
+
+# Time budget for finding fuzzy alternatives in /api/parts?mode=fuzzy (fuzzy.py).
+FUZZY_BUDGET_MS = int(os.getenv("ROBOARD_FUZZY_BUDGET_MS", "50"))
+
+# Rows per executemany() batch when importing Parts/Orders workbooks (import_excel.py).
+IMPORT_BATCH_SIZE = int(os.getenv("ROBOARD_IMPORT_BATCH_SIZE", "2000"))
+
+# Text encoding of .csv/.tsv imports; utf-8-sig also accepts UTF-8 with a BOM.
+IMPORT_CSV_ENCODING = os.getenv("ROBOARD_IMPORT_CSV_ENCODING", "utf-8-sig")
+
+# SQLite connections (db.py). Idle connections kept per thread for reuse by
+# get_conn(); 0 opens and closes a connection every time.
+DB_POOL_SIZE = int(os.getenv("ROBOARD_DB_POOL_SIZE", "2"))
+
+# Compiled statements cached per connection.
+DB_STATEMENT_CACHE = int(os.getenv("ROBOARD_DB_STATEMENT_CACHE", "256"))
+
+# PRAGMA synchronous. NORMAL is safe with WAL: a power cut can lose the last
+# commits but never corrupts the file, and commits skip an fsync.
+DB_SYNCHRONOUS = os.getenv("ROBOARD_DB_SYNCHRONOUS", "NORMAL").upper()
+
+# Memory-mapped reads per connection, in megabytes (0 disables). The pages are
+# the OS file cache, shared by all connections.
+DB_MMAP_MB = int(os.getenv("ROBOARD_DB_MMAP_MB", "64"))
+
+# Page cache per connection, in megabytes.
+DB_CACHE_MB = int(os.getenv("ROBOARD_DB_CACHE_MB", "8"))
+
+# PRAGMA temp_store. FILE keeps the temp tables imports stage whole sheets in
+# out of RAM; sorts still stay in the page cache unless they outgrow it.
+DB_TEMP_STORE = os.getenv("ROBOARD_DB_TEMP_STORE", "FILE").upper()
+
+# Threads for the routes' database calls (dal.py), and how many more calls may
+# wait for one before requests are answered with 503.
+DB_WORKERS = int(os.getenv("ROBOARD_DB_WORKERS", "4"))
+DB_QUEUE_LIMIT = int(os.getenv("ROBOARD_DB_QUEUE_LIMIT", "64"))
+
+# The same for file work: xlsx exports and saving uploads.
+IO_WORKERS = int(os.getenv("ROBOARD_IO_WORKERS", "2"))
+IO_QUEUE_LIMIT = int(os.getenv("ROBOARD_IO_QUEUE_LIMIT", "8"))
+
+# Wishlist, ROB and location override writes (dal.Writer): commands arriving
+# within WRITE_BATCH_MS of the first one share a transaction and its commit,
+# up to WRITE_BATCH_MAX per batch. Past WRITE_QUEUE_LIMIT waiting commands,
+# requests are answered with 503.
+WRITE_BATCH_MS = int(os.getenv("ROBOARD_WRITE_BATCH_MS", "2"))
+WRITE_BATCH_MAX = int(os.getenv("ROBOARD_WRITE_BATCH_MAX", "100"))
+WRITE_QUEUE_LIMIT = int(os.getenv("ROBOARD_WRITE_QUEUE_LIMIT", "256"))
+
+# Largest accepted Parts/Orders upload, in megabytes (uploads.py).
+MAX_UPLOAD_MB = int(os.getenv("ROBOARD_MAX_UPLOAD_MB", "100"))
+
+# Where uploads wait for their import job. Keep this on disk: on a Pi, /tmp
+# may be RAM-backed.
+UPLOAD_DIR = Path(os.getenv("ROBOARD_UPLOAD_DIR", str(Path(__file__).resolve().parent / "uploads")))
@@ -0,0 +1,345 @@
+"""
+Blocking work for the async route handlers.
+
+Every route in app.py is `async def` and never touches SQLite, openpyxl or
+the export/upload files on the event loop. It awaits one of two lanes
+instead, each a small thread pool of its own:
+
+- `db`: queries (searches, lookups, lists, import history);
+- `io`: file work that can take seconds (xlsx exports, saving uploads).
+
+An export therefore cannot take the threads that scanner lookups need, and
+neither lane competes with Starlette's shared threadpool. Imports keep their
+own worker thread (import_jobs.py).
+
+Operator writes (wishlist, ROB, location overrides, clearing them after an
+export, request metrics) do not open transactions of their own either: they
+go to `writer`, one thread that applies them in order. It takes whatever has
+queued up within WRITE_BATCH_MS of the first command, up to WRITE_BATCH_MAX,
+and applies the batch in one `BEGIN IMMEDIATE` transaction with a savepoint
+per command, so a command that fails (e.g. 404, unknown part) is rolled back
+alone. One commit, and one fsync of the WAL, then covers every scan in the
+batch, and kiosks writing at the same time never race each other for the
+write lock. A caller's result is only handed back once its batch has
+committed.
+
+A lane runs at most `workers` calls at a time and lets at most
+`queue_limit` more wait. Under a burst, calls queue and latency grows with
+the queue; past the limit `run()` raises Busy straight away, which the app
+answers with 503 and Retry-After, rather than piling up requests the client
+has long given up on.
+
+Calls run in a copy of the caller's context, so log lines keep the request's
+structlog context.
+"""
+
+import asyncio
+import contextvars
+import functools
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, NamedTuple
+
+import structlog
+
+from cache import bump
+from config import (
+    DB_QUEUE_LIMIT,
+    DB_WORKERS,
+    IO_QUEUE_LIMIT,
+    IO_WORKERS,
+    WRITE_BATCH_MAX,
+    WRITE_BATCH_MS,
+    WRITE_QUEUE_LIMIT,
+)
+from db import get_conn
+
+log = structlog.get_logger()
+
+
+class Busy(Exception):
+    """A lane already has its limit of calls running and waiting."""
+
+    def __init__(self, lane: str):
+        super().__init__(f"Server busy ({lane}), try again shortly")
+        self.lane = lane
+
+
+class Lane:
+    """A bounded thread pool for one kind of blocking work."""
+
+    def __init__(self, name: str, workers: int, queue_limit: int):
+        self.name = name
+        self.workers = max(1, workers)
+        self.queue_limit = max(0, queue_limit)
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._pending = 0  # running + waiting
+        self._peak = 0
+        self._completed = 0
+        self._rejected = 0
+        self._wait_s = 0.0
+        self._max_wait_s = 0.0
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+            return self._executor
+
+    def _enter(self, limited: bool) -> None:
+        with self._lock:
+            if limited and self._pending >= self.workers + self.queue_limit:
+                self._rejected += 1
+                raise Busy(self.name)
+            self._pending += 1
+            self._peak = max(self._peak, self._pending)
+
+    def _call(self, queued: float, ctx: contextvars.Context, fn: Callable, args: tuple, kwargs: dict) -> Any:
+        wait = time.perf_counter() - queued
+        try:
+            return ctx.run(fn, *args, **kwargs)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+                self._wait_s += wait
+                self._max_wait_s = max(self._max_wait_s, wait)
+
+    def _submit(self, limited: bool, fn: Callable, args: tuple, kwargs: dict) -> Future:
+        pool = self._pool()
+        self._enter(limited)
+        try:
+            return pool.submit(self._call, time.perf_counter(), contextvars.copy_context(), fn, args, kwargs)
+        except BaseException:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Await `fn(*args, **kwargs)` on this lane. Raises Busy if the lane is
+        full; exceptions of `fn` (e.g. HTTPException) propagate as they are.
+        """
+        return await asyncio.wrap_future(self._submit(True, fn, args, kwargs))
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue background work that nobody awaits; never rejected."""
+        future = self._submit(False, fn, args, kwargs)
+        future.add_done_callback(functools.partial(_log_failure, self.name, fn))
+        return future
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "pending": self._pending,
+                "peak": self._peak,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_wait_ms": round(1000 * self._wait_s / self._completed, 2) if self._completed else None,
+                "max_wait_ms": round(1000 * self._max_wait_s, 2),
+            }
+
+    def shutdown(self) -> None:
+        """Finish the calls already queued and stop the threads."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+def _log_failure(lane: str, fn: Callable, future: Future) -> None:
+    if not future.cancelled() and future.exception() is not None:
+        log.error("background_call_failed", lane=lane, call=getattr(fn, "__name__", repr(fn)),
+                  exc_info=future.exception())
+
+
+class _Write(NamedTuple):
+    fn: Callable
+    args: tuple
+    tables: tuple[str, ...]
+    on_commit: Callable[[Any], None] | None
+    ctx: contextvars.Context
+    future: Future
+
+
+class Writer:
+    """A single thread applying write commands in group-committed batches."""
+
+    def __init__(self, batch_ms: int, batch_max: int, queue_limit: int):
+        self.batch_s = max(0, batch_ms) / 1000
+        self.batch_max = max(1, batch_max)
+        self.queue_limit = max(1, queue_limit)
+        self._queue: queue.Queue[_Write | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self._commands = 0
+        self._failed = 0
+        self._batches = 0
+        self._largest = 0
+        self._rejected = 0
+        self._commit_s = 0.0
+
+    def submit(
+        self,
+        fn: Callable,
+        *args,
+        tables: tuple[str, ...] = (),
+        on_commit: Callable[[Any], None] | None = None,
+        limited: bool = False,
+    ) -> Future:
+        """
+        Queue `fn(conn, *args)`. It must not commit; its return value becomes
+        the future's result once the batch has committed. After the commit,
+        `on_commit(result)` updates derived state and `tables` are bumped.
+        With `limited`, raises Busy if WRITE_QUEUE_LIMIT commands are waiting.
+        """
+        with self._lock:
+            if limited and self._queue.qsize() >= self.queue_limit:
+                self._rejected += 1
+                raise Busy("writer")
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="writer", daemon=True)
+                self._thread.start()
+        future: Future = Future()
+        self._queue.put(_Write(fn, args, tables, on_commit, contextvars.copy_context(), future))
+        return future
+
+    async def run(self, fn: Callable, *args, tables: tuple[str, ...] = (), on_commit=None) -> Any:
+        """Await `fn(conn, *args)` as part of the next batch (see submit())."""
+        return await asyncio.wrap_future(self.submit(fn, *args, tables=tables, on_commit=on_commit, limited=True))
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = [first]
+            deadline = time.perf_counter() + self.batch_s
+            while len(batch) < self.batch_max:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # stop once this batch is done
+                    break
+                batch.append(item)
+            # Callers that gave up before their turn are skipped.
+            batch = [w for w in batch if w.future.set_running_or_notify_cancel()]
+            if batch:
+                self._apply(batch)
+
+    def _apply(self, batch: list[_Write]) -> None:
+        started = time.perf_counter()
+        outcomes: list[tuple[bool, Any]] = []
+        conn = get_conn()
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            for w in batch:
+                conn.execute("SAVEPOINT command;")
+                try:
+                    outcomes.append((True, w.ctx.run(w.fn, conn, *w.args)))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO command;")
+                    outcomes.append((False, e))
+                conn.execute("RELEASE command;")
+            conn.commit()
+        except sqlite3.Error as e:
+            # close() rolls back whatever the batch had written.
+            log.error("write_batch_failed", commands=len(batch), exc_info=True)
+            for w in batch:
+                w.future.set_exception(e)
+            return
+        finally:
+            conn.close()
+
+        tables: set[str] = set()
+        for w, (ok, value) in zip(batch, outcomes):
+            if ok:
+                tables.update(w.tables)
+                if w.on_commit is not None:
+                    try:
+                        w.ctx.run(w.on_commit, value)
+                    except Exception:
+                        log.error("write_on_commit_failed", call=w.fn.__name__, exc_info=True)
+        if tables:
+            bump(*tables)
+        for w, (ok, value) in zip(batch, outcomes):
+            if ok:
+                w.future.set_result(value)
+            else:
+                w.future.set_exception(value)
+
+        with self._lock:
+            self._batches += 1
+            self._commands += len(batch)
+            self._failed += sum(not ok for ok, _ in outcomes)
+            self._largest = max(self._largest, len(batch))
+            self._commit_s += time.perf_counter() - started
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batch_ms": round(self.batch_s * 1000, 1),
+                "batch_max": self.batch_max,
+                "queue_limit": self.queue_limit,
+                "queued": self._queue.qsize(),
+                "commands": self._commands,
+                "failed": self._failed,
+                "batches": self._batches,
+                "avg_batch": round(self._commands / self._batches, 2) if self._batches else None,
+                "largest_batch": self._largest,
+                "rejected": self._rejected,
+                "avg_batch_ms": round(1000 * self._commit_s / self._batches, 2) if self._batches else None,
+            }
+
+    def shutdown(self) -> None:
+        """Apply the commands already queued and stop the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+            self._queue = queue.Queue()
+
+
+db = Lane("db", DB_WORKERS, DB_QUEUE_LIMIT)
+io = Lane("io", IO_WORKERS, IO_QUEUE_LIMIT)
+writer = Writer(WRITE_BATCH_MS, WRITE_BATCH_MAX, WRITE_QUEUE_LIMIT)
+
+
+async def run_db(fn: Callable, *args, **kwargs) -> Any:
+    """Await a database call on the `db` lane."""
+    return await db.run(fn, *args, **kwargs)
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    """Await file work (exports, uploads) on the `io` lane."""
+    return await io.run(fn, *args, **kwargs)
+
+
+async def run_write(fn: Callable, *args, tables: tuple[str, ...] = (), on_commit=None) -> Any:
+    """Await `fn(conn, *args)` on the writer (see Writer.submit)."""
+    return await writer.run(fn, *args, tables=tables, on_commit=on_commit)
+
+
+def write(fn: Callable, *args, tables: tuple[str, ...] = (), on_commit=None) -> Any:
+    """run_write() for code already on a worker thread; blocks until committed."""
+    return writer.submit(fn, *args, tables=tables, on_commit=on_commit).result()
+
+
+def stats() -> dict:
+    return {**{lane.name: lane.stats() for lane in (db, io)}, "writer": writer.stats()}
+
+
+def shutdown() -> None:
+    # The lanes may still queue writes (e.g. an export clearing the wishlist).
+    for lane in (db, io):
+        lane.shutdown()
+    writer.shutdown()
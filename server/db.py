@@ -1,19 +1,147 @@
+"""
+SQLite access for the API.
+
+`get_conn()` hands out connections from a small per-thread pool (sqlite3
+connections stay on the thread that opened them). Callers use them as they
+always have, `conn = get_conn()` ... `conn.close()`: close() puts the
+connection back in the state of a new one (open transaction rolled back,
+`sqlite3.Row` rows, no progress handler) and keeps it for the thread's next
+get_conn(). Opening a connection, reading the schema and applying the
+pragmas then happens once per thread instead of once per request, and each
+connection keeps its compiled statements.
+
+A connection left with temp tables is closed for real, so nothing staged by
+one caller is seen by the next. Changing DB_PATH, or calling `reset_pool()`
+after replacing the database file, retires the pooled connections.
+
+Journaling is WAL (`enable_wal()` at startup), so readers never wait for a
+writer; the other pragmas are set per connection from config.py.
+"""
+
 import sqlite3
+import threading
 from pathlib import Path
+from typing import Callable
+
+from config import (
+    DB_CACHE_MB,
+    DB_MMAP_MB,
+    DB_POOL_SIZE,
+    DB_STATEMENT_CACHE,
+    DB_SYNCHRONOUS,
+    DB_TEMP_STORE,
+)
+from db_migrate import apply_migrations
 
 DB_PATH = Path(__file__).resolve().parent / "app.db"
-SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
 
-def get_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+# Called with every connection get_conn() hands out (e.g. bench_search.py
+# counts VM steps).
+CONNECT_HOOKS: list[Callable[[sqlite3.Connection], None]] = []
+
+_SYNCHRONOUS = ("OFF", "NORMAL", "FULL", "EXTRA")
+_TEMP_STORE = ("DEFAULT", "FILE", "MEMORY")
+
+_local = threading.local()
+# Bumped by reset_pool(); connections from an older generation are closed.
+_generation = 0
+
+
+class PooledConnection(sqlite3.Connection):
+    """A connection from get_conn(); close() returns it to its thread's pool."""
+
+    pool_key: tuple = ()
+    pooled = False
+
+    def close(self) -> None:
+        if self.pooled:
+            return  # already back in the pool
+        if not _release(self):
+            super().close()
+
+
+def _idle() -> list[PooledConnection]:
+    idle = getattr(_local, "idle", None)
+    if idle is None:
+        idle = _local.idle = []
+    return idle
+
+
+def _connect() -> PooledConnection:
+    conn = sqlite3.connect(DB_PATH, factory=PooledConnection, cached_statements=DB_STATEMENT_CACHE)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
+    if DB_SYNCHRONOUS in _SYNCHRONOUS:
+        conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS};")
+    if DB_TEMP_STORE in _TEMP_STORE:
+        conn.execute(f"PRAGMA temp_store = {DB_TEMP_STORE};")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_MB * 1024 * 1024};")
+    conn.execute(f"PRAGMA cache_size = {-DB_CACHE_MB * 1024};")  # negative: KiB
+    conn.pool_key = (DB_PATH, _generation)
+    return conn
+
+
+def _release(conn: PooledConnection) -> bool:
+    """Reset `conn` and keep it for reuse; False if it should be closed."""
+    idle = _idle()
+    if conn.pool_key != (DB_PATH, _generation) or len(idle) >= DB_POOL_SIZE:
+        return False
+    try:
+        if conn.in_transaction:
+            conn.rollback()
+        conn.row_factory = sqlite3.Row
+        conn.set_progress_handler(None, 0)
+        if conn.execute("SELECT 1 FROM sqlite_temp_master LIMIT 1;").fetchone():
+            return False
+    except sqlite3.Error:
+        return False
+    conn.pooled = True
+    idle.append(conn)
+    return True
+
+
+def get_conn() -> sqlite3.Connection:
+    idle = _idle()
+    while idle:
+        conn = idle.pop()
+        if conn.pool_key == (DB_PATH, _generation):
+            break
+        sqlite3.Connection.close(conn)
+    else:
+        conn = _connect()
+    conn.pooled = False
+    for hook in CONNECT_HOOKS:
+        hook(conn)
     return conn
 
-def init_db() -> None:
+
+def reset_pool() -> None:
+    """Stop reusing the pooled connections, e.g. after replacing the database file."""
+    global _generation
+    _generation += 1
+    idle = _idle()
+    while idle:
+        sqlite3.Connection.close(idle.pop())
+
+
+def init_db() -> list[str]:
+    """
+    Create the database if it is missing and apply pending migrations
+    (db_migrate.py, the only definition of the schema). Returns the ids of
+    the migrations applied.
+    """
+    return apply_migrations(DB_PATH)
+
+
+def enable_wal() -> None:
+    """
+    Switch the database to write-ahead logging (persists in the file).
+
+    Readers then keep seeing the last committed data while a long import
+    writes, instead of failing with "database is locked".
+    """
     conn = get_conn()
     try:
-        conn.executescript(SCHEMA_PATH.read_text(encoding="utf-8"))
-        conn.commit()
+        conn.execute("PRAGMA journal_mode = WAL;")
     finally:
         conn.close()
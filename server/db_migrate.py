@@ -1,7 +1,8 @@
 """
 Simple database migration script for ROBoard.
 
-Run manually:
+The app applies pending migrations at startup (`apply_migrations()`), which
+also creates a missing database. Run manually:
     python db_migrate.py
 """
 
@@ -9,6 +10,17 @@ import sqlite3
 from pathlib import Path
 from typing import Callable, List, Tuple
 
+from search_index import (
+    create_parts_fts,
+    create_parts_terms,
+    create_parts_trigram,
+    rebuild_parts_fts,
+    rebuild_parts_terms,
+    rebuild_parts_trigram,
+)
+from orders_search import create_orders_fts, create_orders_indexes, rebuild_orders_fts
+from parts_state import create_parts_state, rebuild_parts_state
+
 # Adjust path if needed
 DB_PATH = Path("app.db")  # change if your DB lives elsewhere
 
@@ -47,6 +59,53 @@ def mark_applied(conn: sqlite3.Connection, mid: str) -> None:
     conn.execute("INSERT INTO schema_migrations (id) VALUES (?);", (mid,))
 
 
+def connect(db_path: Path) -> sqlite3.Connection:
+    """A connection for running migrations; creates the file if it is missing."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA foreign_keys = ON;")
+    # Another process may be migrating the same file.
+    conn.execute("PRAGMA busy_timeout = 30000;")
+    ensure_migrations_table(conn)
+    return conn
+
+
+def apply_migration(conn: sqlite3.Connection, mid: str, fn: Callable[[sqlite3.Connection], None]) -> bool:
+    """
+    Apply one migration in its own transaction. The applied ids are read
+    again once the write lock is held, so of two processes starting at once
+    only one applies it; returns False for the other.
+    """
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        if mid in applied_migrations(conn):
+            conn.rollback()
+            return False
+        fn(conn)
+        mark_applied(conn, mid)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return True
+
+
+def pending(conn: sqlite3.Connection) -> List[Migration]:
+    already = applied_migrations(conn)
+    return [(mid, fn) for mid, fn in sorted(MIGRATIONS, key=lambda x: x[0]) if mid not in already]
+
+
+def apply_migrations(db_path: Path = DB_PATH) -> list[str]:
+    """
+    Bring the database at `db_path` up to date, creating it if needed, and
+    return the ids of the migrations applied. Run by the app at startup.
+    """
+    conn = connect(db_path)
+    try:
+        return [mid for mid, fn in pending(conn) if apply_migration(conn, mid, fn)]
+    finally:
+        conn.close()
+
+
 def migrate(db_path: Path = DB_PATH) -> None:
     if not db_path.exists():
         print(f"Database not found at: {db_path.resolve()}")
@@ -55,30 +114,16 @@ def migrate(db_path: Path = DB_PATH) -> None:
 
     print(f"Connecting to database: {db_path.resolve()}")
 
-    migrations_sorted = sorted(MIGRATIONS, key=lambda x: x[0])
-
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     try:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        ensure_migrations_table(conn)
-
-        already = applied_migrations(conn)
-
         ran_any = False
-        for mid, fn in migrations_sorted:
-            if mid in already:
-                continue
-
+        for mid, fn in pending(conn):
             print(f"Applying migration: {mid} ...")
             try:
-                conn.execute("BEGIN;")
-                fn(conn)
-                mark_applied(conn, mid)
-                conn.commit()
-                print(f"✓ Applied: {mid}")
-                ran_any = True
+                if apply_migration(conn, mid, fn):
+                    print(f"✓ Applied: {mid}")
+                    ran_any = True
             except Exception as e:
-                conn.rollback()
                 print(f"✗ Failed: {mid}\n  Error: {e}")
                 raise
 
@@ -223,5 +268,194 @@ def m004_add_location_overrides(conn: sqlite3.Connection) -> None:
     """)
 
 
+@migration("005_add_parts_fts")
+def m005_add_parts_fts(conn: sqlite3.Connection) -> None:
+    """
+    Add the FTS5 index used by /api/parts and fill it from the current catalog.
+
+    See search_index.py for how it is kept in sync.
+    """
+    create_parts_fts(conn)
+    rebuild_parts_fts(conn)
+
+
+@migration("006_add_parts_trigram")
+def m006_add_parts_trigram(conn: sqlite3.Connection) -> None:
+    """
+    Add the trigram substring index over part numbers, maker's references and EANs.
+    """
+    create_parts_trigram(conn)
+    rebuild_parts_trigram(conn)
+
+
+@migration("007_add_part_lookup_indexes")
+def m007_add_part_lookup_indexes(conn: sqlite3.Connection) -> None:
+    """
+    Indexes for exact barcode lookups (see part_lookup.py). EAN is already
+    indexed by 003.
+
+    The expression index must use the same REPLACE() as the lookup query.
+    """
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parts_number_compact
+        ON parts(REPLACE(number, '.', ''));
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parts_makers_reference
+        ON parts(makers_reference);
+    """)
+
+
+@migration("008_add_parts_effective_location")
+def m008_add_parts_effective_location(conn: sqlite3.Connection) -> None:
+    """
+    Store each part's listing location (override, else default) so listings can
+    be ordered and paged through an index instead of sorting
+    COALESCE(lo.new_location, p.default_location) on every request.
+
+    Empty instead of NULL, so keyset cursors can compare it with row values.
+    Kept in sync by triggers; the parts import writes it directly.
+    """
+    cols = {c[1].lower() for c in conn.execute("PRAGMA table_info(parts);").fetchall()}
+    if "effective_location" not in cols:
+        conn.execute(
+            "ALTER TABLE parts ADD COLUMN effective_location TEXT NOT NULL DEFAULT '';"
+        )
+
+    conn.execute("""
+        UPDATE parts SET effective_location = COALESCE(
+            (SELECT lo.new_location FROM location_overrides lo
+             WHERE lo.part_number = parts.number),
+            default_location, ''
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parts_effective_location
+        ON parts(effective_location, number);
+    """)
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_location_overrides_effective_ai
+        AFTER INSERT ON location_overrides BEGIN
+            UPDATE parts SET effective_location = NEW.new_location
+            WHERE number = NEW.part_number;
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_location_overrides_effective_au
+        AFTER UPDATE OF new_location ON location_overrides BEGIN
+            UPDATE parts SET effective_location = NEW.new_location
+            WHERE number = NEW.part_number;
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_location_overrides_effective_ad
+        AFTER DELETE ON location_overrides BEGIN
+            UPDATE parts SET effective_location = COALESCE(default_location, '')
+            WHERE number = OLD.part_number;
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_parts_effective_location_au
+        AFTER UPDATE OF default_location ON parts BEGIN
+            UPDATE parts SET effective_location = COALESCE(
+                (SELECT lo.new_location FROM location_overrides lo
+                 WHERE lo.part_number = NEW.number),
+                NEW.default_location, ''
+            )
+            WHERE rowid = NEW.rowid;
+        END;
+    """)
+
+
+@migration("009_add_parts_terms")
+def m009_add_parts_terms(conn: sqlite3.Connection) -> None:
+    """
+    Add the trigram index over name words used by fuzzy search (see fuzzy.py).
+    """
+    create_parts_terms(conn)
+    rebuild_parts_terms(conn)
+
+
+@migration("010_add_parts_row_hash")
+def m010_add_parts_row_hash(conn: sqlite3.Connection) -> None:
+    """
+    Fingerprint of each part as last imported, so a diff import can skip
+    unchanged rows (see import_excel.import_parts_diff).
+
+    Existing rows stay NULL and count as changed on the next diff import.
+    """
+    cols = {c[1].lower() for c in conn.execute("PRAGMA table_info(parts);").fetchall()}
+    if "row_hash" not in cols:
+        conn.execute("ALTER TABLE parts ADD COLUMN row_hash INTEGER;")
+
+
+@migration("011_add_import_history")
+def m011_add_import_history(conn: sqlite3.Connection) -> None:
+    """
+    Record of completed imports and the hash of their file, so an identical
+    re-upload can be skipped (see import_history.py).
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS import_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            filename TEXT,
+            mode TEXT,
+            bytes INTEGER,
+            rows INTEGER,
+            duration_s REAL,
+            imported_at TEXT NOT NULL,
+            result TEXT NOT NULL
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_import_history_kind
+        ON import_history(kind, id);
+    """)
+
+
+@migration("012_add_orders_search")
+def m012_add_orders_search(conn: sqlite3.Connection) -> None:
+    """
+    Indexes behind `/api/orders`: one per listing order and filter, and the
+    `orders_fts` index over number, title and details (see orders_search.py).
+    """
+    create_orders_indexes(conn)
+    create_orders_fts(conn)
+    rebuild_orders_fts(conn)
+
+
+@migration("013_add_parts_state")
+def m013_add_parts_state(conn: sqlite3.Connection) -> None:
+    """
+    One row of wishlist, ROB and override state per part that has any, kept
+    by triggers, so listings join one table (see parts_state.py).
+    """
+    create_parts_state(conn)
+    rebuild_parts_state(conn)
+
+
+@migration("014_add_parts_default_location_index")
+def m014_add_parts_default_location_index(conn: sqlite3.Connection) -> None:
+    """
+    Index for /api/simple_parts without a query (the Parts page before
+    anything is typed): its first page is read in order from the index
+    instead of sorting the whole catalog, ~340 ms -> ~0.2 ms at 200k parts.
+    Substring searches and the catalog load in search_engine.py read the
+    table with NOT INDEXED instead; the wishlist and ROB queries are driven
+    from their own small tables with CROSS JOIN.
+
+    `name` gets no B-tree index: it is only matched through parts_fts and
+    LIKE '%...%', which cannot use one. makers_reference is indexed by 007.
+    check_query_plans.py lists what the routes still scan.
+    """
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parts_default_location
+        ON parts(default_location, number);
+    """)
+
+
 if __name__ == "__main__":
     migrate()
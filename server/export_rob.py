@@ -45,7 +45,9 @@ def export_rob_xlsx(dest: Path) -> Path:
             SELECT p.number, p.name, p.makers_reference, p.default_location,
                 r.rob, r.updated_at
             FROM rob r
-            JOIN parts p ON p.number = r.part_number
+            -- CROSS JOIN keeps rob as the outer loop; otherwise SQLite may
+            -- walk all of parts through idx_parts_default_location to skip the sort.
+            CROSS JOIN parts p ON p.number = r.part_number
             ORDER BY p.default_location, p.number
         """).fetchall()
     finally:
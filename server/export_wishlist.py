@@ -44,7 +44,9 @@ def export_wishlist_xlsx(dest: Path) -> Path:
         rows = conn.execute("""
             SELECT p.number, p.name, p.makers_reference, p.default_location, p.pref_vendor_code
             FROM wishlist w
-            JOIN parts p ON p.number = w.part_number
+            -- CROSS JOIN keeps wishlist as the outer loop; otherwise SQLite may
+            -- walk all of parts to find the few wishlisted ones.
+            CROSS JOIN parts p ON p.number = w.part_number
             ORDER BY p.default_location, p.number
         """).fetchall()
     finally:
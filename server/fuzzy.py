@@ -0,0 +1,125 @@
+"""
+Typo-tolerant matching for `/api/parts?mode=fuzzy`.
+
+For each token that looks like a word, candidate name words are drawn from
+the `parts_terms` trigram index (words sharing the most trigrams first), scored
+by edit distance, and the closest ones become alternatives for the token in the
+FTS query (see `search_index.build_match_query`). "bearign" thus also finds
+"bearing" and "sael" finds "seal".
+
+The work is bounded regardless of catalog size:
+- at most FUZZY_CANDIDATES candidate words are scored per token
+- at most FUZZY_ALTERNATIVES words are kept per token
+- candidate lookups stop at the time budget; tokens not reached by then are
+  matched without alternatives
+"""
+
+import sqlite3
+import time
+
+import structlog
+
+from config import FUZZY_BUDGET_MS
+
+log = structlog.get_logger()
+
+# Fields whose matches include part names.
+FUZZY_FIELDS = ("all", "name")
+
+# Shorter tokens have too few trigrams to find sensible candidates.
+MIN_FUZZY_TOKEN = 4
+
+FUZZY_CANDIDATES = 200
+FUZZY_ALTERNATIVES = 10
+
+# SQLite VM instructions between deadline checks.
+_PROGRESS_STEPS = 1000
+
+
+def max_edits(token: str) -> int:
+    return 1 if len(token) < 8 else 2
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent swaps),
+    or limit + 1 as soon as it must exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2: list[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d = min(d, prev2[j - 2] + 1)
+            cur[j] = d
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+def _candidates_query(token: str) -> str:
+    """
+    OR of the token's trigrams. Short words can lose every trigram to a
+    single swap ("sael" vs "seal"), so the trigrams of each adjacent-swap
+    variant of the token are added as well.
+    """
+    variants = [token] + [
+        token[:i] + token[i + 1] + token[i] + token[i + 2:]
+        for i in range(len(token) - 1)
+    ]
+    grams = sorted({v[i:i + 3] for v in variants for i in range(len(v) - 2)})
+    return " OR ".join('"' + g.replace('"', '""') + '"' for g in grams)
+
+
+def fuzzy_alternatives(
+    conn: sqlite3.Connection, tokens: list[str], field: str
+) -> dict[str, list[str]]:
+    """Map each fuzzy-eligible token to the closest name words, best first."""
+    if field not in FUZZY_FIELDS:
+        return {}
+
+    deadline = time.perf_counter() + FUZZY_BUDGET_MS / 1000
+    conn.set_progress_handler(lambda: time.perf_counter() > deadline, _PROGRESS_STEPS)
+    out: dict[str, list[str]] = {}
+    try:
+        for t in tokens:
+            if len(t) < MIN_FUZZY_TOKEN or not t.isalpha():
+                continue
+            if time.perf_counter() > deadline:
+                log.warning("fuzzy_budget_exhausted", tokens=len(tokens), done=len(out))
+                break
+
+            rows = conn.execute(
+                """
+                SELECT term FROM parts_terms
+                WHERE parts_terms MATCH ?
+                ORDER BY rank
+                LIMIT ?
+                """,
+                (_candidates_query(t), FUZZY_CANDIDATES),
+            ).fetchall()
+
+            limit = max_edits(t)
+            scored = []
+            for (term,) in rows:
+                if term == t:
+                    continue
+                d = edit_distance(t, term, limit)
+                if d <= limit:
+                    scored.append((d, term))
+            scored.sort()
+            out[t] = [term for _, term in scored[:FUZZY_ALTERNATIVES]]
+    except sqlite3.OperationalError as e:
+        # The progress handler interrupts a lookup that runs past the deadline.
+        if "interrupted" not in str(e):
+            raise
+        log.warning("fuzzy_budget_exhausted", tokens=len(tokens), done=len(out))
+    finally:
+        conn.set_progress_handler(None, 0)
+    return out
@@ -1,11 +1,31 @@
 from datetime import date, datetime, time
+from contextlib import contextmanager, nullcontext
+from itertools import islice
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator
+import csv
+import hashlib
 import os
+import sqlite3
+import sys
+import threading
+import time as timer
 
+import structlog
 from openpyxl import load_workbook
 
+from config import IMPORT_BATCH_SIZE, IMPORT_CSV_ENCODING
 from db import get_conn
+from orders_search import rebuild_orders_fts
+from parts_staging import (
+    SUFFIX as STAGING_SUFFIX,
+    create_staging,
+    drop_staging,
+    staging_name,
+    swap_tables,
+    swap_transaction,
+)
+from search_index import build_staging_search_index, index_parts, rebuild_parts_terms, unindex_parts
 from usb import find_usb_mount
 from export_wishlist import export_wishlist_xlsx
 
@@ -15,6 +35,36 @@ LOCAL_EXPORTS = Path(
 
 LOCAL_EXPORTS.mkdir(parents=True, exist_ok=True)
 
+log = structlog.get_logger()
+
+# Set while a replace-all parts import runs, from the wishlist export before
+# it until the swap has committed. A wishlist, ROB or location write in
+# between would be in neither the export nor the new catalog, so the app
+# refuses them meanwhile (see parts_replace_running()).
+_replacing_parts = threading.Event()
+
+
+def parts_replace_running() -> bool:
+    """True while a replace-all parts import runs. Check inside the write transaction."""
+    return _replacing_parts.is_set()
+
+
+@contextmanager
+def _operator_writes_refused():
+    # Set while holding the write lock: any write transaction that checked
+    # before has committed, so the wishlist export that follows includes it.
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE;")
+        _replacing_parts.set()
+        conn.commit()
+    finally:
+        conn.close()
+    try:
+        yield
+    finally:
+        _replacing_parts.clear()
+
 def _to_float(v: Any, default: float | None = None) -> float | None:
     v = _clean(v)
     if v in (None, ""):
@@ -93,6 +143,33 @@ def _to_int(v: Any, default: int = 0) -> int:
         except ValueError:
             return default
 
+class ImportCancelled(Exception):
+    """Raised inside an import whose job was cancelled; nothing is committed."""
+
+
+class ImportProgress:
+    """
+    Receives progress from the import functions. This base class ignores it;
+    import_jobs.ImportJob records it for `/api/import/jobs/{id}`.
+    """
+
+    def phase(self, name: str, total: int | None = None) -> None:
+        """A new phase starts; `total` is the expected number of rows, if known."""
+
+    def advance(self, rows: int) -> None:
+        """`rows` more rows were written in the current phase."""
+
+    def check_cancelled(self) -> None:
+        """Raise ImportCancelled if the import should stop."""
+
+    def committing(self) -> None:
+        """
+        The staged data is about to go live: from here on the import can no
+        longer be cancelled. Raises ImportCancelled if it already was.
+        """
+        self.check_cancelled()
+
+
 def _first_sheet(wb):
     # ALWAYS use the first worksheet. No name checks at all.
     if not wb.worksheets:
@@ -101,161 +178,620 @@ def _first_sheet(wb):
     return ws, ws.title
 
 
-def import_parts_replace_all(xlsx: Path) -> dict:
-    """Imports Parts from first sheet. Before deleting parts, exports current wishlist to USB."""
+def _sheet_header(ws) -> tuple[list[str], int | None]:
+    """
+    Headers from row 1 of a read-only sheet and the expected number of data
+    rows, if the sheet stores its size.
+
+    Read-only mode parses rows as they are iterated instead of loading the whole
+    workbook into memory. It trusts the sheet's stored dimensions, which some
+    exporters get wrong, so those are only kept as a progress estimate, then
+    reset, and short rows are padded by `_rows`.
+    """
+    expected = (ws.max_row or 0) - 1
+    ws.reset_dimensions()
+    first = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    headers = [str(v).strip() if v else "" for v in first]
+    return headers, (expected if expected > 0 else None)
+
+
+def _open_sheet(xlsx: Path):
+    """
+    Open the first sheet for streaming. Returns (workbook, sheet, title, headers,
+    expected data rows or None); the caller must close the workbook.
+    """
+    wb = load_workbook(xlsx, read_only=True, data_only=True)
+    try:
+        ws, sheet_name = _first_sheet(wb)
+        headers, expected = _sheet_header(ws)
+    except Exception:
+        wb.close()
+        raise
+    return wb, ws, sheet_name, headers, expected
+
+
+def _rows(ws, width: int) -> Iterator[tuple]:
+    """Data rows, padded to the header width."""
+    for r in ws.iter_rows(min_row=2, values_only=True):
+        if len(r) < width:
+            r = r + (None,) * (width - len(r))
+        yield r
+
+
+# Delimited text exports accepted besides .xlsx.
+DELIMITED_SUFFIXES = (".csv", ".tsv")
+
+
+def _delimiter(path: Path, header_line: str) -> str:
+    if path.suffix.lower() == ".tsv":
+        return "\t"
+    # Locales with a decimal comma export ";"-separated "CSV".
+    return max(",;\t", key=header_line.count)
+
+
+def _open_delimited(path: Path):
+    """
+    Open a .csv/.tsv file for streaming. Returns (file, csv reader positioned
+    at the first data row, headers); the caller must close the file.
+    """
+    f = open(path, encoding=IMPORT_CSV_ENCODING, newline="")
+    try:
+        delimiter = _delimiter(path, f.readline())
+        f.seek(0)
+        reader = csv.reader(f, delimiter=delimiter)
+        headers = [h.strip() for h in next(reader, [])]
+    except Exception:
+        f.close()
+        raise
+    return f, reader, headers
+
+
+def _text_rows(reader, width: int) -> Iterator[tuple]:
+    """
+    Data rows of a delimited file as tuples padded to the header width, with
+    empty fields as None like empty cells in a workbook, so both formats
+    normalize (and row-hash) the same.
+    """
+    for r in reader:
+        if len(r) < width:
+            r += [""] * (width - len(r))
+        yield tuple(v if v != "" else None for v in r)
+
+
+def _open_source(path: Path):
+    """
+    Open an import file, .xlsx or delimited text, for streaming. Returns
+    (handle to close, sheet title or None, headers, data rows, expected data
+    rows or None).
+    """
+    if path.suffix.lower() in DELIMITED_SUFFIXES:
+        f, reader, headers = _open_delimited(path)
+        return f, None, headers, _text_rows(reader, len(headers)), None
+    wb, ws, sheet_name, headers, expected = _open_sheet(path)
+    return wb, sheet_name, headers, _rows(ws, len(headers)), expected
+
+
+def _source_format(path: Path) -> str:
+    return path.suffix.lower().lstrip(".")
+
+
+def _batches(rows: Iterable[tuple], size: int) -> Iterator[list[tuple]]:
+    it = iter(rows)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def _row_reader(idx: dict[str, int], fields) -> Callable[[tuple], tuple]:
+    """
+    Build a function mapping a sheet row to the converted values of `fields`
+    ((column, header, convert) triples). Header positions are resolved once
+    here, not per row; a missing header always yields convert(None).
+    """
+    getters = []
+    for _, header, convert in fields:
+        i = idx.get(header)
+        if i is None:
+            missing = convert(None)
+            getters.append(lambda r, v=missing: v)
+        else:
+            getters.append(lambda r, i=i, c=convert: c(r[i]))
+    return lambda r: tuple(g(r) for g in getters)
+
+
+def _peak_rss_mb() -> float | None:
+    """Peak resident memory of this process so far, or None where unsupported."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _import_stats(rows: int, started: float) -> dict:
+    duration = timer.perf_counter() - started
+    return {
+        "duration_s": round(duration, 2),
+        "rows_per_sec": int(rows / duration) if duration > 0 else None,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _ean(v: Any) -> str | None:
+    v = _clean(v)
+    return str(v).strip() if v not in (None, "") else None  # migration_003
+
+
+def _amount(v: Any) -> float | None:
+    v = _clean(v)
+    return _to_float(v, 0.0) if v not in (None, "") else None
+
+
+# (parts column, sheet header, converter) in insert order, after `number`.
+PARTS_FIELDS = [
+    ("name", "Name", _clean),
+    ("qa_grading", "QA Grading", _clean),
+    ("maker_code", "Maker Code", _clean),
+    ("makers_reference", "Maker's Reference", _clean),
+    ("unit", "Unit", _clean),
+    ("pref_vendor_code", "Pref. Vendor Code", _clean),
+    ("order_status", "Order status", _clean),
+    ("default_location", "Default Location", _clean),
+    ("stock_class", "Stock Class", _clean),
+    ("stock_class_description", "Stock Class Description", _clean),
+    ("reserved", "Reserved", lambda v: _to_int(_clean(v) or 0)),
+    ("price_class", "Price Class", _clean),
+    ("asset", "Asset", _clean),
+    ("hm", "HM", _clean),
+    ("attachments", "Attachments", _clean),
+    ("weight_unit", "Weight Unit", _clean),
+    ("weight", "Weight", lambda v: _to_float(_clean(v))),
+    ("alternative_available", "Alternative Available", _clean),
+    ("ean", "EAN", _ean),
+]
+
+# (orders column, sheet header, converter) in insert order, after `number`.
+ORDERS_FIELDS = [
+    ("title", "Title", _clean),
+    ("vendor", "Vendor", _clean),
+    ("del_address", "Del. Address", _clean),
+    ("form_type", "Form Type", _clean),
+    ("form_status", "Form Status", _clean),
+    ("created", "Created", lambda v: _iso(_clean(v))),
+    ("approved", "Approved", lambda v: _iso(_clean(v))),
+    ("ordered", "Ordered", lambda v: _iso(_clean(v))),
+    ("confirmed", "Confirmed", lambda v: _iso(_clean(v))),
+    ("received", "Received", lambda v: _iso(_clean(v))),
+    ("service_order", "Service Order", _clean),
+    ("details", "Details", _clean),
+    ("estimate_total", "Estimate Total", _amount),
+    ("created_by", "Created by", _clean),
+    ("approved_by", "Approved by", _clean),
+    ("ordered_by", "Ordered by", _clean),
+]
+
+PARTS_COLUMNS = [
+    "number", *(c for c, _, _ in PARTS_FIELDS), "row_hash", "imported_at", "effective_location",
+]
+_DEFAULT_LOCATION = PARTS_COLUMNS.index("default_location")
+
+
+def _row_hash(values: tuple) -> int:
+    """Stable 64-bit fingerprint of an imported row (migration_010)."""
+    digest = hashlib.blake2b(repr(values).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def _parts_records(rows: Iterable[tuple], idx: dict[str, int], now: str) -> Iterator[tuple]:
+    """
+    Tuples in PARTS_COLUMNS order; rows without a part number are skipped.
+    """
+    read = _row_reader(idx, PARTS_FIELDS)
+    num_i = idx["Number"]
+    for r in rows:
+        num = _clean(r[num_i])
+        if not num:
+            continue
+        values = (str(num).strip(), *read(r))
+        location = values[_DEFAULT_LOCATION]
+        # migration_008: a new part has no override yet
+        yield (*values, _row_hash(values), now, location if location is not None else "")
+
+
+def _orders_records(rows: Iterable[tuple], idx: dict[str, int], now: str) -> Iterator[tuple]:
+    """Insert tuples for the orders table; rows without an order number are skipped."""
+    read = _row_reader(idx, ORDERS_FIELDS)
+    num_i = idx["Number"]
+    for r in rows:
+        num = _clean(r[num_i])
+        if not num:
+            continue
+        yield (str(num), *read(r), now)
+
+
+def _insert_sql(verb: str, table: str, columns: list[str]) -> str:
+    return (
+        f"{verb} INTO {table} ({', '.join(columns)}) "
+        f"VALUES ({', '.join('?' * len(columns))})"
+    )
+
+
+
+
+STAGING_PARTS_INSERT = _insert_sql("INSERT OR IGNORE", staging_name("parts"), PARTS_COLUMNS)
+INCOMING_PARTS_INSERT = _insert_sql("INSERT OR IGNORE", "temp.incoming_parts", PARTS_COLUMNS)
+ORDERS_COLUMNS = ["number", *(c for c, _, _ in ORDERS_FIELDS), "imported_at"]
+INCOMING_ORDERS_INSERT = _insert_sql("INSERT", "temp.incoming_orders", ORDERS_COLUMNS)
+
+
+def import_parts_replace_all(path: Path, progress: ImportProgress | None = None) -> dict:
+    """
+    Imports Parts from the first sheet of an .xlsx file, or from a .csv/.tsv
+    file. Before deleting parts, exports current wishlist to USB.
+
+    The sheet is streamed and inserted in batches of IMPORT_BATCH_SIZE rows, so
+    memory use stays flat however large the export is. The rows and search
+    indexes are built in staging tables and swapped in at the end (see
+    parts_staging.py), so the live catalog stays readable meanwhile. The swap
+    clears wishlist, ROB and location overrides, so writes to them are refused
+    from the wishlist export until the swap (see parts_replace_running()).
+    Everything up to the swap can be cancelled through `progress`, leaving the
+    old parts in place.
+    """
+    return _import_file(path, "parts", "replace", progress)
+
+
+def import_parts_diff(path: Path, progress: ImportProgress | None = None) -> dict:
+    """
+    Imports Parts from an .xlsx/.csv/.tsv file, writing only what differs
+    from the stored catalog: new parts are inserted, parts whose row hash
+    changed are updated in place, and parts missing from the file are
+    deleted. Unchanged parts, and the wishlist, ROB and location overrides of
+    every part that is still there, are left alone. Only the touched rows are
+    re-indexed.
+
+    Like the replace-all import, it is streamed, staged before anything live
+    is written, and can be cancelled before commit.
+    """
+    return _import_file(path, "parts", "diff", progress)
+
+
+def import_orders_replace_all(path: Path, progress: ImportProgress | None = None) -> dict:
+    """
+    Imports Orders from the first sheet of an .xlsx file, or from a .csv/.tsv
+    file, streamed in batches. Replaces all orders. Cancelling through
+    `progress` leaves the old orders in place.
+    """
+    return _import_file(path, "orders", "replace", progress)
+
+
+def import_workbook(path: Path, parts_mode: str = "replace", progress: ImportProgress | None = None) -> dict:
+    """
+    Imports every recognized sheet of one workbook (see SHEET_RECORDS, matched
+    on the sheet name), opening and streaming it once. Other sheets are
+    skipped and reported. Parts are imported as in `import_parts_replace_all`
+    or, with `parts_mode="diff"`, `import_parts_diff`; orders are replaced.
+
+    Sheets are staged one after the other, then made live together in one
+    transaction, so a failed or cancelled import changes none of them.
+
+    Sheets are not parsed in parallel processes: read-only openpyxl cannot
+    share an open workbook between processes, and each one would parse the
+    shared strings again (several seconds for a large export), which costs
+    more than the smaller sheets take to read.
+    """
+    progress = progress or ImportProgress()
+    started = timer.perf_counter()
+    progress.phase("opening")
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets, skipped = _workbook_sheets(wb)
+        for _, title, headers, _, _ in sheets:
+            _require_number(headers, f"sheet '{title}'")
+
+        has_parts = any(s[0] == "parts" for s in sheets)
+        with _operator_writes_refused() if has_parts and parts_mode == "replace" else nullcontext():
+            exported = {}
+            if has_parts:
+                progress.phase("exporting_wishlist")
+                exported = _export_wishlist()
+            results = _load(sheets, parts_mode, progress)
+    finally:
+        wb.close()
+
+    for kind, title, _, _, _ in sheets:
+        results[kind]["sheet_used"] = title
+    stats = _import_stats(sum(r["rows_attempted"] for r in results.values()), started)
+    log.info("import_finished", kind="workbook", sheets=list(results), skipped=skipped, **stats)
+    return {
+        "kind": "workbook",
+        "sheets": results,
+        "sheets_skipped": skipped,
+        **exported,
+        **stats,
+    }
+
+
+def _workbook_sheets(wb) -> tuple[list[tuple], list[str]]:
+    """
+    The recognized sheets of an open read-only workbook as (kind, title,
+    headers, data rows, expected data rows or None), first sheet of a kind
+    only, and the titles of the other sheets.
+    """
+    sheets, skipped = [], []
+    for ws in wb.worksheets:
+        kind = ws.title.strip().lower()
+        if kind not in SHEET_RECORDS or any(s[0] == kind for s in sheets):
+            skipped.append(ws.title)
+            continue
+        headers, expected = _sheet_header(ws)
+        sheets.append((kind, ws.title, headers, _rows(ws, len(headers)), expected))
+    if not sheets:
+        raise ValueError(f"Workbook has no {' or '.join(k.title() for k in SHEET_RECORDS)} sheet")
+    return sheets, skipped
+
+
+def _export_wishlist() -> dict:
     usb = find_usb_mount()
     export_dir = (usb / "spares_exports") if usb else (LOCAL_EXPORTS / "spares_exports")
     wishlist_file = export_wishlist_xlsx(export_dir)
+    return {"usb_detected": bool(usb), "exported_wishlist_file": str(wishlist_file)}
 
-    wb = load_workbook(xlsx, data_only=True)
-    ws, sheet_name = _first_sheet(wb)
 
-    headers = [str(c.value).strip() if c.value else "" for c in ws[1]]
-    idx = {h: i for i, h in enumerate(headers)}
-    if "Number" not in idx:
-        raise ValueError("Column 'Number' is required in Parts file (first sheet)")
+def _require_number(headers: list[str], where: str) -> None:
+    if "Number" not in headers:
+        raise ValueError(f"Column 'Number' is required in {where}")
 
-    now = datetime.now().isoformat(timespec="seconds")
 
+def _import_file(path: Path, kind: str, mode: str, progress: ImportProgress | None) -> dict:
+    """Shared body of the single-file imports."""
+    progress = progress or ImportProgress()
+    started = timer.perf_counter()
+    with _operator_writes_refused() if kind == "parts" and mode == "replace" else nullcontext():
+        exported = {}
+        if kind == "parts":
+            progress.phase("exporting_wishlist")
+            exported = _export_wishlist()
+
+        progress.phase("opening")
+        source, sheet_name, headers, rows, expected = _open_source(path)
+        try:
+            _require_number(headers, f"{kind.title()} file (first sheet)")
+            counts = _load([(kind, sheet_name, headers, rows, expected)], mode, progress)[kind]
+        finally:
+            source.close()
+
+    stats = _import_stats(counts["rows_attempted"], started)
+    log.info("import_finished", kind=kind, format=_source_format(path), **counts, **stats)
+    return {
+        "kind": kind,
+        **counts,
+        "format": _source_format(path),
+        "sheet_used": sheet_name,
+        **exported,
+        **stats,
+    }
+
+
+def _load(sheets: list[tuple], parts_mode: str, progress: ImportProgress) -> dict[str, dict]:
+    """
+    Stage each (kind, title, headers, rows, expected) sheet in turn, then
+    apply them all in one transaction. Returns the counts per kind. If
+    anything fails or is cancelled, what was staged is discarded and nothing
+    live has changed.
+    """
+    now = datetime.now().isoformat(timespec="seconds")
     conn = get_conn()
     try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM parts;")  # wishlist cascades
-
-        attempted = 0
-        inserted = 0
-
-        for r in ws.iter_rows(min_row=2, values_only=True):
-            num = _clean(r[idx["Number"]])
-            if not num:
-                continue
-
-            def g(col):
-                return _clean(r[idx[col]]) if col in idx else None
-
-            # Convert weight safely
-            weight = _to_float(g("Weight"))
-
-            attempted += 1
-
-            cur.execute(
-                """
-                INSERT OR IGNORE INTO parts (
-                    number, name, qa_grading, maker_code, makers_reference, unit,
-                    pref_vendor_code, order_status, default_location,
-                    stock_class, stock_class_description, reserved,
-                    price_class, asset, hm, attachments,
-                    weight_unit, weight, alternative_available, ean, imported_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    str(num).strip(),
-                    g("Name"),
-                    g("QA Grading"),
-                    g("Maker Code"),
-                    g("Maker's Reference"),
-                    g("Unit"),
-                    g("Pref. Vendor Code"),
-                    g("Order status"),
-                    g("Default Location"),
-                    g("Stock Class"),
-                    g("Stock Class Description"),
-                    _to_int(g("Reserved") or 0),
-                    g("Price Class"),
-                    g("Asset"),
-                    g("HM"),
-                    g("Attachments"),
-                    g("Weight Unit"),
-                    weight,
-                    g("Alternative Available"),
-                    (str(g("EAN")).strip() if g("EAN") not in (None, "") else None),  # migration_003
-                    now,
-                )
-            )
-
-            # rowcount is 1 if inserted, 0 if ignored
-            inserted += (cur.rowcount or 0)
-
-        conn.commit()
+        discards = []
+        try:
+            staged = []
+            for kind, _, headers, rows, expected in sheets:
+                stage, apply, discard = LOADERS[kind, parts_mode if kind == "parts" else "replace"]
+                discards.append(discard)
+                progress.check_cancelled()
+                progress.phase("importing", total=expected)
+                records = SHEET_RECORDS[kind](rows, {h: i for i, h in enumerate(headers)}, now)
+                staged.append((kind, apply, stage(conn, records, progress)))
+
+            progress.committing()
+            swap = any(apply is _apply_parts_replace for _, apply, _ in staged)
+            with _apply_transaction(conn, swap):
+                return {kind: apply(conn, counts, progress) for kind, apply, counts in staged}
+        except BaseException:
+            conn.rollback()
+            for discard in discards:
+                discard(conn)
+            conn.commit()
+            raise
     finally:
         conn.close()
 
+
+@contextmanager
+def _apply_transaction(conn: sqlite3.Connection, swap: bool):
+    """
+    The transaction in which staged sheets go live; a parts table swap needs
+    parts_staging.swap_transaction().
+    """
+    if swap:
+        with swap_transaction(conn):
+            yield
+        return
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        yield
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def _insert_batches(
+    cur: sqlite3.Cursor, sql: str, records, progress: ImportProgress, commit: bool = False,
+) -> tuple[int, int]:
+    """
+    Run `sql` over all records in batches, committing after each one if
+    `commit` is set. Returns (rows attempted, rows inserted).
+    """
+    attempted = 0
+    inserted = 0
+    for batch in _batches(records, IMPORT_BATCH_SIZE):
+        cur.executemany(sql, batch)
+        attempted += len(batch)
+        # rowcount sums the rows actually inserted, duplicates are ignored
+        inserted += (cur.rowcount or 0)
+        if commit:
+            cur.connection.commit()
+        progress.advance(len(batch))
+        progress.check_cancelled()
+    return attempted, inserted
+
+
+def _stage_parts_replace(conn: sqlite3.Connection, records, progress: ImportProgress) -> dict:
+    create_staging(conn)
+    conn.commit()
+    # One commit per batch, so other writers (request metrics) can get in
+    # between instead of waiting for the whole sheet. Operator writes are
+    # refused meanwhile, see _operator_writes_refused().
+    attempted, inserted = _insert_batches(
+        conn.cursor(), STAGING_PARTS_INSERT, records, progress, commit=True
+    )
+
+    progress.phase("indexing")
+    build_staging_search_index(conn, STAGING_SUFFIX)
     return {
-        "kind": "parts",
+        "mode": "replace",
         "parts_imported": inserted,
         "rows_attempted": attempted,
         "rows_ignored_duplicates": attempted - inserted,
-        "sheet_used": sheet_name,
-        "usb_detected": bool(usb),
-        "exported_wishlist_file": str(wishlist_file),
     }
 
 
+def _apply_parts_replace(conn: sqlite3.Connection, counts: dict, progress: ImportProgress) -> dict:
+    progress.phase("swapping")
+    swap_tables(conn)  # wishlist, ROB and overrides go, as with DELETE FROM parts
+    return counts
 
-def import_orders_replace_all(xlsx: Path) -> dict:
-    """Imports Orders from first sheet. Replaces all orders."""
-    wb = load_workbook(xlsx, data_only=True)
-    ws, sheet_name = _first_sheet(wb)
-
-    headers = [str(c.value).strip() if c.value else "" for c in ws[1]]
-    idx = {h: i for i, h in enumerate(headers)}
-    if "Number" not in idx:
-        raise ValueError("Column 'Number' is required in Orders file (first sheet)")
 
-    now = datetime.now().isoformat(timespec="seconds")
-
-    conn = get_conn()
-    try:
-        cur = conn.cursor()
-        cur.execute("DELETE FROM orders;")
-
-        count = 0
-        for r in ws.iter_rows(min_row=2, values_only=True):
-            num = _clean(r[idx["Number"]])
-            if not num:
-                continue
-
-            def g(col):
-                return _clean(r[idx[col]]) if col in idx else None
-
-            cur.execute(
-                """
-                INSERT INTO orders (
-                  number, title, vendor, del_address, form_type, form_status,
-                  created, approved, ordered, confirmed, received,
-                  service_order, details, estimate_total,
-                  created_by, approved_by, ordered_by, imported_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (
-                    str(num),
-                    g("Title"),
-                    g("Vendor"),
-                    g("Del. Address"),
-                    g("Form Type"),
-                    g("Form Status"),
-                    _iso(g("Created")),
-                    _iso(g("Approved")),
-                    _iso(g("Ordered")),
-                    _iso(g("Confirmed")),
-                    _iso(g("Received")),
-                    g("Service Order"),
-                    g("Details"),
-                    float(g("Estimate Total") or 0) if g("Estimate Total") not in (None, "") else None,
-                    g("Created by"),
-                    g("Approved by"),
-                    g("Ordered by"),
-                    now,
-                ),
-            )
-            count += 1
+def _stage_parts_diff(conn: sqlite3.Connection, records, progress: ImportProgress) -> dict:
+    cur = conn.cursor()
+    # The sheet is staged in a temp table (on disk, dropped with the connection),
+    # then the delta against `parts` is applied with a few set-based statements.
+    cur.execute("DROP TABLE IF EXISTS temp.incoming_parts;")
+    cur.execute(
+        f"CREATE TEMP TABLE incoming_parts (number TEXT PRIMARY KEY, {', '.join(PARTS_COLUMNS[1:])});"
+    )
+    attempted, staged = _insert_batches(cur, INCOMING_PARTS_INSERT, records, progress)
+    conn.commit()
+    return {
+        "mode": "diff",
+        "parts_imported": staged,
+        "rows_attempted": attempted,
+        "rows_ignored_duplicates": attempted - staged,
+    }
 
-        conn.commit()
-    finally:
-        conn.close()
 
+def _apply_parts_diff(conn: sqlite3.Connection, counts: dict, progress: ImportProgress) -> dict:
+    cur = conn.cursor()
+    progress.phase("applying")
+    # Rowids of parts about to change or disappear, collected while their
+    # old values are still there to be removed from the search indexes.
+    cur.execute("DROP TABLE IF EXISTS temp.import_delta;")
+    cur.execute("CREATE TEMP TABLE import_delta (id INTEGER PRIMARY KEY);")
+    cur.execute("""
+        INSERT INTO temp.import_delta
+        SELECT p.rowid FROM parts p
+        LEFT JOIN temp.incoming_parts i ON i.number = p.number
+        WHERE i.number IS NULL OR p.row_hash IS NOT i.row_hash;
+    """)
+    unindex_parts(conn, "SELECT id FROM temp.import_delta")
+
+    # Operator data of removed parts cascades with them.
+    removed = cur.execute(
+        "DELETE FROM parts WHERE number NOT IN (SELECT number FROM temp.incoming_parts);"
+    ).rowcount
+
+    # effective_location follows default_location through its trigger, so
+    # changed parts keep their overrides.
+    assignments = ", ".join(
+        f"{c} = i.{c}" for c in PARTS_COLUMNS[1:] if c != "effective_location"
+    )
+    changed = cur.execute(f"""
+        UPDATE parts SET {assignments}
+        FROM temp.incoming_parts i
+        WHERE i.number = parts.number AND parts.row_hash IS NOT i.row_hash;
+    """).rowcount
+
+    (last_rowid,) = cur.execute("SELECT COALESCE(MAX(rowid), 0) FROM parts;").fetchone()
+    cols = ", ".join(PARTS_COLUMNS)
+    added = cur.execute(f"""
+        INSERT INTO parts ({cols})
+        SELECT {cols} FROM temp.incoming_parts i
+        WHERE NOT EXISTS (SELECT 1 FROM parts p WHERE p.number = i.number);
+    """).rowcount
+    cur.execute("INSERT OR IGNORE INTO temp.import_delta SELECT rowid FROM parts WHERE rowid > ?;", (last_rowid,))
+
+    progress.phase("indexing")
+    index_parts(conn, "SELECT id FROM temp.import_delta")
+    if removed or changed or added:
+        rebuild_parts_terms(conn)
+
+    _discard_parts_diff(conn)
     return {
-        "kind": "orders",
-        "orders_imported": count,
-        "sheet_used": sheet_name,
+        **counts,
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": counts["parts_imported"] - added - changed,
     }
+
+
+def _discard_parts_diff(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS temp.import_delta;")
+    conn.execute("DROP TABLE IF EXISTS temp.incoming_parts;")
+
+
+def _stage_orders(conn: sqlite3.Connection, records, progress: ImportProgress) -> dict:
+    cur = conn.cursor()
+    cur.execute("DROP TABLE IF EXISTS temp.incoming_orders;")
+    cur.execute(
+        f"CREATE TEMP TABLE incoming_orders (number TEXT PRIMARY KEY, {', '.join(ORDERS_COLUMNS[1:])});"
+    )
+    count, _ = _insert_batches(cur, INCOMING_ORDERS_INSERT, records, progress)
+    conn.commit()
+    return {"orders_imported": count, "rows_attempted": count}
+
+
+def _apply_orders(conn: sqlite3.Connection, counts: dict, progress: ImportProgress) -> dict:
+    cols = ", ".join(ORDERS_COLUMNS)
+    conn.execute("DELETE FROM orders;")
+    conn.execute(f"INSERT INTO orders ({cols}) SELECT {cols} FROM temp.incoming_orders;")
+    rebuild_orders_fts(conn)
+    _discard_orders(conn)
+    return counts
+
+
+def _discard_orders(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TABLE IF EXISTS temp.incoming_orders;")
+
+
+# Record builders per kind; a workbook sheet named like a key (any case) is
+# imported as that kind.
+SHEET_RECORDS = {
+    "parts": _parts_records,
+    "orders": _orders_records,
+}
+
+# (kind, mode) -> (stage, apply, discard):
+#   stage(conn, records, progress) writes the rows where they are not live yet
+#     and returns their counts;
+#   apply(conn, counts, progress) makes them live inside the shared
+#     transaction and returns the final counts;
+#   discard(conn) removes what stage left behind if the import does not finish.
+LOADERS = {
+    ("parts", "replace"): (_stage_parts_replace, _apply_parts_replace, drop_staging),
+    ("parts", "diff"): (_stage_parts_diff, _apply_parts_diff, _discard_parts_diff),
+    ("orders", "replace"): (_stage_orders, _apply_orders, _discard_orders),
+}
@@ -0,0 +1,121 @@
+"""
+History of completed imports (migration 011).
+
+Every successful import is recorded with the SHA-256 of its upload (taken
+while the upload is saved, see uploads.py), its row count, duration and
+result. When a new upload hashes the same as the last import of its kind,
+the database already holds exactly that file, so the import routes answer
+with the recorded result instead of queueing a job, unless asked to force.
+
+That holds only while no later import wrote the same tables: a workbook
+replaces `parts` and `orders` too, so after one, re-uploading the file of
+the last parts import is a real change and runs normally, as is going back
+to an older file of the same kind.
+
+Nor does it hold across modes: a replace after a diff import of the same
+file also resets wishlist, ROB and location overrides, so it runs. A diff
+after a replace would change nothing and is skipped.
+"""
+
+import json
+from datetime import datetime
+
+from db import get_conn
+
+HISTORY_COLUMNS = "id, kind, sha256, filename, mode, bytes, rows, duration_s, imported_at"
+
+
+def _entry(row, with_result: bool = False) -> dict:
+    d = dict(row)
+    if with_result:
+        d["result"] = json.loads(d["result"])
+    else:
+        d.pop("result", None)
+    return d
+
+
+def last_import(kind: str) -> dict | None:
+    """The most recent successful import of `kind`, with its result."""
+    conn = get_conn()
+    try:
+        row = conn.execute(
+            f"SELECT {HISTORY_COLUMNS}, result FROM import_history "
+            "WHERE kind = ? ORDER BY id DESC LIMIT 1;",
+            (kind,),
+        ).fetchone()
+    finally:
+        conn.close()
+    return _entry(row, with_result=True) if row else None
+
+
+def written_tables(entry: dict) -> set[str]:
+    """Tables an import replaced or changed: its kind, or a workbook's sheets."""
+    if entry["kind"] == "workbook":
+        return set(entry["result"].get("sheets", ()))
+    return {entry["kind"]}
+
+
+def find_duplicate(kind: str, sha256: str, mode: str | None = None) -> dict | None:
+    """
+    The last import of `kind` if it was of the same file, in `mode` or as a
+    replace, and no import since has written any of its tables, else None.
+    """
+    last = last_import(kind)
+    if not last or last["sha256"] != sha256:
+        return None
+    if last["mode"] not in (mode, "replace"):
+        return None
+    conn = get_conn()
+    try:
+        later = conn.execute(
+            "SELECT kind, result FROM import_history WHERE id > ? ORDER BY id;",
+            (last["id"],),
+        ).fetchall()
+    finally:
+        conn.close()
+    tables = written_tables(last)
+    for row in later:
+        if written_tables(_entry(row, with_result=True)) & tables:
+            return None
+    return last
+
+
+def record_import(kind: str, upload: dict, filename: str | None, mode: str | None, rows: int, result: dict) -> None:
+    """Store a finished import; `upload` is the stats dict from save_upload."""
+    conn = get_conn()
+    try:
+        conn.execute(
+            """
+            INSERT INTO import_history
+                (kind, sha256, filename, mode, bytes, rows, duration_s, imported_at, result)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+            """,
+            (
+                kind, upload["sha256"], filename, mode, upload["bytes"], rows,
+                result.get("duration_s"), datetime.now().isoformat(timespec="seconds"),
+                json.dumps(result),
+            ),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def list_history(kind: str | None = None, limit: int = 20) -> list[dict]:
+    """Recent imports, newest first, without their stored results."""
+    conn = get_conn()
+    try:
+        if kind:
+            rows = conn.execute(
+                f"SELECT {HISTORY_COLUMNS} FROM import_history "
+                "WHERE kind = ? ORDER BY id DESC LIMIT ?;",
+                (kind, limit),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"SELECT {HISTORY_COLUMNS} FROM import_history ORDER BY id DESC LIMIT ?;",
+                (limit,),
+            ).fetchall()
+    finally:
+        conn.close()
+    return [_entry(r) for r in rows]
@@ -0,0 +1,194 @@
+"""
+Background import jobs.
+
+`/api/import/parts` and `/api/import/orders` only save the upload and queue a
+job; the import itself runs on a single worker thread, one job at a time, so
+the event loop and other requests are never blocked by it. With WAL enabled
+(see db.enable_wal) searches keep reading the previous catalog until the
+import commits.
+
+A job reports its phase, rows written and an ETA through the ImportProgress
+hooks in import_excel.py, and can be cancelled until it starts applying the
+staged data (`ImportProgress.committing()`).
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable
+
+import structlog
+
+from import_excel import ImportCancelled, ImportProgress
+
+log = structlog.get_logger()
+
+# Finished jobs kept for `/api/import/jobs`.
+JOB_HISTORY = 20
+
+_FINISHED = ("done", "failed", "cancelled")
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class ImportJob(ImportProgress):
+    """State of one queued or running import, updated from the worker thread."""
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.status = "queued"  # queued, running, done, failed, cancelled
+        self.phase_name = "queued"
+        self.rows = 0
+        self.total: int | None = None
+        self.result: dict | None = None
+        self.error: str | None = None
+        self.created_at = _now()
+        self.finished_at: str | None = None
+        self._started: float | None = None
+        self._phase_started = time.perf_counter()
+        self._cancel = threading.Event()
+        # Guards the step from cancellable to committing against cancel().
+        self._lock = threading.Lock()
+        self._committing = False
+
+    def start(self) -> None:
+        self.status = "running"
+        self._started = time.perf_counter()
+
+    def finish(self, status: str) -> None:
+        self.finished_at = _now()
+        self.phase_name = status
+        self.status = status
+
+    # ImportProgress hooks, called by the import functions.
+    def phase(self, name: str, total: int | None = None) -> None:
+        self.phase_name = name
+        self.total = total
+        self.rows = 0
+        self._phase_started = time.perf_counter()
+
+    def advance(self, rows: int) -> None:
+        self.rows += rows
+
+    def check_cancelled(self) -> None:
+        if self._cancel.is_set():
+            raise ImportCancelled()
+
+    def committing(self) -> None:
+        with self._lock:
+            self.check_cancelled()
+            self._committing = True
+
+    def cancellable(self) -> bool:
+        return not self._committing and self.status not in _FINISHED
+
+    def cancel(self) -> bool:
+        """Ask the job to stop; False once it is committing or has finished."""
+        with self._lock:
+            if not self.cancellable():
+                return False
+            self._cancel.set()
+            return True
+
+    def eta_s(self) -> float | None:
+        """Seconds left in the current phase, from its row rate so far."""
+        if not self.total or not self.rows or self.rows >= self.total:
+            return None
+        rate = self.rows / (time.perf_counter() - self._phase_started)
+        return round((self.total - self.rows) / rate, 1)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "phase": self.phase_name,
+            "rows": self.rows,
+            "total": self.total,
+            "eta_s": self.eta_s() if self.status == "running" else None,
+            "elapsed_s": (
+                round(time.perf_counter() - self._started, 1)
+                if self._started is not None and self.status == "running" else None
+            ),
+            "cancel_requested": self._cancel.is_set(),
+            "cancellable": self.cancellable(),
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class ImportJobs:
+    """Queues imports onto one worker thread and keeps recent jobs for polling."""
+
+    def __init__(self):
+        self._jobs: OrderedDict[str, ImportJob] = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="import")
+
+    def submit(
+        self,
+        kind: str,
+        work: Callable[[ImportJob], dict],
+        cleanup: Callable[[], None] | None = None,
+    ) -> ImportJob:
+        """
+        Queue `work(job)`; its return value becomes the job result. `cleanup`
+        runs afterwards however the job ends (e.g. to remove the upload).
+        """
+        job = ImportJob(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, work, cleanup)
+        log.info("import_job_queued", job_id=job.id, kind=kind)
+        return job
+
+    def get(self, job_id: str) -> ImportJob | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list[ImportJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def shutdown(self) -> None:
+        """Cancel everything; queued jobs still run just far enough to clean up."""
+        for job in self.list():
+            job.cancel()
+        self._executor.shutdown(wait=False)
+
+    def _prune(self) -> None:
+        finished = [j.id for j in self._jobs.values() if j.status in _FINISHED]
+        for job_id in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[job_id]
+
+    def _run(self, job: ImportJob, work, cleanup) -> None:
+        status = "failed"
+        try:
+            job.check_cancelled()
+            job.start()
+            log.info("import_job_started", job_id=job.id, kind=job.kind)
+            job.result = work(job)
+            status = "done"
+        except ImportCancelled:
+            status = "cancelled"
+        except Exception as e:
+            job.error = str(e) or type(e).__name__
+            log.error("import_job_failed", job_id=job.id, kind=job.kind, exc_info=True)
+        finally:
+            if cleanup is not None:
+                cleanup()
+            job.finish(status)
+            log.info("import_job_finished", job_id=job.id, kind=job.kind, status=status)
+            with self._lock:
+                self._prune()
+
+jobs = ImportJobs()
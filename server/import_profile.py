@@ -0,0 +1,292 @@
+"""
+Dry-run profiling of import files.
+
+`profile_file()` reads a Parts or Orders file once, and `profile_workbook()`
+reads every recognized sheet of a workbook once. Both go through the same
+sources, header mapping and converters as the imports in import_excel.py,
+but nothing is written and the database is never opened. The report shows
+what the real import would make of the file:
+
+- rows without a part/order number, which the import skips;
+- duplicate numbers, which a parts import drops after the first row and
+  which make an orders import fail;
+- per column: empty cells, distinct values and, for numeric columns, values
+  that do not parse and so are stored as the default;
+- expected columns that are missing, and columns the import ignores.
+
+Memory stays flat however many rows the file has, except for the exact
+duplicate check, which has to remember every number it has seen. It keeps
+one 64-bit hash per number rather than the number itself. Distinct counts
+are exact up to DISTINCT_EXACT_LIMIT values per column and a HyperLogLog
+estimate above that (about 1.6% error).
+"""
+
+import math
+import time as timer
+from pathlib import Path
+
+import structlog
+from openpyxl import load_workbook
+
+from config import IMPORT_BATCH_SIZE
+from import_excel import (
+    ORDERS_FIELDS,
+    PARTS_FIELDS,
+    ImportProgress,
+    _clean,
+    _import_stats,
+    _open_source,
+    _source_format,
+    _to_float,
+    _to_int,
+    _workbook_sheets,
+)
+
+log = structlog.get_logger()
+
+# Per kind: the imported columns, and what the import does with a repeated number.
+KIND_FIELDS = {"parts": PARTS_FIELDS, "orders": ORDERS_FIELDS}
+DUPLICATES_FAIL = {"parts": False, "orders": True}
+
+# Header -> parser for the numeric columns. parser(value, None) is None when
+# the import would fall back to its default for the value.
+NUMERIC_PARSERS = {
+    "Reserved": _to_int,
+    "Weight": _to_float,
+    "Estimate Total": _to_float,
+}
+
+# Distinct values counted exactly per column before switching to an estimate.
+DISTINCT_EXACT_LIMIT = 1024
+
+# HyperLogLog registers: 2**HLL_BITS of them.
+HLL_BITS = 12
+
+# Example values kept per finding.
+SAMPLE_SIZE = 5
+DUPLICATE_SAMPLE_SIZE = 20
+
+
+class DistinctCounter:
+    """
+    Counts distinct hashed values: exactly up to DISTINCT_EXACT_LIMIT, then
+    with a HyperLogLog sketch of 2**HLL_BITS one-byte registers.
+    """
+
+    def __init__(self):
+        self._exact: set[int] | None = set()
+        self._registers = bytearray(1 << HLL_BITS)
+
+    def add(self, h: int) -> None:
+        if self._exact is None:
+            self._observe(h)
+            return
+        self._exact.add(h)
+        if len(self._exact) > DISTINCT_EXACT_LIMIT:
+            for seen in self._exact:
+                self._observe(seen)
+            self._exact = None
+
+    def _observe(self, h: int) -> None:
+        h &= 0xFFFF_FFFF_FFFF_FFFF
+        i = h & ((1 << HLL_BITS) - 1)
+        # Position of the first 1 bit in the remaining bits.
+        rank = (64 - HLL_BITS) - (h >> HLL_BITS).bit_length() + 1
+        if rank > self._registers[i]:
+            self._registers[i] = rank
+
+    def count(self) -> tuple[int, bool]:
+        """(distinct values, whether the count is exact)."""
+        if self._exact is not None:
+            return len(self._exact), True
+        m = len(self._registers)
+        estimate = (0.7213 / (1 + 1.079 / m)) * m * m / sum(2.0 ** -r for r in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # small-range correction
+        return round(estimate), False
+
+
+def _value_hash(v) -> int:
+    # str hashes are well mixed; small ints hash to themselves.
+    return hash(v if isinstance(v, str) else repr(v))
+
+
+class ColumnProfile:
+    """Statistics of one imported column, fed one raw cell at a time."""
+
+    def __init__(self, column: str, header: str, present: bool):
+        self.column = column
+        self.header = header
+        self.present = present
+        self.parse = NUMERIC_PARSERS.get(header)
+        self.empty = 0
+        self.distinct = DistinctCounter()
+        self.invalid = 0
+        self.invalid_sample: list[str] = []
+        self.min: float | None = None
+        self.max: float | None = None
+
+    def add(self, raw) -> None:
+        v = _clean(raw)
+        if v is None or v == "":
+            self.empty += 1
+            return
+        self.distinct.add(_value_hash(v))
+        if self.parse is None:
+            return
+        n = self.parse(v, None)
+        if n is None:
+            self.invalid += 1
+            if len(self.invalid_sample) < SAMPLE_SIZE:
+                self.invalid_sample.append(str(v))
+        else:
+            self.min = n if self.min is None else min(self.min, n)
+            self.max = n if self.max is None else max(self.max, n)
+
+    def to_dict(self) -> dict:
+        distinct, exact = self.distinct.count()
+        d = {
+            "column": self.column,
+            "header": self.header,
+            "present": self.present,
+            "empty": self.empty,
+            "distinct": distinct,
+            "distinct_exact": exact,
+        }
+        if self.parse is not None:
+            d.update(invalid=self.invalid, invalid_sample=self.invalid_sample, min=self.min, max=self.max)
+        return d
+
+
+def _profile_rows(kind: str, headers: list[str], rows, expected: int | None, progress: ImportProgress) -> dict:
+    """Stream `rows` once and build the report of one sheet or file."""
+    idx = {h: i for i, h in enumerate(headers)}
+    fields = KIND_FIELDS[kind]
+    num_i = idx.get("Number")
+    number = ColumnProfile("number", "Number", num_i is not None)
+    columns = [(idx.get(header), ColumnProfile(column, header, header in idx)) for column, header, _ in fields]
+    read = [(i, p) for i, p in columns if i is not None]
+    if num_i is not None:
+        read.insert(0, (num_i, number))
+
+    seen: set[int] = set()
+    duplicates = 0
+    duplicate_sample: list[str] = []
+    without_number = 0
+    count = 0
+
+    progress.phase("profiling", total=expected)
+    for r in rows:
+        for i, profile in read:
+            profile.add(r[i])
+        if num_i is not None:
+            num = _clean(r[num_i])
+            if not num:
+                without_number += 1
+            else:
+                key = str(num).strip()
+                h = hash(key)
+                if h in seen:
+                    duplicates += 1
+                    if len(duplicate_sample) < DUPLICATE_SAMPLE_SIZE and key not in duplicate_sample:
+                        duplicate_sample.append(key)
+                else:
+                    seen.add(h)
+        count += 1
+        if count % IMPORT_BATCH_SIZE == 0:
+            progress.advance(IMPORT_BATCH_SIZE)
+            progress.check_cancelled()
+    progress.advance(count % IMPORT_BATCH_SIZE)
+
+    known = {"Number", *(header for _, header, _ in fields)}
+    missing = [p.header for _, p in columns if not p.present]
+    errors, warnings = [], []
+    if num_i is None:
+        errors.append("Column 'Number' is missing; the import will refuse the file.")
+    if duplicates and DUPLICATES_FAIL[kind]:
+        errors.append(f"{duplicates} rows repeat an order number; the import will fail.")
+    elif duplicates:
+        warnings.append(f"{duplicates} rows repeat a part number; only the first row of each is imported.")
+    if without_number:
+        warnings.append(f"{without_number} rows have no number and will be skipped.")
+    if missing:
+        warnings.append(f"Missing columns, imported as empty: {', '.join(missing)}.")
+    for _, p in columns:
+        if p.invalid:
+            warnings.append(f"{p.invalid} values in '{p.header}' are not numbers and will be imported as the default.")
+
+    number_stats = number.to_dict()
+    if num_i is not None:
+        number_stats.update(distinct=len(seen), distinct_exact=True)
+
+    return {
+        "rows": count,
+        "rows_to_import": count - without_number - (0 if DUPLICATES_FAIL[kind] else duplicates),
+        "rows_without_number": without_number,
+        "duplicate_numbers": {"rows": duplicates, "sample": duplicate_sample},
+        "columns": [number_stats, *(p.to_dict() for _, p in columns)],
+        "missing_columns": missing,
+        "ignored_columns": [h for h in headers if h and h not in known],
+        "errors": errors,
+        "warnings": warnings,
+        "ok": not errors,
+    }
+
+
+def profile_file(path: Path, kind: str, progress: ImportProgress | None = None) -> dict:
+    """
+    Dry run of a Parts or Orders import of `path` (.xlsx, first sheet, or
+    .csv/.tsv): the report described in the module docstring. Touches no
+    tables; can be cancelled through `progress`.
+    """
+    progress = progress or ImportProgress()
+    started = timer.perf_counter()
+    progress.phase("opening")
+    source, sheet_name, headers, rows, expected = _open_source(path)
+    try:
+        report = _profile_rows(kind, headers, rows, expected, progress)
+    finally:
+        source.close()
+
+    stats = _import_stats(report["rows"], started)
+    log.info("import_profiled", kind=kind, format=_source_format(path), rows=report["rows"],
+             errors=len(report["errors"]), warnings=len(report["warnings"]), **stats)
+    return {
+        "kind": kind,
+        "dry_run": True,
+        "format": _source_format(path),
+        "sheet_used": sheet_name,
+        **report,
+        **stats,
+    }
+
+
+def profile_workbook(path: Path, progress: ImportProgress | None = None) -> dict:
+    """
+    Dry run of `import_excel.import_workbook`: a report per recognized sheet,
+    read in one pass over the workbook. Touches no tables.
+    """
+    progress = progress or ImportProgress()
+    started = timer.perf_counter()
+    progress.phase("opening")
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheets, skipped = _workbook_sheets(wb)
+        reports = {
+            kind: {**_profile_rows(kind, headers, rows, expected, progress), "sheet_used": title}
+            for kind, title, headers, rows, expected in sheets
+        }
+    finally:
+        wb.close()
+
+    stats = _import_stats(sum(r["rows"] for r in reports.values()), started)
+    log.info("import_profiled", kind="workbook", sheets=list(reports), skipped=skipped, **stats)
+    return {
+        "kind": "workbook",
+        "dry_run": True,
+        "sheets": reports,
+        "sheets_skipped": skipped,
+        "ok": all(r["ok"] for r in reports.values()),
+        **stats,
+    }
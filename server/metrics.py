@@ -2,6 +2,7 @@ import time
 from collections import defaultdict
 from datetime import datetime, timezone
 
+import dal
 from db import get_conn
 
 # bucket seconds: 3600 = per hour. Use 60 if you want per-minute.
@@ -42,7 +43,9 @@ def record_request(method: str, route: str | None, status_code: int, duration_ms
     d["max_ms"] = max(d["max_ms"], int(duration_ms))
 
     if now - _last_flush >= FLUSH_EVERY_SECONDS:
-        flush()
+        # Called on the event loop (middleware.py): hand the counts over to
+        # the writer, which adds them to its next batch.
+        dal.writer.submit(write_counts, _take_counts())
         _last_flush = now
 
 
@@ -70,35 +73,44 @@ def init_metrics_table():
         conn.close()
 
 
-def flush():
-    if not _counts:
-        return
+def _take_counts() -> dict:
+    global _counts
+    counts = _counts
+    _counts = defaultdict(counts.default_factory)
+    return counts
+
 
+def flush():
+    """Write the counts gathered so far now (e.g. at shutdown)."""
     conn = get_conn()
     try:
-        for (bucket, method, route), d in list(_counts.items()):
-            conn.execute(
-                """
-                INSERT INTO api_usage(
-                  bucket_start, method, route,
-                  total, count_2xx, count_4xx, count_5xx,
-                  sum_duration_ms, max_duration_ms
-                ) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(bucket_start, method, route) DO UPDATE SET
-                  total = total + excluded.total,
-                  count_2xx = count_2xx + excluded.count_2xx,
-                  count_4xx = count_4xx + excluded.count_4xx,
-                  count_5xx = count_5xx + excluded.count_5xx,
-                  sum_duration_ms = sum_duration_ms + excluded.sum_duration_ms,
-                  max_duration_ms = MAX(max_duration_ms, excluded.max_duration_ms)
-                """,
-                (
-                    bucket, method, route,
-                    d["total"], d["2xx"], d["4xx"], d["5xx"],
-                    d["sum_ms"], d["max_ms"],
-                ),
-            )
-            del _counts[(bucket, method, route)]
+        write_counts(conn, _take_counts())
         conn.commit()
     finally:
         conn.close()
+
+
+def write_counts(conn, counts: dict):
+    """Add `counts` to api_usage. Does not commit."""
+    for (bucket, method, route), d in counts.items():
+        conn.execute(
+            """
+            INSERT INTO api_usage(
+              bucket_start, method, route,
+              total, count_2xx, count_4xx, count_5xx,
+              sum_duration_ms, max_duration_ms
+            ) VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(bucket_start, method, route) DO UPDATE SET
+              total = total + excluded.total,
+              count_2xx = count_2xx + excluded.count_2xx,
+              count_4xx = count_4xx + excluded.count_4xx,
+              count_5xx = count_5xx + excluded.count_5xx,
+              sum_duration_ms = sum_duration_ms + excluded.sum_duration_ms,
+              max_duration_ms = MAX(max_duration_ms, excluded.max_duration_ms)
+            """,
+            (
+                bucket, method, route,
+                d["total"], d["2xx"], d["4xx"], d["5xx"],
+                d["sum_ms"], d["max_ms"],
+            ),
+        )
@@ -1,9 +1,12 @@
 import time
 import uuid
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import JSONResponse, Response
 from metrics import record_request
+from uploads import MAX_BODY_BYTES, UploadTooLarge
 
 import structlog
 
@@ -21,6 +24,8 @@ class RequestContextLoggingMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         request_id = request.headers.get("x-request-id") or str(uuid.uuid4())
         start = time.perf_counter()
+        # Routes can time the whole request, e.g. upload throughput.
+        request.state.started_at = start
 
         # route template isn't available until after routing, but we can set it later
         try:
@@ -59,3 +64,45 @@ class RequestContextLoggingMiddleware(BaseHTTPMiddleware):
 
         response.headers["X-Request-Id"] = request_id
         return response
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Answers 413 to import uploads over MAX_UPLOAD_MB as they arrive.
+
+    Starlette writes a whole multipart body to its own temporary file before
+    the route runs, so a limit checked there only applies after the disk has
+    filled and the transfer finished. A request announcing a larger
+    Content-Length is refused without reading the body; otherwise the body is
+    counted while it is received and the request fails once it passes the
+    limit.
+    """
+
+    def __init__(self, app, path_prefix: str = "/api/import/"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        length = Headers(scope=scope).get("content-length")
+        if length and length.isdigit() and int(length) > MAX_BODY_BYTES:
+            response = JSONResponse({"detail": str(UploadTooLarge())}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > MAX_BODY_BYTES:
+                    # Raised inside body parsing; FastAPI passes HTTPException on.
+                    raise HTTPException(413, str(UploadTooLarge()))
+            return message
+
+        await self.app(scope, limited_receive, send)
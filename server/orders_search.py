@@ -0,0 +1,73 @@
+"""
+Indexes and query building for `/api/orders`.
+
+Orders are listed newest first by one of their dates. A missing date sorts
+as '' (oldest), so the sort key is `COALESCE(<date>, '')`; migration 012
+indexes exactly these expressions together with `number`, which keeps every
+page, deep or not, an index range scan. The status and vendor filters have
+indexes of their own that lead with the filtered column and then follow the
+default (created) order.
+
+`orders_fts` is an external-content FTS5 table over the order number, title
+and details. The orders table is only ever written by the orders import,
+which replaces it as a whole, so the index is rebuilt from `orders` in the
+same transaction (`rebuild_orders_fts()`) instead of being kept in sync by
+triggers.
+"""
+
+import sqlite3
+
+from search_index import fts_phrase
+
+ORDERS_FTS_COLUMNS = ("number", "title", "details")
+
+# sort value -> indexed sort key expression (newest first).
+ORDERS_SORT_KEYS = {
+    "created": "COALESCE(created, '')",
+    "ordered": "COALESCE(ordered, '')",
+    "received": "COALESCE(received, '')",
+}
+
+# Date filters: query parameter prefix -> column. Each accepts <prefix>_from
+# and <prefix>_to, both inclusive days (YYYY-MM-DD).
+ORDERS_DATE_FILTERS = ("created", "ordered", "received")
+
+# (index name, indexed expressions). The expressions must match the query text.
+ORDERS_INDEXES = [
+    *(
+        (f"idx_orders_{sort}", f"{key}, number")
+        for sort, key in ORDERS_SORT_KEYS.items()
+    ),
+    ("idx_orders_status_created", f"form_status, {ORDERS_SORT_KEYS['created']}, number"),
+    ("idx_orders_vendor_created", f"vendor COLLATE NOCASE, {ORDERS_SORT_KEYS['created']}, number"),
+]
+
+
+def create_orders_indexes(conn: sqlite3.Connection) -> None:
+    for name, exprs in ORDERS_INDEXES:
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON orders({exprs});")
+
+
+def create_orders_fts(conn: sqlite3.Connection) -> None:
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5(
+            {', '.join(ORDERS_FTS_COLUMNS)},
+            content = 'orders',
+            content_rowid = 'rowid',
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """)
+
+
+def rebuild_orders_fts(conn: sqlite3.Connection) -> None:
+    """Re-read `orders` into `orders_fts`. Does not commit."""
+    conn.execute("INSERT INTO orders_fts(orders_fts) VALUES('rebuild');")
+
+
+def build_orders_match(tokens: list[str]) -> str | None:
+    """
+    FTS5 expression requiring every token as a word prefix in the number,
+    title or details; None if no token has a letter or digit.
+    """
+    terms = [fts_phrase(t) for t in tokens if any(ch.isalnum() for ch in t)]
+    return " AND ".join(terms) if terms else None
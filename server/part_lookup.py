@@ -0,0 +1,44 @@
+"""
+Exact part lookup for barcode scans.
+
+A scanned code is resolved against, in order: EAN, part number, part number
+without dots and maker's reference. Each step is an equality lookup on an
+index (see migration 007), and resolved codes are kept in the result cache
+(see cache.py) until the parts table changes.
+
+Only the code -> part numbers mapping is cached. Wishlist, ROB and location
+state change all the time and are read fresh for every request.
+"""
+
+from cache import cached
+from db import get_conn
+
+# (matched_on, SQL) in resolution order. The dot-stripped expression must match
+# the one in idx_parts_number_compact exactly for the index to be used.
+_LOOKUPS = (
+    ("ean", "SELECT number FROM parts WHERE ean = ? ORDER BY number"),
+    ("number", "SELECT number FROM parts WHERE number = ?"),
+    ("number_compact", "SELECT number FROM parts WHERE REPLACE(number, '.', '') = ? ORDER BY number"),
+    ("makers_reference", "SELECT number FROM parts WHERE makers_reference = ? ORDER BY number"),
+)
+
+
+@cached("parts")
+def resolve_code(code: str) -> tuple[str | None, list[str]]:
+    """
+    Return (matched_on, part numbers) for a scanned or typed code.
+
+    matched_on is None (and the list empty) if nothing matches. The result
+    is cached until the parts table changes and must not be mutated.
+    """
+    result: tuple[str | None, list[str]] = (None, [])
+    conn = get_conn()
+    try:
+        for matched_on, sql in _LOOKUPS:
+            rows = conn.execute(sql, (code,)).fetchall()
+            if rows:
+                result = (matched_on, [r["number"] for r in rows])
+                break
+    finally:
+        conn.close()
+    return result
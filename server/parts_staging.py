@@ -0,0 +1,131 @@
+"""
+Shadow tables for the replace-all parts import.
+
+The new catalog is built beside the live one: rows go into `parts_staging`
+in one short transaction per batch, then `parts_fts_staging`,
+`parts_trigram_staging` and `parts_terms_staging` are filled from it. Other
+writers only ever wait for one batch, and with WAL readers keep seeing the
+live catalog throughout. Wishlist, ROB and location writes are refused for
+the whole import (import_excel.parts_replace_running()): the swap clears
+those tables, so a write accepted meanwhile would be lost.
+
+`swap_tables()` then makes the staging tables live in one short
+`swap_transaction()`, which other imported sheets can share: the operator
+data that used to cascade from `DELETE FROM parts` is cleared explicitly,
+the live tables are dropped, the staging tables are renamed in their place
+and the indexes and triggers on `parts` are recreated from their stored
+definitions, so the swap follows whatever the migrations created.
+"""
+
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import structlog
+
+log = structlog.get_logger()
+
+SUFFIX = "_staging"
+
+# Live tables replaced by the swap, `parts` first.
+SWAPPED_TABLES = ("parts", "parts_fts", "parts_trigram", "parts_terms")
+
+
+def staging_name(table: str) -> str:
+    return table + SUFFIX
+
+
+def _staging_ddl(conn: sqlite3.Connection, table: str) -> str:
+    (sql,) = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?;", (table,)
+    ).fetchone()
+    ddl, n = re.subn(
+        rf'^(CREATE\s+(?:VIRTUAL\s+)?TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?)"?{table}"?(?=[\s(])',
+        rf"\g<1>{staging_name(table)}",
+        sql,
+        count=1,
+        flags=re.IGNORECASE,
+    )
+    if n != 1:
+        raise RuntimeError(f"Unexpected definition of table {table}: {sql[:60]}")
+    return ddl
+
+
+def drop_staging(conn: sqlite3.Connection) -> None:
+    """Drop leftover staging tables (e.g. from an interrupted import). Does not commit."""
+    for table in SWAPPED_TABLES:
+        conn.execute(f"DROP TABLE IF EXISTS {staging_name(table)};")
+
+
+def create_staging(conn: sqlite3.Connection) -> None:
+    """Create empty staging tables defined like the live ones. Does not commit."""
+    drop_staging(conn)
+    for table in SWAPPED_TABLES:
+        conn.execute(_staging_ddl(conn, table))
+
+
+def _referencing_tables(conn: sqlite3.Connection) -> list[str]:
+    """Tables with a foreign key to `parts` (wishlist, rob, location_overrides)."""
+    names = [
+        name for (name,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%';"
+        )
+    ]
+    return [
+        name for name in names
+        if any(fk[2] == "parts" for fk in conn.execute(f'PRAGMA foreign_key_list("{name}");'))
+    ]
+
+
+@contextmanager
+def swap_transaction(conn: sqlite3.Connection):
+    """
+    BEGIN IMMEDIATE ... COMMIT (or ROLLBACK on error) set up for
+    `swap_tables()`; other writes may share the transaction.
+
+    `conn` must not be inside a transaction. Foreign keys are switched off
+    for it, otherwise dropping `parts` would delete it row by row to run the
+    cascades; `swap_tables()` empties the referencing tables instead, which
+    is what those cascades did. `legacy_alter_table` keeps the renames from
+    re-checking triggers on `location_overrides` against tables that are
+    momentarily missing.
+    """
+    conn.execute("PRAGMA foreign_keys = OFF;")
+    conn.execute("PRAGMA legacy_alter_table = ON;")
+    started = time.perf_counter()
+    try:
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        log.info("parts_swapped", duration_s=round(time.perf_counter() - started, 3))
+    finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF;")
+        conn.execute("PRAGMA foreign_keys = ON;")
+
+
+def swap_tables(conn: sqlite3.Connection) -> None:
+    """
+    Replace the live parts tables with the staging tables. Must run inside
+    `swap_transaction()`.
+    """
+    dependents = [
+        sql for (sql,) in conn.execute(
+            """
+            SELECT sql FROM sqlite_master
+            WHERE tbl_name = 'parts' AND type IN ('index', 'trigger') AND sql IS NOT NULL
+            ORDER BY type = 'trigger';
+            """
+        )
+    ]
+    for table in _referencing_tables(conn):
+        conn.execute(f'DELETE FROM "{table}";')
+    for table in SWAPPED_TABLES:
+        conn.execute(f"DROP TABLE {table};")
+        conn.execute(f"ALTER TABLE {staging_name(table)} RENAME TO {table};")
+    for sql in dependents:
+        conn.execute(sql)
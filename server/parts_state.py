@@ -0,0 +1,140 @@
+"""
+Operator state of each part in one row: `parts_state`.
+
+Part listings used to probe `wishlist`, `rob` and `location_overrides` once
+each per returned row (an EXISTS and two LEFT JOINs). `parts_state` holds
+what they returned, so a listing joins one table by primary key:
+
+    SELECT p.number, ..., COALESCE(s.wishlisted, 0) AS wishlisted, s.rob, ...
+    FROM parts p LEFT JOIN parts_state s ON s.part_number = p.number
+
+Only parts with any state have a row (a few hundred on a ship, against
+~100k parts), so a part without one is simply not wishlisted, has no ROB
+and no override. Triggers on the three source tables add, update and drop
+rows in the same statement as the operator write, and
+`effective_location` follows `parts.effective_location` through a trigger
+on `parts` (see migration 008).
+
+Imports need nothing extra. The replace-all swap (parts_staging.py) clears
+every table referencing `parts`, this one included, together with the
+operator tables. A diff import that removes parts cascades into the
+operator tables, whose delete triggers drop the state rows, and a changed
+default location reaches `effective_location` through the triggers.
+`rebuild_parts_state()` refills the table from the source tables, for
+the migration or after repairs.
+
+The wishlist is listed from `idx_parts_state_wishlist`, which is already
+in listing order, so it needs no sort.
+"""
+
+import sqlite3
+
+# A row whose part has no state left.
+_EMPTY = "wishlisted = 0 AND rob IS NULL AND overridden_location IS NULL"
+
+
+def _upsert(part_number: str, columns: dict[str, str], effective_location: str | None = None) -> str:
+    """
+    INSERT of a state row for `part_number`, or UPDATE of `columns` if it
+    exists. The listing location is taken from `parts` unless given.
+    """
+    names = ", ".join(columns)
+    values = ", ".join(columns.values())
+    updates = [f"{c} = excluded.{c}" for c in columns]
+    if effective_location is not None:
+        updates.append("effective_location = excluded.effective_location")
+    return f"""
+        INSERT INTO parts_state(part_number, effective_location, {names})
+        SELECT p.number, {effective_location or "p.effective_location"}, {values}
+        FROM parts p WHERE p.number = {part_number}
+        ON CONFLICT(part_number) DO UPDATE SET {", ".join(updates)};
+    """
+
+
+def _clear(part_number: str, assignments: str) -> str:
+    return f"""
+        UPDATE parts_state SET {assignments} WHERE part_number = {part_number};
+        DELETE FROM parts_state WHERE part_number = {part_number} AND {_EMPTY};
+    """
+
+
+# (trigger name, event, body)
+_TRIGGERS = [
+    ("trg_parts_state_wishlist_ai", "AFTER INSERT ON wishlist",
+     _upsert("NEW.part_number", {"wishlisted": "1", "wishlisted_at": "NEW.toggled_at"})),
+    ("trg_parts_state_wishlist_au", "AFTER UPDATE OF toggled_at ON wishlist",
+     "UPDATE parts_state SET wishlisted_at = NEW.toggled_at WHERE part_number = NEW.part_number;"),
+    ("trg_parts_state_wishlist_ad", "AFTER DELETE ON wishlist",
+     _clear("OLD.part_number", "wishlisted = 0, wishlisted_at = NULL")),
+    ("trg_parts_state_rob_ai", "AFTER INSERT ON rob",
+     _upsert("NEW.part_number", {"rob": "NEW.rob", "rob_updated_at": "NEW.updated_at"})),
+    ("trg_parts_state_rob_au", "AFTER UPDATE ON rob",
+     _upsert("NEW.part_number", {"rob": "NEW.rob", "rob_updated_at": "NEW.updated_at"})),
+    ("trg_parts_state_rob_ad", "AFTER DELETE ON rob",
+     _clear("OLD.part_number", "rob = NULL, rob_updated_at = NULL")),
+    # An override is the listing location, whichever of these triggers and
+    # migration 008's runs first.
+    ("trg_parts_state_location_ai", "AFTER INSERT ON location_overrides",
+     _upsert("NEW.part_number", {
+         "overridden_location": "NEW.new_location",
+         "location_updated_at": "NEW.updated_at",
+     }, effective_location="NEW.new_location")),
+    ("trg_parts_state_location_au", "AFTER UPDATE ON location_overrides",
+     _upsert("NEW.part_number", {
+         "overridden_location": "NEW.new_location",
+         "location_updated_at": "NEW.updated_at",
+     }, effective_location="NEW.new_location")),
+    ("trg_parts_state_location_ad", "AFTER DELETE ON location_overrides",
+     _clear("OLD.part_number", """
+         overridden_location = NULL, location_updated_at = NULL,
+         effective_location = COALESCE(
+             (SELECT default_location FROM parts WHERE number = OLD.part_number), '')
+     """)),
+    ("trg_parts_state_effective_au", "AFTER UPDATE OF effective_location ON parts",
+     "UPDATE parts_state SET effective_location = NEW.effective_location WHERE part_number = NEW.number;"),
+]
+
+
+def create_parts_state(conn: sqlite3.Connection) -> None:
+    """Create the table, its indexes and the triggers that maintain it."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS parts_state (
+            part_number TEXT PRIMARY KEY,
+            effective_location TEXT NOT NULL DEFAULT '',
+            wishlisted INTEGER NOT NULL DEFAULT 0,
+            wishlisted_at TEXT,
+            rob REAL,
+            rob_updated_at TEXT,
+            overridden_location TEXT,
+            location_updated_at TEXT,
+            FOREIGN KEY(part_number) REFERENCES parts(number) ON DELETE CASCADE
+        );
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_parts_state_wishlist
+        ON parts_state(effective_location, part_number) WHERE wishlisted = 1;
+    """)
+    for name, event, body in _TRIGGERS:
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {body} END;")
+
+
+def rebuild_parts_state(conn: sqlite3.Connection) -> None:
+    """Refill `parts_state` from wishlist, ROB and location overrides. Does not commit."""
+    conn.execute("DELETE FROM parts_state;")
+    conn.execute("""
+        INSERT INTO parts_state(
+            part_number, effective_location, wishlisted, wishlisted_at,
+            rob, rob_updated_at, overridden_location, location_updated_at
+        )
+        SELECT p.number, p.effective_location, w.part_number IS NOT NULL, w.toggled_at,
+            r.rob, r.updated_at, lo.new_location, lo.updated_at
+        FROM (
+            SELECT part_number FROM wishlist
+            UNION SELECT part_number FROM rob
+            UNION SELECT part_number FROM location_overrides
+        ) AS k
+        JOIN parts p ON p.number = k.part_number
+        LEFT JOIN wishlist w ON w.part_number = k.part_number
+        LEFT JOIN rob r ON r.part_number = k.part_number
+        LEFT JOIN location_overrides lo ON lo.part_number = k.part_number;
+    """)
@@ -0,0 +1,485 @@
+"""
+In-process search engine for the parts catalog.
+
+The parts table only changes on import, so the searchable columns are loaded
+into memory once (at startup and after each import) and `/api/parts` can pick
+the matching part numbers without touching SQLite. Only the rows on the
+returned page are then read from the database, together with their wishlist,
+ROB and location override state.
+
+Layout of a loaded catalog (`_Catalog`):
+- rows are numbered in `(default_location, number)` order, so posting lists
+  and the default listing are already sorted the way results are returned
+- high-cardinality columns (number, maker's reference, EAN) are one string
+  with the row values joined by a separator, plus an `array('I')` of offsets
+- repetitive columns (name, location) are interned: a list of distinct values
+  plus an `array('I')` of per-row indexes into it
+- posting lists map a column tag plus a gram to an `array('I')` of row ids
+
+Matching follows the SQL path (see search_index.py): a token matches the start
+of a word in any searched column, and tokens of three or more characters also
+match anywhere inside part numbers, maker's references and EANs. Posting lists
+only narrow the rows down; every row is verified against the real text before
+it is returned, and verification stops as soon as a page is full.
+
+Location overrides are few and change at runtime, so they are kept in a plain
+dict next to the catalog and merged into the ordering per query.
+"""
+
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import dropwhile, islice
+
+import structlog
+
+from db import get_conn
+from search_index import FIELD_COLUMNS, MIN_TRIGRAM_TOKEN, TRIGRAM_FIELD_COLUMNS
+
+log = structlog.get_logger()
+
+_SEP = "\x1f"
+_WORD_RE = re.compile(r"[^\W_]+")
+
+# Catalog columns and the one-character tag their grams are stored under.
+_COLUMN_TAGS = {
+    "number": "#",
+    "name": "n",
+    "makers_reference": "m",
+    "default_location": "l",
+    "ean": "e",
+}
+
+# Code-like columns that also allow substring matches (see TRIGRAM_FIELD_COLUMNS).
+_CODE_COLUMNS = ("number", "makers_reference", "ean")
+_CODE_TAGS = "#me"
+
+_INTERNED_COLUMNS = ("name", "default_location")
+
+# Column tags searched for each `field`.
+_FIELD_TAGS = {
+    "all": "#nmle",
+    "name": "n",
+    "makers_ref": "m",
+    "location": "l",
+    "ean": "e",
+}
+
+# How a token's posting lists are combined (see `_Catalog.having_all`).
+_NARROW_ROWS = 256
+_INTERSECT_ROWS = 8192
+
+# With more than one token, rows from the cheapest token are pre-filtered by a
+# set of the next cheapest once there are more than this many of them, as long
+# as that set is small enough to build.
+_PREFILTER_ROWS = 2000
+
+
+def _norm(value: str) -> str:
+    """Lowercase, strip diacritics and reduce to ' word word ...'."""
+    if value.isascii():
+        s = value.lower()
+    else:
+        s = "".join(
+            ch for ch in unicodedata.normalize("NFKD", value.lower())
+            if not unicodedata.combining(ch)
+        )
+    return " " + " ".join(_WORD_RE.findall(s))
+
+
+def _word_texts(column: str, value: str) -> list[str]:
+    """Normalized texts a column value offers to word-prefix matching."""
+    if column == "number":
+        return [_norm(value), _norm(value.replace(".", ""))]
+    return [_norm(value)]
+
+
+def _code_texts(column: str, value: str) -> list[str]:
+    """Lowercased texts a code column value offers to substring matching."""
+    low = value.lower()
+    if column == "number":
+        return [low, low.replace(".", "")]
+    return [low]
+
+
+def _trigrams(tag: str, s: str) -> set[str]:
+    return {tag + s[j:j + 3] for j in range(len(s) - 2)}
+
+
+def _unique(rows):
+    last = None
+    for r in rows:
+        if r != last:
+            yield r
+            last = r
+
+
+class _Column:
+    """A string column stored as one joined string plus row offsets."""
+
+    __slots__ = ("data", "offsets")
+
+    def __init__(self, values: list[str]):
+        self.data = _SEP.join(values)
+        self.offsets = array("I", [0])
+        pos = 0
+        for v in values:
+            pos += len(v) + 1
+            self.offsets.append(pos)
+
+    def __getitem__(self, row: int) -> str:
+        return self.data[self.offsets[row]:self.offsets[row + 1] - 1]
+
+
+class _InternedColumn:
+    """A string column stored as distinct values plus per-row indexes."""
+
+    __slots__ = ("values", "codes")
+
+    def __init__(self, values: list[str]):
+        index: dict[str, int] = {}
+        self.codes = array("I", (index.setdefault(v, len(index)) for v in values))
+        self.values = list(index)
+
+    def __getitem__(self, row: int) -> str:
+        return self.values[self.codes[row]]
+
+
+class _Catalog:
+    """
+    Posting keys are a column tag followed by a gram:
+    - name and location: trigrams of the normalized text (which starts every
+      word with a space) plus " x" for each word's first character
+    - code columns: trigrams of the lowercased value, plus " x" and " xy" for
+      each normalized word; longer word-prefix matches are looked up through
+      the value trigrams, since a normalized word also appears verbatim in
+      the lowercased value
+
+    `all_words` / `all_codes` hold the same texts per row so "all" queries
+    are verified with one find() each.
+    """
+
+    __slots__ = ("size", "columns", "nulls", "row_of", "all_words", "all_codes", "postings")
+
+    def __init__(self, rows: list[tuple]):
+        self.size = len(rows)
+        names = list(_COLUMN_TAGS)
+        loc = names.index("default_location")
+
+        # SQLite sorts NULL locations first; remember them to keep that order.
+        self.nulls = frozenset(i for i, r in enumerate(rows) if r[loc] is None)
+        self.columns = {
+            c: (_InternedColumn if c in _INTERNED_COLUMNS else _Column)(
+                [r[k] or "" for r in rows]
+            )
+            for k, c in enumerate(names)
+        }
+        self.row_of = {r[0]: i for i, r in enumerate(rows)}
+
+        postings: dict[str, array] = {}
+        all_words = []
+        all_codes = []
+        for i, r in enumerate(rows):
+            grams: set[str] = set()
+            wtexts = []
+            ctexts = []
+            for k, c in enumerate(names):
+                v = r[k]
+                if not v:
+                    continue
+                tag = _COLUMN_TAGS[c]
+                code = c in _CODE_COLUMNS
+                for text in _word_texts(c, v):
+                    wtexts.append(text)
+                    words = text.split()
+                    grams.update({tag + " " + w[0] for w in words})
+                    if code:
+                        grams.update({tag + " " + w[:2] for w in words})
+                    else:
+                        grams |= _trigrams(tag, text)
+                if code:
+                    for text in _code_texts(c, v):
+                        ctexts.append(text)
+                        grams |= _trigrams(tag, text)
+            for g in grams:
+                lst = postings.get(g)
+                if lst is None:
+                    postings[g] = lst = array("I")
+                lst.append(i)
+            all_words.append(_SEP.join(wtexts))
+            all_codes.append(_SEP.join(ctexts))
+
+        self.postings = postings
+        self.all_words = _Column(all_words)
+        self.all_codes = _Column(all_codes)
+
+    def sort_key(self, row: int, location: str | None = None):
+        if location is None:
+            if row in self.nulls:
+                return (0, "", self.columns["number"][row])
+            location = self.columns["default_location"][row]
+        return (1, location, self.columns["number"][row])
+
+    def having_all(self, keys) -> "_Rows | None":
+        """Rows having every key, or None if a key has no rows at all."""
+        lists = []
+        for k in keys:
+            lst = self.postings.get(k)
+            if lst is None:
+                return None
+            lists.append(lst)
+        lists.sort(key=len)
+        first, rest = lists[0], lists[1:]
+
+        # Short lists are verified row by row anyway; mid-sized ones are
+        # cheapest to intersect in C; long ones (common words) are filtered
+        # lazily, since their first rows usually fill a page.
+        if not rest or len(first) <= _NARROW_ROWS:
+            return _Rows(first)
+        if len(first) <= _INTERSECT_ROWS:
+            found = set(first)
+            for lst in rest:
+                found.intersection_update(lst)
+            return _Rows(sorted(found))
+        return _Rows(first, rest)
+
+
+class _Rows:
+    """
+    Sorted candidate rows: `first`, restricted to rows also present in every
+    list of `rest`. Iteration checks `rest` lazily with binary search.
+    """
+
+    __slots__ = ("first", "rest")
+
+    def __init__(self, first, rest=()):
+        self.first = first
+        self.rest = rest
+
+    def __len__(self) -> int:
+        return len(self.first)
+
+    def __iter__(self):
+        if not self.rest:
+            return iter(self.first)
+        return (r for r in self.first if all(_contains(lst, r) for lst in self.rest))
+
+
+def _contains(sorted_rows: array, row: int) -> bool:
+    i = bisect_left(sorted_rows, row)
+    return i < len(sorted_rows) and sorted_rows[i] == row
+
+
+class _Token:
+    """One query token with its precomputed matching forms."""
+
+    __slots__ = ("phrase", "words", "raw", "substring", "sources", "cost")
+
+    def __init__(self, token: str, substring: bool):
+        # " 123 456" for "123.456": a word-boundary phrase prefix.
+        self.phrase = _norm(token)
+        self.words = self.phrase.split()
+        self.raw = token.lower()
+        self.substring = substring and len(token) >= MIN_TRIGRAM_TOKEN
+        self.sources: list = []
+        self.cost = 0
+
+    def plan(self, cat: _Catalog, tags: str) -> None:
+        """
+        Pick candidate rows per column tag (and per match kind) so that their
+        union covers every row without an override that can match.
+        """
+        sources = []
+        for tag in tags:
+            if tag in _CODE_TAGS:
+                keys = set()
+                for w in self.words:
+                    keys |= _trigrams(tag, w) if len(w) >= 3 else {tag + " " + w}
+                if self.substring:
+                    sources.append(cat.having_all(_trigrams(tag, self.raw)))
+            else:
+                p = self.phrase
+                keys = _trigrams(tag, p) if len(p) >= 3 else [tag + p]
+            sources.append(cat.having_all(keys))
+
+        self.sources = [s for s in sources if s]
+        self.cost = sum(len(s) for s in self.sources)
+
+    def rows(self):
+        """Candidate rows in ascending order, without duplicates."""
+        if len(self.sources) == 1:
+            return iter(self.sources[0])
+        return _unique(heapq.merge(*self.sources))
+
+    def row_set(self) -> set[int] | None:
+        """All candidate rows as a set, if that is cheap to build."""
+        if self.cost > _INTERSECT_ROWS or any(s.rest for s in self.sources):
+            return None
+        return set().union(*(s.first for s in self.sources))
+
+
+class PartsSearchEngine:
+    """
+    Holds the in-memory catalog and answers `/api/parts` queries from it.
+
+    `search()` returns None while no catalog is loaded, so callers can fall
+    back to SQL during startup or after a failed rebuild.
+    """
+
+    def __init__(self):
+        self._catalog: _Catalog | None = None
+        self._overrides: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def rebuild(self) -> None:
+        """Load the catalog and overrides from SQLite and swap them in."""
+        start = time.perf_counter()
+        conn = get_conn()
+        try:
+            # Plain tuples: sqlite3.Row objects for the whole catalog cost a lot
+            # of memory while the catalog is built.
+            conn.row_factory = None
+            # NOT INDEXED: scanning and sorting is faster than fetching every
+            # row through idx_parts_default_location.
+            rows = conn.execute(
+                f"""
+                SELECT {", ".join(_COLUMN_TAGS)}
+                FROM parts NOT INDEXED
+                ORDER BY default_location, number
+                """
+            ).fetchall()
+            overrides = conn.execute(
+                "SELECT part_number, new_location FROM location_overrides"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        catalog = _Catalog(rows)
+        del rows
+        with self._lock:
+            self._catalog = catalog
+            self._overrides = dict(overrides)
+
+        log.info(
+            "search_engine_rebuilt",
+            parts=catalog.size,
+            grams=len(catalog.postings),
+            duration_ms=int((time.perf_counter() - start) * 1000),
+        )
+
+    def set_override(self, part_number: str, new_location: str | None) -> None:
+        # Copy on write: searches iterate the dict without taking the lock.
+        with self._lock:
+            overrides = dict(self._overrides)
+            if new_location is None:
+                overrides.pop(part_number, None)
+            else:
+                overrides[part_number] = new_location
+            self._overrides = overrides
+
+    def clear_overrides(self) -> None:
+        with self._lock:
+            self._overrides = {}
+
+    def search(
+        self,
+        tokens: list[str],
+        field: str,
+        limit: int,
+        after: tuple[str, str] | None = None,
+    ) -> list[str] | None:
+        """
+        Return up to `limit` matching part numbers in listing order,
+        or None if the catalog is not loaded yet.
+
+        `after` is the (effective_location, number) of the last part of the
+        previous page; only parts listed after it are returned.
+        """
+        cat = self._catalog
+        if cat is None:
+            return None
+        overrides = self._overrides
+
+        if field not in FIELD_COLUMNS:
+            field = "all"
+        substring = field in TRIGRAM_FIELD_COLUMNS
+        toks = [_Token(t, substring) for t in tokens]
+        toks = [t for t in toks if t.words]
+        if tokens and not toks:
+            return []
+
+        # Overridden parts, ordered by their new location.
+        moved = []
+        for number, loc in overrides.items():
+            row = cat.row_of.get(number)
+            if row is not None:
+                moved.append((cat.sort_key(row, loc), row))
+        moved.sort()
+        moved_rows = {row for _, row in moved}
+
+        # Row ids are in listing order, so a cursor is a starting row id.
+        start = 0
+        if after is not None:
+            location, number = after
+            key = (1, location, number) if location else (0, "", number)
+            start = bisect_right(range(cat.size), key, key=cat.sort_key)
+            moved = [m for m in moved if m[0] > key]
+
+        # Everything else in row id order; for a query, only the rows the
+        # cheapest token's posting lists allow.
+        if toks:
+            tags = _FIELD_TAGS[field]
+            for t in toks:
+                t.plan(cat, tags)
+            toks.sort(key=lambda t: t.cost)
+            rows = toks[0].rows()
+            if start:
+                rows = dropwhile(lambda r: r < start, rows)
+            if len(toks) > 1 and toks[0].cost > _PREFILTER_ROWS:
+                allowed = toks[1].row_set()
+                if allowed is not None:
+                    rows = (r for r in rows if r in allowed)
+        else:
+            rows = iter(range(start, cat.size))
+
+        if moved_rows:
+            stay = ((cat.sort_key(i), i) for i in rows if i not in moved_rows)
+            rows = (row for _, row in heapq.merge(stay, moved))
+
+        if toks:
+            rows = (
+                row for row in rows
+                if all(self._matches(cat, row, t, field, overrides) for t in toks)
+            )
+
+        numbers = cat.columns["number"]
+        return [numbers[row] for row in islice(rows, limit)]
+
+    @staticmethod
+    def _matches(cat: _Catalog, row: int, t: _Token, field: str, overrides) -> bool:
+        if field == "all":
+            if cat.all_words[row].find(t.phrase) >= 0:
+                return True
+            if t.substring and t.raw in cat.all_codes[row]:
+                return True
+        else:
+            c = FIELD_COLUMNS[field][0]
+            v = cat.columns[c][row]
+            if v:
+                if any(text.find(t.phrase) >= 0 for text in _word_texts(c, v)):
+                    return True
+                if t.substring and any(t.raw in text for text in _code_texts(c, v)):
+                    return True
+
+        if field in ("all", "location"):
+            loc = overrides.get(cat.columns["number"][row])
+            if loc and _norm(loc).find(t.phrase) >= 0:
+                return True
+        return False
+
+
+engine = PartsSearchEngine()
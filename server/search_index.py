@@ -0,0 +1,454 @@
+"""
+Full-text search index for the parts catalog.
+
+`parts_fts` is a contentless FTS5 table keyed on `parts.rowid`. It holds the
+searchable text of each part (including the operator-overridden location) so
+`/api/parts` can answer with an index lookup instead of scanning `parts` with
+chained LIKE '%token%' clauses. Tokens match the start of words.
+
+`parts_trigram` is a second contentless FTS5 table using the trigram tokenizer
+over the code-like columns (part number, dot-stripped part number, maker's
+reference, EAN). A quoted phrase on it is a case-insensitive substring match,
+so fragments typed or scanned from the middle of a code are found by index.
+
+`parts_terms` holds the distinct words of part names (read from `parts_fts`
+through the `parts_fts_vocab` fts5vocab table) in a trigram index, so fuzzy
+search can find the vocabulary words that look like a misspelled token
+without scanning parts (see fuzzy.py).
+
+The indexes are kept in sync by:
+- `build_staging_search_index()`, which indexes the catalog a replace-all
+  parts import builds beside the live one (see parts_staging.py)
+- `unindex_parts()` / `index_parts()` around the rows a diff import changes
+- triggers on `location_overrides` (created by `create_parts_fts()`);
+  overrides do not touch the trigram columns or the name terms
+"""
+
+import sqlite3
+
+# Column order matters: it is shared by the DDL, the rebuild and the triggers.
+PARTS_FTS_COLUMNS = (
+    "number",
+    "number_compact",
+    "name",
+    "makers_reference",
+    "default_location",
+    "overridden_location",
+    "ean",
+)
+
+PARTS_TRIGRAM_COLUMNS = (
+    "number",
+    "number_compact",
+    "makers_reference",
+    "ean",
+)
+
+# FTS5 column filters for each `field` accepted by /api/parts.
+FIELD_COLUMNS = {
+    "name": ("name",),
+    "makers_ref": ("makers_reference",),
+    "location": ("default_location", "overridden_location"),
+    "ean": ("ean",),
+}
+
+# Trigram column filters; fields missing here only use word matching.
+# Any `field` not listed in FIELD_COLUMNS is treated as "all".
+TRIGRAM_FIELD_COLUMNS = {
+    "all": PARTS_TRIGRAM_COLUMNS,
+    "makers_ref": ("makers_reference",),
+    "ean": ("ean",),
+}
+
+# The trigram tokenizer cannot match anything shorter than one trigram.
+MIN_TRIGRAM_TOKEN = 3
+
+# bm25() weight per column in PARTS_FTS_COLUMNS order, for sort=relevance.
+# Identifying columns count more than the name, locations least.
+BM25_WEIGHTS = {
+    "number": 4.0,
+    "number_compact": 4.0,
+    "name": 2.0,
+    "makers_reference": 3.0,
+    "default_location": 1.0,
+    "overridden_location": 1.0,
+    "ean": 4.0,
+}
+
+# Added to the (negative, lower is better) bm25 score. A token that is a whole
+# part number or EAN puts that part first; tokens found next to each other
+# (e.g. "pump seal" in that order in the name) rank above scattered hits.
+EXACT_HIT_BOOST = 100.0
+PROXIMITY_BOOST = 5.0
+PROXIMITY_DISTANCE = 1
+
+# Shorter tokens still filter, but are left out of the bm25 score.
+MIN_RANKED_TOKEN = 2
+
+_COLS = ", ".join(PARTS_FTS_COLUMNS)
+_TRIGRAM_COLS = ", ".join(PARTS_TRIGRAM_COLUMNS)
+
+# Source rows for the index. `number_compact` is the part number without dots,
+# so "12345" finds "123.45" the same way the old REPLACE(...) LIKE did.
+_SOURCE_SELECT = """
+    SELECT p.rowid, p.number, REPLACE(p.number, '.', ''), p.name,
+        p.makers_reference, p.default_location, lo.new_location, p.ean
+    FROM parts p
+    LEFT JOIN location_overrides lo ON lo.part_number = p.number
+"""
+
+_TRIGRAM_SOURCE_SELECT = """
+    SELECT rowid, number, REPLACE(number, '.', ''), makers_reference, ean
+    FROM parts
+"""
+
+
+def create_parts_fts(conn: sqlite3.Connection) -> None:
+    """Create the FTS table and the triggers that follow location overrides."""
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts USING fts5(
+            {_COLS},
+            content = '',
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+    """)
+
+    # A contentless FTS row can only be removed by replaying its old values,
+    # so each trigger deletes the row as it was and re-inserts it as it is.
+    old_values = (
+        "p.rowid, p.number, REPLACE(p.number, '.', ''), p.name, "
+        "p.makers_reference, p.default_location, {loc}, p.ean"
+    )
+    delete_old = f"""
+        INSERT INTO parts_fts(parts_fts, rowid, {_COLS})
+        SELECT 'delete', {old_values.format(loc="OLD.new_location")}
+        FROM parts p WHERE p.number = OLD.part_number;
+    """
+    delete_plain = f"""
+        INSERT INTO parts_fts(parts_fts, rowid, {_COLS})
+        SELECT 'delete', {old_values.format(loc="NULL")}
+        FROM parts p WHERE p.number = NEW.part_number;
+    """
+    insert_new = f"""
+        INSERT INTO parts_fts(rowid, {_COLS})
+        SELECT {old_values.format(loc="NEW.new_location")}
+        FROM parts p WHERE p.number = NEW.part_number;
+    """
+    insert_plain = f"""
+        INSERT INTO parts_fts(rowid, {_COLS})
+        SELECT {old_values.format(loc="NULL")}
+        FROM parts p WHERE p.number = OLD.part_number;
+    """
+
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_location_overrides_fts_ai
+        AFTER INSERT ON location_overrides BEGIN
+            {delete_plain}
+            {insert_new}
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_location_overrides_fts_au
+        AFTER UPDATE ON location_overrides BEGIN
+            {delete_old}
+            {insert_new}
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_location_overrides_fts_ad
+        AFTER DELETE ON location_overrides BEGIN
+            {delete_old}
+            {insert_plain}
+        END;
+    """)
+
+
+def create_parts_trigram(conn: sqlite3.Connection) -> None:
+    """Create the trigram substring index."""
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS parts_trigram USING fts5(
+            {_TRIGRAM_COLS},
+            content = '',
+            tokenize = 'trigram'
+        );
+    """)
+
+
+def create_parts_terms(conn: sqlite3.Connection) -> None:
+    """Create the vocabulary view of `parts_fts` and the name term index."""
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS parts_fts_vocab
+        USING fts5vocab(parts_fts, 'col');
+    """)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS parts_terms USING fts5(
+            term,
+            tokenize = 'trigram'
+        );
+    """)
+
+
+def rebuild_parts_fts(conn: sqlite3.Connection) -> None:
+    """
+    Repopulate `parts_fts` from `parts` and `location_overrides`.
+
+    Does not commit; call it inside the transaction that changed `parts`.
+    """
+    conn.execute("INSERT INTO parts_fts(parts_fts) VALUES('delete-all');")
+    conn.execute(f"INSERT INTO parts_fts(rowid, {_COLS}) {_SOURCE_SELECT};")
+
+
+def rebuild_parts_trigram(conn: sqlite3.Connection) -> None:
+    """Repopulate `parts_trigram` from `parts`. Does not commit."""
+    conn.execute("INSERT INTO parts_trigram(parts_trigram) VALUES('delete-all');")
+    conn.execute(f"INSERT INTO parts_trigram(rowid, {_TRIGRAM_COLS}) {_TRIGRAM_SOURCE_SELECT};")
+
+
+def rebuild_parts_terms(conn: sqlite3.Connection) -> None:
+    """
+    Repopulate `parts_terms` from the name words in `parts_fts`, which must
+    already be up to date. Does not commit.
+    """
+    conn.execute("DELETE FROM parts_terms;")
+    conn.execute(f"""
+        INSERT INTO parts_terms(term)
+        SELECT term FROM parts_fts_vocab
+        WHERE col = 'name' AND length(term) >= {MIN_TRIGRAM_TOKEN};
+    """)
+
+
+def rebuild_search_index(conn: sqlite3.Connection) -> None:
+    """Repopulate every parts search index. Does not commit."""
+    rebuild_parts_fts(conn)
+    rebuild_parts_trigram(conn)
+    rebuild_parts_terms(conn)
+
+
+def build_staging_search_index(conn: sqlite3.Connection, suffix: str) -> None:
+    """
+    Fill the empty `parts_fts`, `parts_trigram` and `parts_terms` tables named
+    with `suffix` from the parts table named with it. A freshly imported
+    catalog has no location overrides yet.
+
+    Commits after each table: none of them is live yet, and other writers
+    then only wait for one table to be built.
+    """
+    parts, fts = "parts" + suffix, "parts_fts" + suffix
+    conn.execute(f"""
+        INSERT INTO {fts}(rowid, {_COLS})
+        SELECT rowid, number, REPLACE(number, '.', ''), name,
+            makers_reference, default_location, NULL, ean
+        FROM {parts};
+    """)
+    conn.commit()
+    conn.execute(f"""
+        INSERT INTO parts_trigram{suffix}(rowid, {_TRIGRAM_COLS})
+        {_TRIGRAM_SOURCE_SELECT.replace("FROM parts", "FROM " + parts)};
+    """)
+    conn.commit()
+    conn.execute(f"CREATE VIRTUAL TABLE temp.{fts}_vocab USING fts5vocab(main, {fts}, 'col');")
+    try:
+        conn.execute(f"""
+            INSERT INTO parts_terms{suffix}(term)
+            SELECT term FROM temp.{fts}_vocab
+            WHERE col = 'name' AND length(term) >= {MIN_TRIGRAM_TOKEN};
+        """)
+    finally:
+        conn.execute(f"DROP TABLE temp.{fts}_vocab;")
+    conn.commit()
+
+
+def unindex_parts(conn: sqlite3.Connection, rowids: str) -> None:
+    """
+    Remove parts from `parts_fts` and `parts_trigram` by replaying their
+    current values. `rowids` is a subquery selecting `parts.rowid`; call this
+    before those parts are changed or deleted. Does not commit.
+    """
+    conn.execute(f"""
+        INSERT INTO parts_fts(parts_fts, rowid, {_COLS})
+        SELECT 'delete', s.* FROM ({_SOURCE_SELECT} WHERE p.rowid IN ({rowids})) s;
+    """)
+    conn.execute(f"""
+        INSERT INTO parts_trigram(parts_trigram, rowid, {_TRIGRAM_COLS})
+        SELECT 'delete', s.* FROM ({_TRIGRAM_SOURCE_SELECT} WHERE rowid IN ({rowids})) s;
+    """)
+
+
+def index_parts(conn: sqlite3.Connection, rowids: str) -> None:
+    """
+    Add parts to `parts_fts` and `parts_trigram` after they were inserted or
+    changed; the counterpart of `unindex_parts()`. Rowids no longer in `parts`
+    are skipped. `parts_terms` is not touched: call `rebuild_parts_terms()`
+    afterwards. Does not commit.
+    """
+    conn.execute(f"INSERT INTO parts_fts(rowid, {_COLS}) {_SOURCE_SELECT} WHERE p.rowid IN ({rowids});")
+    conn.execute(f"""
+        INSERT INTO parts_trigram(rowid, {_TRIGRAM_COLS})
+        {_TRIGRAM_SOURCE_SELECT} WHERE rowid IN ({rowids});
+    """)
+
+
+def _quote(token: str) -> str:
+    # Quote the token so FTS5 treats punctuation as a phrase separator
+    # instead of query syntax.
+    return '"' + token.replace('"', '""') + '"'
+
+
+def fts_phrase(token: str) -> str:
+    """An FTS5 prefix query for one search token, safe to put in MATCH."""
+    return _quote(token) + "*"
+
+
+def _column_filter(cols) -> str:
+    return "{" + " ".join(cols) + "} : " if cols else ""
+
+
+def _token_query(prefix: str, token: str, alternatives: list[str] | None) -> str:
+    term = prefix + fts_phrase(token)
+    if not alternatives:
+        return term
+    words = " OR ".join(_quote(a) for a in alternatives)
+    return f"({term} OR {{name}} : ({words}))"
+
+
+def build_match_query(
+    tokens: list[str],
+    field: str = "all",
+    alternatives: dict[str, list[str]] | None = None,
+) -> str | None:
+    """
+    Build an FTS5 MATCH expression requiring every token (order independent).
+
+    `alternatives` maps a token to whole name words that may stand in for it
+    (fuzzy matches); the token then matches as usual or as any of them.
+
+    Tokens without any letters or digits cannot match an FTS token and are
+    dropped. Returns None if nothing searchable is left.
+    """
+    prefix = _column_filter(FIELD_COLUMNS.get(field))
+    alternatives = alternatives or {}
+
+    terms = [
+        _token_query(prefix, t, alternatives.get(t))
+        for t in tokens if any(ch.isalnum() for ch in t)
+    ]
+    if not terms:
+        return None
+    return " AND ".join(terms)
+
+
+def build_match_rowids(
+    tokens: list[str],
+    field: str = "all",
+    alternatives: dict[str, list[str]] | None = None,
+) -> tuple[str, list] | None:
+    """
+    Build a subquery selecting the rowids of parts that match every token.
+
+    A token matches if it starts a word in `parts_fts`, or, for fields with
+    code-like columns, if it occurs anywhere in them according to
+    `parts_trigram`. Tokens that can only match words are folded into a single
+    FTS5 expression; the others each get a UNION of both indexes, and the
+    per-token sets are intersected. `alternatives` is passed on to
+    `build_match_query()`.
+
+    Returns (sql, params), or None if no token is searchable.
+    """
+    if field not in FIELD_COLUMNS:
+        field = "all"
+    trigram_cols = TRIGRAM_FIELD_COLUMNS.get(field)
+    word_only: list[str] = []
+    selects: list[str] = []
+    params: list[str] = []
+
+    for t in tokens:
+        if trigram_cols is None or len(t) < MIN_TRIGRAM_TOKEN:
+            word_only.append(t)
+            continue
+
+        word = build_match_query([t], field, alternatives)
+        trigram = _column_filter(trigram_cols) + _quote(t)
+        if word is None:
+            selects.append(
+                "SELECT rowid FROM parts_trigram WHERE parts_trigram MATCH ?"
+            )
+            params.append(trigram)
+        else:
+            selects.append(
+                "SELECT rowid FROM ("
+                "SELECT rowid FROM parts_fts WHERE parts_fts MATCH ? "
+                "UNION "
+                "SELECT rowid FROM parts_trigram WHERE parts_trigram MATCH ?"
+                ")"
+            )
+            params.extend([word, trigram])
+
+    words = build_match_query(word_only, field, alternatives)
+    if words is not None:
+        selects.insert(0, "SELECT rowid FROM parts_fts WHERE parts_fts MATCH ?")
+        params.insert(0, words)
+
+    if not selects:
+        return None
+    return " INTERSECT ".join(selects), params
+
+
+def build_relevance(
+    tokens: list[str],
+    field: str = "all",
+    alternatives: dict[str, list[str]] | None = None,
+) -> tuple[str, str, str, list]:
+    """
+    Build the pieces of a relevance score for parts aliased as `p`.
+
+    Returns (with_sql, join_sql, score_sql, params). `with_sql` defines CTEs
+    and holds every parameter; `join_sql` joins the bm25 scores (it may be
+    empty); `score_sql` is the score, lower is better. Rows that only matched
+    through `parts_trigram` get no bm25 share. Tokens shorter than
+    MIN_RANKED_TOKEN only count for exact hits: as prefixes they match too
+    many words to say anything about relevance, and scoring them is slow.
+    """
+    if field not in FIELD_COLUMNS:
+        field = "all"
+    words = [
+        t for t in tokens
+        if len(t) >= MIN_RANKED_TOKEN and any(ch.isalnum() for ch in t)
+    ]
+
+    ctes = ["relevance_tokens(token) AS (VALUES " + ", ".join("(?)" for _ in tokens) + ")"]
+    params: list = list(tokens)
+    score = f"""0
+        - CASE WHEN lower(p.number) IN relevance_tokens
+            OR REPLACE(lower(p.number), '.', '') IN relevance_tokens
+            OR lower(p.ean) IN relevance_tokens
+          THEN {EXACT_HIT_BOOST} ELSE 0 END"""
+    join_sql = ""
+
+    if words:
+        weights = ", ".join(str(BM25_WEIGHTS[c]) for c in PARTS_FTS_COLUMNS)
+        any_word = " OR ".join(
+            f"({build_match_query([t], field, alternatives)})" for t in words
+        )
+        ctes.append(f"""relevance_bm25(rowid, score) AS (
+            SELECT rowid, bm25(parts_fts, {weights}) FROM parts_fts
+            WHERE parts_fts MATCH ?
+        )""")
+        params.append(any_word)
+        join_sql = "LEFT JOIN relevance_bm25 s ON s.rowid = p.rowid"
+        score += "\n        + COALESCE(s.score, 0)"
+
+    if len(words) > 1:
+        near = (
+            _column_filter(FIELD_COLUMNS.get(field))
+            + "NEAR(" + " ".join(fts_phrase(t) for t in words) + f", {PROXIMITY_DISTANCE})"
+        )
+        ctes.append(
+            "relevance_near(rowid) AS "
+            "(SELECT rowid FROM parts_fts WHERE parts_fts MATCH ?)"
+        )
+        params.append(near)
+        score += f"""
+        - CASE WHEN p.rowid IN relevance_near THEN {PROXIMITY_BOOST} ELSE 0 END"""
+
+    with_sql = "WITH " + ",\n".join(ctes)
+    return with_sql, join_sql, score, params
@@ -0,0 +1,164 @@
+"""
+Prefix suggestions for the Parts search box.
+
+`/api/parts/suggest` answers from sorted arrays of lowercased keys held in
+memory: a prefix is located with one binary search and the completions are the
+keys that follow it. Nothing touches SQLite per keystroke.
+
+Keys per kind:
+- names: each distinct name, then (ranked after those) every later
+  word-start suffix of it, so "sea" completes "Seal ring" first and
+  "Pump seal kit" after
+- numbers: the part number, and the part number without dots
+- locations: every distinct effective location (defaults and overrides)
+
+The arrays are rebuilt at startup and after each parts import. Location
+overrides set in between are added as they happen.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+
+import structlog
+
+from db import get_conn
+
+log = structlog.get_logger()
+
+# Upper bound on keys walked per kind, so prefixes shared by many keys that
+# map to the same text (e.g. "o" in a catalog full of O-rings) stay cheap.
+_SCAN_FACTOR = 20
+
+
+class _Prefixes:
+    """Sorted lowercase keys with the display text each one completes to."""
+
+    __slots__ = ("keys", "texts")
+
+    def __init__(self, pairs: list[tuple[str, str]]):
+        pairs.sort()
+        self.keys = [k for k, _ in pairs]
+        self.texts = [t for _, t in pairs]
+
+    def complete(self, prefix: str, limit: int) -> list[str]:
+        out: list[str] = []
+        seen = set()
+        keys, texts = self.keys, self.texts
+        i = bisect_left(keys, prefix)
+        end = min(len(keys), i + limit * _SCAN_FACTOR)
+        while i < end and keys[i].startswith(prefix):
+            t = texts[i]
+            if t not in seen:
+                seen.add(t)
+                out.append(t)
+                if len(out) == limit:
+                    break
+            i += 1
+        return out
+
+
+def _name_pairs(names) -> tuple[list[tuple[str, str]], list[tuple[str, str]]]:
+    """(whole-name pairs, pairs for the name from its second word onwards)"""
+    starts, inner = [], []
+    for name in names:
+        words = name.lower().split()
+        starts.append((" ".join(words), name))
+        for j in range(1, len(words)):
+            inner.append((" ".join(words[j:]), name))
+    return starts, inner
+
+
+def _number_pairs(numbers) -> list[tuple[str, str]]:
+    pairs = []
+    for n in numbers:
+        key = n.lower()
+        if key == n:
+            key = n  # share the string; numbers are mostly digits and dots
+        pairs.append((key, n))
+        compact = key.replace(".", "")
+        if compact != key:
+            pairs.append((compact, n))
+    return pairs
+
+
+def _location_pairs(locations) -> list[tuple[str, str]]:
+    return [(loc.lower(), loc) for loc in locations]
+
+
+class SuggestIndex:
+    """Holds the prefix arrays; empty until the first `rebuild()`."""
+
+    def __init__(self):
+        empty = _Prefixes([])
+        self._names = empty
+        self._name_words = empty
+        self._numbers = empty
+        self._locations = empty
+        self._lock = threading.Lock()
+
+    def rebuild(self) -> None:
+        start = time.perf_counter()
+        conn = get_conn()
+        try:
+            conn.row_factory = None
+            names = [r[0] for r in conn.execute(
+                "SELECT DISTINCT name FROM parts WHERE name IS NOT NULL AND name != ''"
+            )]
+            numbers = [r[0] for r in conn.execute("SELECT number FROM parts")]
+            locations = [r[0] for r in conn.execute(
+                "SELECT DISTINCT effective_location FROM parts WHERE effective_location != ''"
+            )]
+        finally:
+            conn.close()
+
+        starts, inner = _name_pairs(str(n) for n in names)
+        names_idx, name_words_idx = _Prefixes(starts), _Prefixes(inner)
+        numbers_idx = _Prefixes(_number_pairs(str(n) for n in numbers))
+        locations_idx = _Prefixes(_location_pairs(str(loc) for loc in locations))
+        with self._lock:
+            self._names = names_idx
+            self._name_words = name_words_idx
+            self._numbers = numbers_idx
+            self._locations = locations_idx
+
+        log.info(
+            "suggest_index_rebuilt",
+            names=len(names),
+            numbers=len(numbers),
+            locations=len(locations),
+            duration_ms=int((time.perf_counter() - start) * 1000),
+        )
+
+    def add_location(self, location: str) -> None:
+        """Make a newly set override location suggestible."""
+        key = location.lower()
+        with self._lock:
+            current = self._locations
+            i = bisect_left(current.keys, key)
+            if i < len(current.keys) and current.keys[i] == key:
+                return
+            # Copy on write: readers keep using the old arrays meanwhile.
+            self._locations = _Prefixes(
+                list(zip(current.keys, current.texts)) + [(key, location)]
+            )
+
+    def suggest(self, prefix: str, limit: int) -> dict:
+        p = " ".join(prefix.lower().split())
+        if not p:
+            return {"names": [], "numbers": [], "locations": []}
+        names = self._names.complete(p, limit)
+        if len(names) < limit:
+            seen = set(names)
+            names += [
+                n for n in self._name_words.complete(p, limit)
+                if n not in seen
+            ][:limit - len(names)]
+        return {
+            "names": names,
+            "numbers": self._numbers.complete(p, limit),
+            "locations": self._locations.complete(p, limit),
+        }
+
+
+suggestions = SuggestIndex()
@@ -0,0 +1,313 @@
+"""
+Synthetic AMOS catalog generator for benchmarks.
+
+Produces Parts and Orders data shaped like the AMOS exports ROBoard imports
+(same sheet headers, AMOS-style part numbers, room-rack-shelf-bin locations,
+valid EAN-13 codes, maker's references per maker, uppercase abbreviated part
+names with a skewed word distribution), either as .xlsx workbooks (and,
+optionally, the same data as .csv/.tsv) or as a ready-to-query SQLite
+database with the full schema and search indexes.
+
+Run manually:
+    python synth_amos.py --parts 100000 --orders 5000 --xlsx ./synth
+    python synth_amos.py --parts 100000 --xlsx ./synth --csv
+    python synth_amos.py --parts 100000 --db ./synth/amos_100000.db
+"""
+
+import argparse
+import csv
+import random
+import sqlite3
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from openpyxl import Workbook
+
+import db
+import db_migrate
+from search_index import rebuild_search_index
+
+PARTS_HEADERS = [
+    "Number", "Name", "QA Grading", "Maker Code", "Maker's Reference", "Unit",
+    "Pref. Vendor Code", "Order status", "Default Location", "Stock Class",
+    "Stock Class Description", "Reserved", "Price Class", "Asset", "HM",
+    "Attachments", "Weight Unit", "Weight", "Alternative Available", "EAN",
+]
+
+ORDERS_HEADERS = [
+    "Number", "Title", "Vendor", "Del. Address", "Form Type", "Form Status",
+    "Created", "Approved", "Ordered", "Confirmed", "Received", "Service Order",
+    "Details", "Estimate Total", "Created by", "Approved by", "Ordered by",
+]
+
+_NOUNS = [
+    "O-RING", "GASKET", "BEARING", "SEAL KIT", "VALVE", "FILTER ELEMENT", "SCREW",
+    "NUT", "WASHER", "BOLT", "STUD", "SPRING", "PISTON RING", "LINER", "INJECTOR",
+    "NOZZLE", "IMPELLER", "SHAFT", "SLEEVE", "BUSHING", "COUPLING", "HOSE",
+    "CLAMP", "SENSOR", "RELAY", "FUSE", "CONTACTOR", "SWITCH", "THERMOSTAT",
+    "GAUGE", "PUMP", "MOTOR", "BELT", "PULLEY", "CHAIN", "SPROCKET", "PIN",
+    "KEY", "PLUG", "CAP", "COVER", "FLANGE", "ELBOW", "TEE", "NIPPLE", "UNION",
+    "DIAPHRAGM", "MEMBRANE", "CARTRIDGE", "STRAINER", "SEPARATOR DISC", "CYLINDER HEAD",
+    "ROCKER ARM", "PUSH ROD", "CAMSHAFT", "TURBOCHARGER", "GOVERNOR", "SOLENOID",
+    "TRANSMITTER", "ACTUATOR", "BRUSH", "CARBON BRUSH", "LAMP", "BATTERY",
+]
+
+_QUALIFIERS = [
+    "BALL", "ROLLER", "NEEDLE", "SOLENOID", "CHECK", "SAFETY", "RELIEF", "GATE",
+    "GLOBE", "BUTTERFLY", "NON-RETURN", "FUEL", "LUB. OIL", "COOLING WATER",
+    "SEA WATER", "FRESH WATER", "STARTING AIR", "HYDRAULIC", "EXHAUST", "INLET",
+    "OUTLET", "UPPER", "LOWER", "COMPL.", "ASSY", "CENTRIF.", "PRESS.", "TEMP.",
+    "LEVEL", "FLOW", "STAINLESS", "NITRILE", "VITON", "PTFE", "COPPER", "BRASS",
+    "24VDC", "230VAC", "440VAC", "HP", "LP", "AUX.", "MAIN", "EMERG.",
+]
+
+_SIZES = [
+    "M6", "M8", "M10", "M12", "M16", "M20", "M24", "DN15", "DN25", "DN50", "DN80",
+    "DN100", "6204", "6205", "6306", "6308", "22X2", "45X3", "120X5", "1/2\"",
+    "3/4\"", "1\"", "10A", "16A", "32A",
+]
+
+_MAKERS = {
+    "MAN": lambda r: f"{r.randint(10000, 99999)}-{r.randint(1, 99):02d}",
+    "WAR": lambda r: f"PAAE{r.randint(100000, 999999)}",
+    "ALF": lambda r: f"{r.randint(500000, 599999)}-{r.randint(10, 99)}",
+    "ABB": lambda r: f"3HAC{r.randint(1000, 9999)}-{r.randint(1, 9)}",
+    "SKF": lambda r: f"{r.choice(['6', '22', 'NU'])}{r.randint(200, 399)}-2RS",
+    "DAN": lambda r: f"{r.randint(100, 999)}B{r.randint(1000, 9999)}",
+    "YAN": lambda r: f"{r.randint(100000, 199999)}-{r.randint(10000, 99999)}",
+    "HAT": lambda r: f"HT{r.randint(10, 99)}{r.choice('ABCDEF')}{r.randint(100, 999)}",
+    "CAT": lambda r: f"{r.randint(1, 9)}{r.choice('NRW')}-{r.randint(1000, 9999)}",
+    "GRU": lambda r: f"{r.randint(96000000, 99999999)}",
+}
+
+_ROOMS = ["ER", "ECR", "WS", "STR", "PR", "SG", "BR", "DK", "FR", "AC"]
+_UNITS = ["PCS", "PCS", "PCS", "SET", "M", "L", "KG", "ROLL"]
+_STOCK_CLASSES = [("E", "Engine"), ("EL", "Electric"), ("D", "Deck"), ("S", "Safety")]
+_VENDORS = ["MARINE PARTS AS", "NORDIC SUPPLY", "SHIP SPARES LTD", "KONG SERVICES",
+            "SEA TECH GMBH", "HARBOUR TRADING", "ENGINE WORKS BV"]
+_PEOPLE = ["CE", "2E", "3E", "ETO", "MASTER", "PURCHASER"]
+
+
+def _zipf_choice(r: random.Random, items: list, s: float = 1.1):
+    """Pick with a skewed distribution: early items are far more common."""
+    n = len(items)
+    while True:
+        k = int(r.paretovariate(s))
+        if k <= n:
+            return items[k - 1]
+
+
+def _ean13(r: random.Random) -> str:
+    digits = [r.randint(0, 9) for _ in range(12)]
+    total = sum(d * (3 if i % 2 else 1) for i, d in enumerate(digits))
+    return "".join(map(str, digits)) + str((10 - total % 10) % 10)
+
+
+def _location(r: random.Random) -> str:
+    room = _zipf_choice(r, _ROOMS, 0.8)
+    return f"{room}-{r.randint(1, 24):02d}-{r.choice('ABCDEF')}-{r.randint(1, 30):02d}"
+
+
+def _name(r: random.Random) -> str:
+    noun = _zipf_choice(r, _NOUNS, 0.7)
+    parts = [noun]
+    if r.random() < 0.6:
+        parts.append(_zipf_choice(r, _QUALIFIERS, 0.7))
+    if r.random() < 0.35:
+        parts.append(r.choice(_SIZES))
+    if len(parts) > 1 and r.random() < 0.5:
+        return f"{parts[0]}, {' '.join(parts[1:])}"
+    return " ".join(parts)
+
+
+def parts_rows(n: int, seed: int = 1):
+    """Yield `n` parts as tuples in PARTS_HEADERS order."""
+    r = random.Random(seed)
+    for value in r.sample(range(10**9), n):
+        maker = r.choice(list(_MAKERS))
+        stock_class, stock_desc = r.choice(_STOCK_CLASSES)
+        s = f"{value:09d}"
+        yield (
+            f"{s[:3]}.{s[3:6]}.{s[6:]}",
+            _name(r),
+            r.choice(["A", "B", "C", None]),
+            maker,
+            f"{maker} {_MAKERS[maker](r)}" if r.random() < 0.3 else _MAKERS[maker](r),
+            r.choice(_UNITS),
+            r.choice(_VENDORS)[:6],
+            r.choice(["", "", "", "Ordered", "Requested"]) or None,
+            _location(r),
+            stock_class,
+            stock_desc,
+            r.choice([0, 0, 0, 1, 2]),
+            r.choice(["L", "M", "H"]),
+            r.choice(["ME", "AE1", "AE2", "BLR", "PUR", "OWS", None]),
+            None,
+            r.choice([None, None, "drawing.pdf"]),
+            "kg",
+            round(r.uniform(0.01, 40), 2),
+            r.choice(["Yes", "No", None]),
+            _ean13(r) if r.random() < 0.6 else None,
+        )
+
+
+def orders_rows(n: int, seed: int = 1):
+    """Yield `n` orders as tuples in ORDERS_HEADERS order."""
+    r = random.Random(seed + 1)
+    start = datetime(2020, 1, 1)
+    for i in range(n):
+        created = start + timedelta(days=r.randint(0, 1800), minutes=r.randint(0, 1440))
+        steps = [created + timedelta(days=d) for d in sorted(r.sample(range(1, 120), 4))]
+        reached = r.randint(0, 4)
+        dates = [d if k < reached else None for k, d in enumerate(steps)]
+        status = ["Created", "Approved", "Ordered", "Confirmed", "Received"][reached]
+        yield (
+            f"PO-{created.year}-{i + 1:06d}",
+            f"{_zipf_choice(r, _NOUNS, 0.7)} SPARES {_zipf_choice(r, _QUALIFIERS, 0.7)}",
+            r.choice(_VENDORS),
+            r.choice(["VESSEL", "AGENT ROTTERDAM", "AGENT SINGAPORE", "WAREHOUSE"]),
+            r.choice(["Requisition", "Purchase Order", "Service Order"]),
+            status,
+            created,
+            *dates,
+            f"SO-{r.randint(1000, 9999)}" if r.random() < 0.2 else None,
+            None,
+            round(r.uniform(50, 25000), 2),
+            r.choice(_PEOPLE),
+            r.choice(_PEOPLE) if reached >= 1 else None,
+            r.choice(_PEOPLE) if reached >= 2 else None,
+        )
+
+
+def write_xlsx(path: Path, sheet: str, headers: list[str], rows) -> None:
+    """Write rows to a single-sheet workbook in streaming (write-only) mode."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet)
+    ws.append(headers)
+    for row in rows:
+        ws.append(row)
+    wb.save(path)
+
+
+def write_delimited(path: Path, headers: list[str], rows, delimiter: str = ",") -> None:
+    """
+    Write rows as delimited text, the way a spreadsheet exports them: empty
+    fields for None, dates as ISO strings.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, delimiter=delimiter)
+        w.writerow(headers)
+        for row in rows:
+            w.writerow(
+                v.isoformat(timespec="seconds") if isinstance(v, datetime) else v
+                for v in row
+            )
+
+
+def build_db(path: Path, parts: int, orders: int = 0, seed: int = 1) -> None:
+    """
+    Create a fresh database at `path` with the full schema, `parts` parts,
+    `orders` orders and a sprinkling of wishlist, ROB and location overrides.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    db.reset_pool()  # pooled connections may still point at the old file
+
+    db_migrate.apply_migrations(path)
+
+    r = random.Random(seed + 2)
+    now = datetime.now().isoformat(timespec="seconds")
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("PRAGMA foreign_keys = ON;")
+        cols = ", ".join([
+            "number", "name", "qa_grading", "maker_code", "makers_reference", "unit",
+            "pref_vendor_code", "order_status", "default_location", "stock_class",
+            "stock_class_description", "reserved", "price_class", "asset", "hm",
+            "attachments", "weight_unit", "weight", "alternative_available", "ean",
+        ])
+        conn.executemany(
+            f"""
+            INSERT INTO parts ({cols}, imported_at, effective_location)
+            VALUES ({", ".join("?" * 20)}, ?, ?)
+            """,
+            ((*row, now, row[8]) for row in parts_rows(parts, seed)),
+        )
+        if orders:
+            conn.executemany(
+                f"""
+                INSERT INTO orders (
+                    number, title, vendor, del_address, form_type, form_status,
+                    created, approved, ordered, confirmed, received,
+                    service_order, details, estimate_total,
+                    created_by, approved_by, ordered_by, imported_at
+                ) VALUES ({", ".join("?" * 18)})
+                """,
+                (
+                    (*row[:6], *(d.isoformat() if d else None for d in row[6:11]),
+                     *row[11:], now)
+                    for row in orders_rows(orders, seed)
+                ),
+            )
+        rebuild_search_index(conn)
+
+        numbers = [n for (n,) in conn.execute(
+            "SELECT number FROM parts ORDER BY random() LIMIT ?",
+            (max(1, parts // 100),),
+        )]
+        conn.executemany(
+            "INSERT INTO location_overrides(part_number, new_location, updated_at) VALUES (?, ?, ?)",
+            ((n, _location(r), now) for n in numbers[: len(numbers) // 2]),
+        )
+        conn.executemany(
+            "INSERT INTO wishlist(part_number, toggled_at) VALUES (?, ?)",
+            ((n, now) for n in numbers[len(numbers) // 2:]),
+        )
+        conn.executemany(
+            "INSERT INTO rob(part_number, rob, updated_at) VALUES (?, ?, ?)",
+            ((n, r.randint(0, 12), now) for n in numbers[::3]),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--parts", type=int, default=10000)
+    ap.add_argument("--orders", type=int, default=0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--xlsx", type=Path, help="write Parts/Orders workbooks into this folder")
+    ap.add_argument("--csv", action="store_true", help="with --xlsx, also write .csv and .tsv files")
+    ap.add_argument("--db", type=Path, help="build a SQLite database at this path")
+    args = ap.parse_args()
+
+    if not args.xlsx and not args.db:
+        ap.error("give --xlsx and/or --db")
+
+    if args.xlsx:
+        p = args.xlsx / f"parts_{args.parts}.xlsx"
+        write_xlsx(p, "Parts", PARTS_HEADERS, parts_rows(args.parts, args.seed))
+        print(f"Wrote {p}")
+        if args.orders:
+            p = args.xlsx / f"orders_{args.orders}.xlsx"
+            write_xlsx(p, "Orders", ORDERS_HEADERS, orders_rows(args.orders, args.seed))
+            print(f"Wrote {p}")
+        if args.csv:
+            for suffix, delimiter in ((".csv", ","), (".tsv", "\t")):
+                p = args.xlsx / f"parts_{args.parts}{suffix}"
+                write_delimited(p, PARTS_HEADERS, parts_rows(args.parts, args.seed), delimiter)
+                print(f"Wrote {p}")
+                if args.orders:
+                    p = args.xlsx / f"orders_{args.orders}{suffix}"
+                    write_delimited(p, ORDERS_HEADERS, orders_rows(args.orders, args.seed), delimiter)
+                    print(f"Wrote {p}")
+    if args.db:
+        build_db(args.db, args.parts, args.orders, args.seed)
+        print(f"Built {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Shared fixtures. Run from server/:
+    python -m pytest tests
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The server modules import each other by plain name, as when run from server/.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# config.py creates its export folders on import; keep them out of the way.
+_exports = tempfile.mkdtemp(prefix="roboard_exports_")
+os.environ.setdefault("DEV_LOCAL_EXPORTS", _exports)
+os.environ.setdefault("PROD_LOCAL_EXPORTS", _exports)
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def app_db(tmp_path: Path):
+    """A freshly migrated database that get_conn() uses for the test."""
+    saved = db.DB_PATH
+    db.DB_PATH = tmp_path / "app.db"
+    db.reset_pool()
+    db.init_db()
+    try:
+        yield db.DB_PATH
+    finally:
+        db.DB_PATH = saved
+        db.reset_pool()
@@ -0,0 +1,49 @@
+from import_history import find_duplicate, record_import
+
+PARTS_FILE = {"sha256": "a" * 64, "bytes": 1000}
+WORKBOOK_FILE = {"sha256": "b" * 64, "bytes": 2000}
+ORDERS_FILE = {"sha256": "c" * 64, "bytes": 500}
+
+
+def _parts(upload, mode="replace"):
+    record_import("parts", upload, "parts.xlsx", mode, 3000, {"kind": "parts", "parts_imported": 3000})
+
+
+def _workbook(upload, sheets=("parts", "orders")):
+    result = {"kind": "workbook", "sheets": {s: {} for s in sheets}}
+    record_import("workbook", upload, "both.xlsx", "replace", 1500, result)
+
+
+def test_same_file_is_a_duplicate(app_db):
+    _parts(PARTS_FILE)
+    assert find_duplicate("parts", PARTS_FILE["sha256"])["sha256"] == PARTS_FILE["sha256"]
+
+
+def test_parts_file_after_workbook_is_not_a_duplicate(app_db):
+    _parts(PARTS_FILE)
+    _workbook(WORKBOOK_FILE)
+    assert find_duplicate("parts", PARTS_FILE["sha256"]) is None
+
+
+def test_workbook_after_parts_import_is_not_a_duplicate(app_db):
+    _workbook(WORKBOOK_FILE)
+    _parts(PARTS_FILE, mode="diff")
+    assert find_duplicate("workbook", WORKBOOK_FILE["sha256"]) is None
+
+
+def test_import_of_other_tables_keeps_the_duplicate(app_db):
+    _parts(PARTS_FILE)
+    record_import("orders", ORDERS_FILE, "orders.xlsx", None, 20, {"kind": "orders"})
+    _workbook(WORKBOOK_FILE, sheets=("orders",))
+    assert find_duplicate("parts", PARTS_FILE["sha256"]) is not None
+
+
+def test_replace_after_diff_import_is_not_a_duplicate(app_db):
+    _parts(PARTS_FILE, mode="diff")
+    assert find_duplicate("parts", PARTS_FILE["sha256"], "replace") is None
+    assert find_duplicate("parts", PARTS_FILE["sha256"], "diff") is not None
+
+
+def test_diff_after_replace_import_is_a_duplicate(app_db):
+    _parts(PARTS_FILE)
+    assert find_duplicate("parts", PARTS_FILE["sha256"], "diff") is not None
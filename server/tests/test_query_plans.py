@@ -0,0 +1,6 @@
+from check_query_plans import plan_routes
+
+
+def test_no_unexpected_full_scans(tmp_path):
+    # Prints the offending statements on failure.
+    assert plan_routes(tmp_path) == 0
@@ -0,0 +1,73 @@
+"""
+Saving import uploads to disk.
+
+Starlette spools a multipart upload into a temporary file (at most 1 MB of it
+in memory) before the route runs. That file is gone once the request ends, but
+import jobs run later, so the upload is copied in UPLOAD_CHUNK_BYTES chunks to
+a uniquely named file in UPLOAD_DIR. Memory use stays flat whatever the file
+size, and concurrent uploads never share a path.
+
+Oversized uploads are refused while they are received (see
+middleware.UploadSizeLimitMiddleware), before Starlette spools them to disk;
+save_upload checks the exact file size again.
+
+The SHA-256 of the upload is computed during the copy, so recognizing a
+re-uploaded file (see import_history.py) costs no second read.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO
+
+from config import MAX_UPLOAD_MB, UPLOAD_DIR
+
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# A multipart body is the file plus its boundaries and part headers.
+MAX_BODY_BYTES = MAX_UPLOAD_MB * 1024 * 1024 + 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self):
+        super().__init__(f"Upload exceeds the {MAX_UPLOAD_MB} MB limit")
+
+
+def save_upload(src: BinaryIO, prefix: str, suffix: str, started: float | None = None) -> tuple[Path, dict]:
+    """
+    Copy `src` to a new file in UPLOAD_DIR. Returns (path, upload stats,
+    including the file's "sha256"); the caller owns the file. Raises
+    UploadTooLarge beyond MAX_UPLOAD_MB, leaving no file behind.
+
+    `started` is the perf_counter() at which the request began, so throughput
+    covers receiving the upload as well as saving it.
+    """
+    limit = MAX_UPLOAD_MB * 1024 * 1024
+    copy_started = time.perf_counter()
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    fd, name = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=UPLOAD_DIR)
+    path = Path(name)
+    size = 0
+    digest = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := src.read(UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > limit:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                out.write(chunk)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    now = time.perf_counter()
+    total = now - (started if started is not None else copy_started)
+    return path, {
+        "bytes": size,
+        "sha256": digest.hexdigest(),
+        "save_s": round(now - copy_started, 3),
+        "total_s": round(total, 3),
+        "mb_per_sec": round(size / (1024 * 1024) / total, 2) if total > 0 else None,
+    }